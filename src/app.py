@@ -1,24 +1,30 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, simpledialog
 import csv
-import shutil
 import os
 import sqlite3
-import hashlib
 from datetime import datetime
-from cryptography.fernet import Fernet
 
 # --- Импорты системные (наши модули ядра) ---
 from src.config import load_config, save_config
 from src.resources import IconManager
 from src.utils import get_font
-from src.database import init_database, get_encryption_key
+from src.database import ConnectionManager
+from src.core.repository import VaultRepository, is_record_field
+from src.core.column_store import ColumnStore
+from src.core.keyring import Keyring
+from src.core.rotation import (RotationWorker, begin_rotation, begin_upgrade, make_cipher,
+                               needs_upgrade, prepare_restore_keys, rotation_state)
+from src.core.backup import BackupWorker, backup_name
+from src.core.verifier import BackupVerifier
+from src.core.restore import open_backup_for_browsing, remove_database_file, swap_database
 
 # --- Импорты окон (дополнительные окна) ---
 from src.windows.login import LoginWindow
 from src.windows.about import AboutWindow
 from src.windows.settings import SettingsWindow
 from src.windows.add_edit import AddEditPasswordWindow
+from src.windows.restore import RestoreWindow
 
 # --- ИМПОРТЫ МОДУЛЕЙ UI (компоненты интерфейса) ---
 from src.ui.header import UIHeader       # Верхняя панель (Header)
@@ -27,6 +33,15 @@ from src.ui.filters import UIFilterBar   # Панель фильтров и по
 from src.ui.table import UITable         # Таблица данных
 from src.ui.menu import create_main_menu  # Главное меню (File, View...)
 
+# Как часто отложенные отметки "последнее использование" пишутся в БД (мс)
+TOUCH_FLUSH_MS = 30000
+# Авто-бэкап стартует через эту паузу после запуска (мс), чтобы не мешать показу окна
+BACKUP_START_DELAY_MS = 3000
+# Как часто главный поток забирает события фонового бэкапа (мс)
+BACKUP_POLL_MS = 200
+# Сколько ждать остановки фонового бэкапа при выходе (сек)
+BACKUP_JOIN_TIMEOUT = 10
+
 
 class PasswordManager:
     """
@@ -47,12 +62,39 @@ class PasswordManager:
         # Загрузка настроек
         self.config = load_config()
         self.last_activity = datetime.now()  # Таймер активности
+        # Фоновый бэкап (BackupWorker) и что вызвать по его окончании
+        self.backup_worker = None
+        self.backup_on_done = None
+        # Ошибка чистки старых копий в текущем бэкапе (копия при этом создана)
+        self.backup_prune_error = None
+        # Фоновая проверка бэкапов и снимки, не прошедшие проверку (для статус-бара)
+        self.verifier = None
+        self.backup_failures = {}
+        # Фоновая перешифровка записей при смене ключа (core.rotation)
+        self.rotation = None
+        # Ключ восстановленной копии без мастер-пароля до нового входа (см. relogin)
+        self.restore_key = None
 
         # --- Инициализация ядра ---
-        self.conn = init_database()
-        self.cursor = self.conn.cursor()
-        self.encryption_key = get_encryption_key()  # Получаем ключ шифрования
-        self.cipher = Fernet(self.encryption_key)
+        # Единственное соединение с БД на всё приложение (WAL, миграции)
+        self.db = ConnectionManager(
+            durability=self.config.get('db_durability'))
+        self.conn = self.db.conn
+        # Все запросы к БД идут через репозиторий.
+        # vault_repo - всегда рабочая база; repo - то, что сейчас показывает интерфейс
+        # (рабочая база или копия в режиме просмотра, см. browse_backup)
+        # Шифр появляется после входа (ключ хранилища обернут мастер-паролем, см. set_key)
+        self.cipher = None
+        self.vault_repo = self.make_repo(self.conn)
+        # Колонки списка в памяти (если установлен NumPy): загружаются после входа
+        # и очищаются при блокировке (см. load_columns)
+        if ColumnStore.available():
+            self.vault_repo.columns = ColumnStore()
+        self.repo = self.vault_repo
+        self.browse = None
+        self.keyring = Keyring(self.vault_repo,
+                               target_ms=self.config.get('unlock_target_ms', 300),
+                               keep_key_file=not self.config['require_login'])
 
         # --- Константы и словари ---
         # Отображение типов в таблице (Код -> Текст)
@@ -74,9 +116,6 @@ class PasswordManager:
             "Избранные в начале", "Избранные в конце"
         ]
 
-        # Проверка расписания бэкапов
-        self.check_backup_schedule()
-
         # --- Глобальные события ---
         # Клик для сброса выделения
         self.root.bind_all("<Button-1>", self.on_global_click)
@@ -87,13 +126,22 @@ class PasswordManager:
 
         # Запуск монитора неактивности
         self.check_inactivity()
+        # Периодический сброс отметок "последнее использование" в БД
+        self.root.after(TOUCH_FLUSH_MS, self.flush_touches)
+        # Закрытие окна крестиком - тот же выход, что и через меню
+        self.root.protocol("WM_DELETE_WINDOW", self.quit_app)
 
         # Построение интерфейса
         self.reload_ui()
 
-        # Логика входа
-        if self.config['require_login']:
-            LoginWindow(self.root, self.start_app, self.config, self.icon_mgr)
+        # Проверка расписания бэкапов - уже после показа интерфейса, копия делается в фоне
+        self.root.after(BACKUP_START_DELAY_MS, self.check_backup_schedule)
+
+        # Логика входа. Без пароля при входе ключ берется из файла; если его там нет
+        # (пароль был задан раньше), войти без пароля все равно нельзя
+        if self.config['require_login'] or self.keyring.load_without_password() is None:
+            LoginWindow(self.root, self.start_app, self.config,
+                        self.icon_mgr, keyring=self.keyring)
         else:
             self.start_app()
 
@@ -116,40 +164,60 @@ class PasswordManager:
         """Блокирует приложение, скрывая главное окно."""
         if self.root.state() == 'withdrawn':
             return
+        self.flush_touches(reschedule=False)
+        self._show_lock_screen(self.unlock_app)
+
+    def _show_lock_screen(self, on_success):
+        """Скрывает главное окно, стирает данные в памяти и показывает окно входа."""
         self.root.withdraw()
+        # Расшифрованные значения и список записей в памяти не должны пережить блокировку
+        self.clear_secrets()
+        if self.vault_repo.columns is not None:
+            self.vault_repo.columns.clear()
+        # Строки таблицы (RowView) ссылаются на строки хранилища - забываем и их
+        self.ui_table.clear_rows()
         # Закрываем все модальные окна
         for widget in self.root.winfo_children():
             if isinstance(widget, tk.Toplevel):
                 widget.destroy()
         # Показываем окно входа
-        LoginWindow(self.root, self.unlock_app, self.config,
-                    self.icon_mgr, is_lock_screen=True)
+        LoginWindow(self.root, on_success, self.config,
+                    self.icon_mgr, is_lock_screen=True, keyring=self.keyring)
 
     def unlock_app(self):
         """Разблокирует приложение."""
         self.last_activity = datetime.now()
+        self.load_columns()
         self.root.deiconify()
+        self.filter_passwords()
 
     def start_app(self):
         """Запуск основного цикла работы."""
+        self.set_key(self.keyring.key)
+        self.load_columns()
         self.root.deiconify()
         self.filter_passwords()  # Загрузка данных
 
+    def load_columns(self):
+        """
+        Загружает колонки списка рабочей базы в память (core.column_store):
+        фильтр по типу и сортировки после этого не обращаются к SQLite.
+        """
+        if self.vault_repo.columns is not None:
+            self.vault_repo.columns.load(self.conn)
+
     def verify_master_password(self):
         """Проверяет мастер-пароль перед важными действиями (если включено в настройках)."""
         if not self.config.get('confirm_copy', False):
             return True
         try:
-            self.cursor.execute(
-                "SELECT value FROM app_settings WHERE key='master_hash'")
-            res = self.cursor.fetchone()
-            if not res:
+            if not self.keyring.has_password():
                 return True
             pwd = simpledialog.askstring(
                 "Подтверждение", "Введите мастер-пароль:", show='•', parent=self.root)
             if not pwd:
                 return False
-            if hashlib.sha256(pwd.encode()).hexdigest() == res[0]:
+            if self.keyring.verify(pwd):
                 return True
             messagebox.showerror("Ошибка", "Неверный мастер-пароль")
             return False
@@ -157,25 +225,194 @@ class PasswordManager:
             return False
 
     # --- КРИПТОГРАФИЯ ---
+    def set_key(self, key):
+        """
+        Включает шифр с ключом хранилища, полученным при входе.
+        Если смена ключа была прервана, перешифровка продолжается в фоне с чекпоинта;
+        значения в старом формате (Fernet) переводятся в текущий тем же проходом.
+        """
+        self.cipher = make_cipher(self.vault_repo, key)
+        self.vault_repo.cipher = self.cipher
+        self.repo.cipher = self.cipher
+        if rotation_state(self.vault_repo, key):
+            self.start_rotation_worker()
+        else:
+            self.check_secret_format()
+
+    def check_secret_format(self):
+        """Запускает фоновый перевод секретов в текущий формат (и в конверт, если он включен)."""
+        if self.rotation and self.rotation.is_alive():
+            return
+        if needs_upgrade(self.vault_repo, self.vault_repo.envelope):
+            begin_upgrade(self.vault_repo, self.keyring.key)
+            self.start_rotation_worker()
+
+    def rotate_key(self, password=None):
+        """
+        Смена ключа хранилища: новый ключ начинает действовать сразу,
+        а существующие записи перешифровываются в фоне (см. core.rotation).
+        Бросает WrongPassword, если мастер-пароль не подошел.
+        """
+        if self.rotation and self.rotation.is_alive():
+            return
+        # Отметки использования пишем заранее, чтобы не спорить с фоном за запись
+        self.flush_touches(reschedule=False)
+        self.set_key(begin_rotation(self.vault_repo, self.keyring, password))
+
+    def start_rotation_worker(self):
+        if self.rotation and self.rotation.is_alive():
+            return
+        self.rotation = RotationWorker(self.db.path, self.keyring.key,
+                                       envelope=self.vault_repo.envelope)
+        self.rotation.start()
+        self.root.after(BACKUP_POLL_MS, self._poll_rotation)
+
+    def _poll_rotation(self):
+        """Показывает ход перешифровки в статус-баре."""
+        worker = self.rotation
+        if worker is None:
+            return
+        result = None
+        while not worker.events.empty():
+            event = worker.events.get()
+            if event[0] == "progress":
+                self.status_bar.config(
+                    text=f"Перешифровка записей: {event[1]} из {event[2]}...")
+            else:
+                result = event
+        if result is None:
+            if worker.is_alive():
+                self.root.after(BACKUP_POLL_MS, self._poll_rotation)
+            return
+        kind, info = result[0], result[1]
+        if kind == "done":
+            text = f"Записи перешифрованы: {info}"
+            skipped = result[2]
+            if skipped:
+                ids = ", ".join(map(str, skipped[:10])) + (" ..." if len(skipped) > 10 else "")
+                text += f" (не удалось расшифровать {len(skipped)}: id {ids})"
+            self.status_bar.config(text=text)
+        elif kind == "error":
+            self.status_bar.config(text=f"Ошибка перешифровки (продолжится при следующем входе): {info}")
+        self.rotation = None
+
     def encrypt_password(self, password):
-        """Шифрует пароль."""
-        return self.cipher.encrypt(password.encode()).decode()
+        """Шифрует пароль (bytes формата core.crypto, хранится в БД как BLOB)."""
+        return self.cipher.encrypt(password)
 
     def decrypt_password(self, encrypted_password):
-        """Расшифровывает пароль."""
+        """Расшифровывает пароль (любой поддерживаемый формат)."""
         try:
-            return self.cipher.decrypt(encrypted_password.encode()).decode()
+            return self.cipher.decrypt(encrypted_password)
         except:
             return "Ошибка"
 
+    def make_repo(self, conn):
+        """Репозиторий поверх соединения с шифром и TTL кэша секретов из настроек."""
+        return VaultRepository(conn, cipher=self.cipher,
+                               secret_ttl=self.config.get('secret_cache_ttl_sec', 30),
+                               envelope=self.config.get('secret_envelope', True))
+
+    def reveal_secret(self, pid, field="password"):
+        """Расшифрованное секретное поле записи (через кэш репозитория), "Ошибка" при сбое."""
+        try:
+            return self.repo.reveal(pid, field)
+        except Exception:
+            return "Ошибка"
+
+    def clear_secrets(self):
+        """Стирает все кэшированные расшифрованные значения."""
+        self.vault_repo.secrets.clear()
+        self.repo.secrets.clear()
+
     def update_last_used(self, pid):
-        """Обновляет метку времени последнего использования записи."""
+        """Отмечает использование записи (в БД попадет при ближайшем сбросе)."""
+        if self.browse:
+            return  # Копия открыта только для чтения
+        self.repo.touch([pid])
+
+    def flush_touches(self, reschedule=True):
+        """Сбрасывает накопленные отметки использования в БД (по таймеру, при блокировке и выходе)."""
         try:
-            self.cursor.execute(
-                "UPDATE passwords SET last_used_at = CURRENT_TIMESTAMP WHERE id=?", (pid,))
-            self.conn.commit()
+            self.vault_repo.flush_touches()
         except Exception as e:
             print(f"Error updating last_used: {e}")
+        if reschedule:
+            self.root.after(TOUCH_FLUSH_MS, self.flush_touches)
+
+    def quit_app(self):
+        """Корректный выход: сохраняем отложенные данные и закрываем БД."""
+        self.stop_background_jobs()
+        self.flush_touches(reschedule=False)
+        if self.browse:
+            self._close_browse_conn()
+        self.db.close()
+        self.root.quit()
+
+    # --- ПРОСМОТР КОПИИ (ТОЛЬКО ЧТЕНИЕ) ---
+    def open_backup_file(self):
+        """Выбор файла базы (старый бэкап, .pre_restore) для просмотра."""
+        path = filedialog.askopenfilename(
+            filetypes=[("База данных", "*.db *.pre_restore"), ("Все файлы", "*.*")])
+        if not path:
+            return
+        if os.path.exists(self.db.path) and os.path.samefile(path, self.db.path):
+            messagebox.showinfo("Инфо", "Это текущая база - она уже открыта")
+            return
+        self.browse_backup(path, os.path.basename(path))
+
+    def browse_backup(self, path, label, temp_path=None):
+        """
+        Показывает в обычной таблице и окне деталей записи из файла копии path.
+        Файл открывается как immutable только для чтения (см. core.restore):
+        без копирования и блокировок, поэтому открытие мгновенное.
+        Все изменяющие действия в этом режиме запрещены. temp_path - временный
+        файл, который нужно удалить при закрытии просмотра.
+        """
+        work_dir = os.path.dirname(os.path.abspath(self.db.path))
+        try:
+            conn, migrated_path = open_backup_for_browsing(path, work_dir)
+        except Exception as e:
+            if temp_path:
+                remove_database_file(temp_path)
+            messagebox.showerror("Ошибка", f"Не удалось открыть копию:\n{e}")
+            return
+        if self.browse:
+            self._close_browse_conn()
+        # Отметки использования рабочей базы сохраняем до переключения
+        self.flush_touches(reschedule=False)
+        self.browse = {"conn": conn, "label": label,
+                       "temp": [p for p in (temp_path, migrated_path) if p]}
+        self.repo = self.make_repo(conn)
+        if hasattr(self, 'ui_table'):
+            self.ui_table.checked_items.clear()
+        self.reload_ui()
+
+    def close_browse(self):
+        """Возвращается из просмотра копии к рабочей базе."""
+        if not self.browse:
+            return
+        self._close_browse_conn()
+        self.repo = self.vault_repo
+        self.ui_table.checked_items.clear()
+        self.reload_ui()
+
+    def _close_browse_conn(self):
+        # Поток поиска держит свое соединение с файлом копии
+        if hasattr(self, 'ui_table'):
+            self.ui_table.stop_search()
+        self.browse["conn"].close()
+        for path in self.browse["temp"]:
+            remove_database_file(path)
+        self.browse = None
+
+    def read_only_blocked(self):
+        """True (с подсказкой пользователю), если сейчас открыта копия только для чтения."""
+        if not self.browse:
+            return False
+        messagebox.showinfo("Только чтение",
+                            "Открыт просмотр копии. Закройте просмотр, чтобы изменять данные.")
+        return True
 
     # --- СБОРКА ИНТЕРФЕЙСА ---
     def reload_ui(self):
@@ -237,16 +474,23 @@ class PasswordManager:
         if hasattr(self, 'ui_table'):
             self.ui_table.reload_data()
 
+    def schedule_search(self):
+        """Живой поиск по мере ввода (отложенный, в фоне - см. UITable.request_search)."""
+        if hasattr(self, 'ui_table'):
+            self.ui_table.request_search()
+
     def load_passwords(self):
         """
         Алиас для filter_passwords.
-        ВАЖНО: Используется внешними окнами (AddEditPasswordWindow) для обновления таблицы
-        после сохранения данных.
+        Изменения записей через репозиторий (сохранение, избранное, удаление)
+        таблица применяет сама, по подписке - полная перезагрузка для них не нужна.
         """
         self.filter_passwords()
 
     def add_password(self):
         """Открывает окно добавления."""
+        if self.read_only_blocked():
+            return
         if hasattr(self, 'ui_table'):
             self.ui_table.checked_items.clear()
         self.filter_passwords()
@@ -254,7 +498,7 @@ class PasswordManager:
 
     def edit_password(self):
         """Открывает окно редактирования."""
-        if not hasattr(self, 'ui_table'):
+        if not hasattr(self, 'ui_table') or self.read_only_blocked():
             return
         checked = self.ui_table.checked_items
 
@@ -262,9 +506,8 @@ class PasswordManager:
             pid = list(checked)[0]
             AddEditPasswordWindow(self, mode="edit", password_id=pid)
         elif len(checked) == 0:
-            sel = self.ui_table.tree.selection()
-            if sel:
-                pid = int(self.ui_table.tree.item(sel[0])['tags'][0])
+            pid = self.ui_table.selected_id()
+            if pid is not None:
                 AddEditPasswordWindow(self, mode="edit", password_id=pid)
             else:
                 messagebox.showinfo(
@@ -274,27 +517,32 @@ class PasswordManager:
 
     def delete_password(self):
         """Удаляет выбранные записи."""
-        if not hasattr(self, 'ui_table'):
+        if not hasattr(self, 'ui_table') or self.read_only_blocked():
             return
 
         ids_to_delete = list(self.ui_table.checked_items)
         if not ids_to_delete:
-            sel = self.ui_table.tree.selection()
-            if sel:
-                ids_to_delete = [
-                    int(self.ui_table.tree.item(sel[0])['tags'][0])]
+            pid = self.ui_table.selected_id()
+            if pid is not None:
+                ids_to_delete = [pid]
 
         if not ids_to_delete:
             messagebox.showinfo("Инфо", "Ничего не выбрано для удаления")
             return
 
         if messagebox.askyesno("Удаление", f"Удалить выбранные записи ({len(ids_to_delete)} шт)?"):
-            placeholders = ",".join("?" * len(ids_to_delete))
-            self.cursor.execute(
-                f"DELETE FROM passwords WHERE id IN ({placeholders})", tuple(ids_to_delete))
-            self.conn.commit()
-            self.ui_table.checked_items.clear()
-            self.filter_passwords()
+            def progress(done, total):
+                # Показываем ход удаления в статус-баре (для больших выборок)
+                self.status_bar.config(text=f"Удаление: {done} из {total}...")
+                self.status_bar.update_idletasks()
+
+            try:
+                self.repo.delete(ids_to_delete, progress=progress)
+            except Exception as e:
+                messagebox.showerror("Ошибка", f"Не удалось удалить записи: {e}")
+                self.ui_table.update_status_bar()
+                return
+            # Удаленные строки таблица убирает сама (подписка на изменения репозитория)
 
     def on_global_click(self, event):
         """Сбрасывает выделение при клике в пустое место."""
@@ -368,7 +616,7 @@ class PasswordManager:
         self.root.bind("<Control-i>", lambda e: self.import_csv())
         self.root.bind("<Control-e>", lambda e: self.export_csv())
         self.root.bind("<Control-comma>", lambda e: self.open_settings())
-        self.root.bind("<Control-q>", lambda e: self.root.quit())
+        self.root.bind("<Control-q>", lambda e: self.quit_app())
         self.root.bind("<F11>", lambda e: self.toggle_fullscreen())
         self.root.bind("<Control-f>", lambda e: self.search_entry.focus_set())
 
@@ -395,18 +643,181 @@ class PasswordManager:
                 do_backup = True
 
         if do_backup:
-            try:
-                target_dir = self.config.get('backup_path', '') or "_backup"
-                if not os.path.exists(target_dir):
-                    os.makedirs(target_dir)
-                fname = os.path.join(
-                    target_dir, f"auto_backup_{now.strftime('%Y%m%d_%H%M%S')}.db")
-                if os.path.exists("password_manager.db"):
-                    shutil.copy("password_manager.db", fname)
-                    self.config['last_backup'] = now.strftime('%Y-%m-%d')
-                    save_config(self.config)
-            except:
-                pass
+            self.start_backup(self.backup_dir(), backup_name("auto_backup"),
+                              on_done=self._on_auto_backup_done)
+        else:
+            # Бэкап не нужен - досматриваем копии, которые еще не проверялись
+            self.start_verifier()
+
+    def stop_background_jobs(self):
+        """Прерывает фоновые бэкап, проверку и смену ключа и ждет, пока потоки отпустят файлы."""
+        for worker in (self.backup_worker, self.verifier, self.rotation):
+            if worker and worker.is_alive():
+                worker.cancel()
+                worker.join(BACKUP_JOIN_TIMEOUT)
+
+    def open_restore(self):
+        """Окно восстановления (из режима просмотра сначала возвращаемся к рабочей базе)."""
+        self.close_browse()
+        RestoreWindow(self)
+
+    def restore_database(self, snapshot_path):
+        """
+        Подменяет базу подготовленным файлом копии (см. core.restore.swap_database)
+        и перезагружает список. Менеджер соединения остается тем же,
+        меняется только его соединение.
+
+        Ключ хранилища и мастер-пароль теперь те, что были на момент копии:
+        ключ в памяти относится к прежней базе, поэтому он забывается, шифр
+        отключается до нового входа (см. relogin) и записать в восстановленную
+        базу значение чужим ключом нельзя. Копия без мастер-пароля продолжает
+        работать с текущим ключом (см. rotation.prepare_restore_keys); если ее
+        записи им не открываются, восстановление отменяется до подмены (ValueError).
+        """
+        conn = sqlite3.connect(snapshot_path)
+        try:
+            restore_key = prepare_restore_keys(conn, self.keyring.key, self.cipher.keys)
+        finally:
+            conn.close()
+        self.stop_background_jobs()
+        # Соединение потока поиска держит файл базы: до подмены его закрываем
+        self.ui_table.stop_search()
+        # Отметки использования относятся к заменяемой базе - сохраняем их в ней
+        self.flush_touches(reschedule=False)
+        self.conn = swap_database(self.db, snapshot_path)
+        self.vault_repo.conn = self.conn
+        self.keyring.forget()
+        self.restore_key = restore_key
+        self.cipher = self.vault_repo.cipher = self.repo.cipher = None
+        # Те же id в другой базе - другие данные
+        self.vault_repo.secrets.clear()
+        self.ui_table.checked_items.clear()
+        # Колонки в памяти относятся к старому файлу
+        self.load_columns()
+        self.filter_passwords()
+
+    def relogin(self):
+        """
+        Вход после восстановления базы (restore_database): ключ хранилища
+        достается из восстановленной базы ее мастер-паролем.
+        """
+        key, self.restore_key = self.restore_key, None
+        if not self.keyring.has_password():
+            # В копии пароль не задан - она работает с прежним ключом (он же в файле)
+            self.keyring.use_key(key)
+            self._on_relogin()
+            return
+        self._show_lock_screen(self._on_relogin)
+
+    def _on_relogin(self):
+        # В режиме без пароля при входе файл ключа должен хранить ключ этой базы
+        self.keyring.set_keep_key_file(self.keyring.keep_key_file)
+        self.last_activity = datetime.now()
+        self.start_app()
+
+    def backup_dir(self):
+        """Папка хранилища бэкапов из настроек."""
+        return self.config.get('backup_path', '') or "_backup"
+
+    def _on_auto_backup_done(self, ok, info):
+        """Запоминает дату успешного авто-бэкапа."""
+        if ok:
+            self.config['last_backup'] = datetime.now().strftime('%Y-%m-%d')
+            save_config(self.config)
+
+    def start_backup(self, target_dir, name, on_done=None):
+        """
+        Запускает инкрементальный бэкап БД (снимок name в хранилище target_dir)
+        в фоновом потоке (см. core.backup). Там же удаляются копии,
+        вышедшие за политику хранения из настроек.
+        Ход и результат показываются в статус-баре; on_done(успех, имя_или_ошибка)
+        вызывается в главном потоке. Возвращает False, если бэкап уже идет.
+        """
+        if self.backup_worker and self.backup_worker.is_alive():
+            return False
+        # Отложенные отметки использования тоже должны попасть в копию
+        self.flush_touches(reschedule=False)
+        retention = (self.config.get('backup_keep_daily', 0),
+                     self.config.get('backup_keep_weekly', 0),
+                     self.config.get('backup_keep_monthly', 0))
+        self.backup_worker = BackupWorker(self.db.path, target_dir, name,
+                                          retention=retention)
+        self.backup_on_done = on_done
+        self.backup_prune_error = None
+        self.backup_worker.start()
+        self.root.after(BACKUP_POLL_MS, self._poll_backup)
+        return True
+
+    def _poll_backup(self):
+        """Забирает события фонового бэкапа и показывает их в статус-баре."""
+        worker = self.backup_worker
+        if worker is None:
+            return
+        result = None
+        while not worker.events.empty():
+            event = worker.events.get()
+            if event[0] == "progress":
+                self.status_bar.config(
+                    text=f"Резервное копирование: {event[1]}%...")
+            elif event[0] == "prune_error":
+                self.backup_prune_error = event[1]
+            else:
+                result = event
+
+        if result is None:
+            if worker.is_alive():
+                self.root.after(BACKUP_POLL_MS, self._poll_backup)
+            return
+
+        kind, info = result
+        if kind == "done":
+            text = f"Резервная копия создана: {info}"
+            if self.backup_prune_error:
+                text += f" (старые копии не удалены: {self.backup_prune_error})"
+            self.status_bar.config(text=text)
+        elif kind == "error":
+            self.status_bar.config(text=f"Ошибка резервного копирования: {info}")
+        self.backup_worker = None
+        on_done, self.backup_on_done = self.backup_on_done, None
+        if on_done and kind != "cancelled":
+            on_done(kind == "done", info)
+        if kind == "done":
+            # Новую копию сразу проверяем в фоне
+            self.start_verifier()
+
+    def start_verifier(self):
+        """Запускает фоновую проверку еще не проверенных бэкапов (см. core.verifier)."""
+        if self.verifier and self.verifier.is_alive():
+            return
+        # До входа ключа еще нет - расшифровку проверить нечем
+        if self.cipher is None or not os.path.isdir(self.backup_dir()):
+            return
+        share = self.config.get('backup_verify_percent', 10) / 100
+        self.verifier = BackupVerifier(
+            self.backup_dir(), os.path.dirname(os.path.abspath(self.db.path)),
+            self.cipher, sample_share=share)
+        self.verifier.start()
+        self.root.after(BACKUP_POLL_MS, self._poll_verifier)
+
+    def _poll_verifier(self):
+        """Забирает итоги фоновой проверки; сбои показываются в статус-баре."""
+        verifier = self.verifier
+        if verifier is None:
+            return
+        changed = False
+        while not verifier.events.empty():
+            event = verifier.events.get()
+            if event[0] == "failed":
+                self.backup_failures[event[1]] = event[2]
+            else:
+                self.backup_failures.pop(event[1], None)
+            changed = True
+        if changed and hasattr(self, 'ui_table'):
+            self.ui_table.update_status_bar()
+        if verifier.is_alive() or not verifier.events.empty():
+            self.root.after(BACKUP_POLL_MS, self._poll_verifier)
+        else:
+            self.verifier = None
 
     def export_csv(self):
         """Экспорт в CSV."""
@@ -415,28 +826,22 @@ class PasswordManager:
         if not file_path:
             return
         try:
-            self.cursor.execute("SELECT * FROM passwords")
-            rows = self.cursor.fetchall()
-            col_names = [d[0] for d in self.cursor.description]
+            # В файл должны попасть и еще не сброшенные отметки использования
+            self.flush_touches(reschedule=False)
+            # Секретные поля сразу в открытом виде: одна расшифровка на запись
+            col_names, rows = self.repo.export_rows(decrypt=True)
             with open(file_path, mode='w', newline='', encoding='utf-8-sig') as file:
                 writer = csv.writer(file)
                 writer.writerow(col_names)
-                enc_idx = col_names.index(
-                    "password") if "password" in col_names else -1
-                for row in rows:
-                    rl = list(row)
-                    if enc_idx != -1 and rl[enc_idx]:
-                        try:
-                            rl[enc_idx] = self.decrypt_password(rl[enc_idx])
-                        except:
-                            pass
-                    writer.writerow(rl)
+                writer.writerows(rows)
             messagebox.showinfo("Экспорт", "Успешно!")
         except Exception as e:
             messagebox.showerror("Ошибка", str(e))
 
     def import_csv(self):
         """Импорт из CSV."""
+        if self.read_only_blocked():
+            return
         file_path = filedialog.askopenfilename(
             filetypes=[("CSV files", "*.csv")])
         if not file_path:
@@ -444,20 +849,18 @@ class PasswordManager:
         try:
             with open(file_path, mode='r', encoding='utf-8-sig') as file:
                 reader = csv.DictReader(file)
-                c = 0
+                # Только известные поля записи: иначе любой заголовок CSV
+                # стал бы полем записи в record_fields (и в окне деталей)
+                names = [n for n in reader.fieldnames or [] if n != 'id']
+                skipped = [n for n in names if not is_record_field(n)]
+                rows = []
                 for row in reader:
-                    if 'id' in row:
-                        del row['id']
-                    if 'password' in row and row['password']:
-                        row['password'] = self.encrypt_password(
-                            row['password'])
-                    cols = ', '.join(row.keys())
-                    placeholders = ', '.join(['?'] * len(row))
-                    self.cursor.execute(
-                        f"INSERT INTO passwords ({cols}) VALUES ({placeholders})", list(row.values()))
-                    c += 1
-                self.conn.commit()
-                self.filter_passwords()
-                messagebox.showinfo("Импорт", f"Добавлено: {c}")
+                    row = {k: v for k, v in row.items() if k != 'id' and is_record_field(k)}
+                    rows.append(self.vault_repo.seal(row))
+                c = self.vault_repo.import_rows(rows)
+                text = f"Добавлено: {c}"
+                if skipped:
+                    text += f"\nПропущены неизвестные колонки: {', '.join(skipped)}"
+                messagebox.showinfo("Импорт", text)
         except Exception as e:
             messagebox.showerror("Ошибка", str(e))
@@ -24,6 +24,20 @@ def load_config():
         "last_backup": "",              # Дата последнего бэкапа
         # Куда сохранять бэкапы (пусто = _backup)
         "backup_path": "",
+        # Политика хранения бэкапов: сколько последних дней/недель/месяцев держать
+        "backup_keep_daily": 7,
+        "backup_keep_weekly": 4,
+        "backup_keep_monthly": 6,
+        # Сколько процентов секретных полей расшифровывать при проверке бэкапа
+        "backup_verify_percent": 10,
+        # Надежность записи в БД (см. database.DURABILITY_MODES)
+        "db_durability": "Обычная (быстрее)",
+        # Сколько секунд держать расшифрованные пароли в памяти (0 - не держать)
+        "secret_cache_ttl_sec": 30,
+        # Секретные поля записи хранить одним шифротекстом (конвертом)
+        "secret_envelope": True,
+        # Желаемое время разблокировки (мс): под него подбирается стоимость scrypt
+        "unlock_target_ms": 300,
         "notify_expired": True,         # Подсвечивать старые пароли
         "notify_weak": True             # Предупреждать о слабых паролях
     }
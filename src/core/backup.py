@@ -0,0 +1,187 @@
+import os
+import queue
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime
+from src.database import BUSY_TIMEOUT_MS
+from src.core.chunk_store import ChunkStore
+
+# Сколько страниц БД копировать за один шаг backup API.
+# Между шагами вызывается progress - там интерфейс успевает обработать события.
+BACKUP_PAGES = 256
+
+
+class BackupCancelled(Exception):
+    """Бэкап прерван (например, пользователь закрывает приложение)."""
+
+
+def backup_name(prefix):
+    """Имя нового снимка: <prefix>_ГГГГММДД_ЧЧММСС."""
+    return f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+
+def snapshot_time(name):
+    """Время создания снимка из его имени (или None, если имя не по шаблону)."""
+    try:
+        return datetime.strptime(name[-15:], "%Y%m%d_%H%M%S")
+    except ValueError:
+        return None
+
+
+def expired_snapshots(names, keep_daily, keep_weekly, keep_monthly):
+    """
+    Политика хранения "дни / недели / месяцы".
+    Оставляет самый свежий снимок в каждом из keep_daily последних дней,
+    keep_weekly последних недель и keep_monthly последних месяцев (в которых
+    вообще были снимки); самый новый снимок остается всегда.
+    Возвращает имена снимков, которые можно удалить.
+    Если все три числа равны 0, ничего не удаляется.
+    Снимки с нестандартными именами политика не трогает.
+    """
+    if not (keep_daily or keep_weekly or keep_monthly):
+        return []
+    dated = sorted(((snapshot_time(n), n) for n in names if snapshot_time(n)),
+                   reverse=True)
+    if not dated:
+        return []
+
+    keep = {dated[0][1]}
+    rules = [
+        (keep_daily, lambda t: t.date()),
+        (keep_weekly, lambda t: t.isocalendar()[:2]),
+        (keep_monthly, lambda t: (t.year, t.month)),
+    ]
+    for limit, period in rules:
+        seen = set()
+        for ts, name in dated:  # от новых к старым: первый в периоде - самый свежий
+            if len(seen) >= limit:
+                break
+            key = period(ts)
+            if key not in seen:
+                seen.add(key)
+                keep.add(name)
+    return [name for _, name in dated if name not in keep]
+
+
+def backup_database(conn, target_path, progress=None, pages=BACKUP_PAGES):
+    """
+    Онлайн-копия открытой БД через sqlite3 backup API.
+    В отличие от копирования файла, получается согласованный снимок даже во время
+    записи в базу (и с учетом данных, еще лежащих в WAL-журнале).
+    Копия пишется во временный файл и переименовывается только после успеха,
+    поэтому по пути target_path никогда не окажется недописанный файл.
+
+    progress(скопировано_страниц, всего_страниц) вызывается после каждых pages страниц;
+    исключение из него (например, BackupCancelled) прерывает бэкап.
+    """
+    target_dir = os.path.dirname(target_path)
+    if target_dir:
+        os.makedirs(target_dir, exist_ok=True)
+    tmp_path = target_path + ".part"
+    dest = sqlite3.connect(tmp_path)
+    try:
+        def on_step(status, remaining, total):
+            if progress:
+                progress(total - remaining, total)
+
+        conn.backup(dest, pages=pages, progress=on_step)
+        # Копия - самостоятельный файл без WAL-журнала рядом
+        dest.execute("PRAGMA journal_mode=DELETE")
+        dest.close()
+        os.replace(tmp_path, target_path)
+    except BaseException:
+        dest.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class BackupWorker(threading.Thread):
+    """
+    Фоновый инкрементальный бэкап: копирование идет в отдельном потоке через
+    собственное соединение, интерфейс не ждет его ни при запуске, ни во время работы.
+    Сначала делается согласованный снимок БД во временный файл рядом с базой,
+    затем он раскладывается по сжатым кускам в ChunkStore папки бэкапов
+    (на диск бэкапов пишутся только изменившиеся куски), после чего
+    по политике хранения удаляются старые снимки.
+    Поток не трогает Tk: события ("progress", процент), ("prune_error", текст),
+    ("done", имя_снимка), ("cancelled", None) и ("error", текст) кладутся
+    в очередь events, которую главный поток опрашивает через root.after.
+    """
+
+    def __init__(self, db_path, store_dir, name, retention=None, pages=BACKUP_PAGES):
+        super().__init__(daemon=True)
+        self.db_path = db_path
+        self.store = ChunkStore(store_dir)
+        self.name = name
+        # (дней, недель, месяцев) для expired_snapshots; None - не чистить старые копии
+        self.retention = retention
+        self.pages = pages
+        self.events = queue.Queue()
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        """Просит поток остановиться (после текущей порции страниц или куска)."""
+        self._cancel.set()
+
+    def _progress(self, start, span):
+        """progress-функция для этапа, занимающего [start, start+span] процентов."""
+        def report(done, total):
+            if self._cancel.is_set():
+                raise BackupCancelled()
+            share = done / total if total else 1
+            self.events.put(("progress", int(start + span * share)))
+        return report
+
+    def run(self):
+        tmp_path = None
+        conn = None
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+            # Держим транзакцию чтения на всё время копирования: в режиме WAL это
+            # фиксирует снимок, и запись из приложения не заставляет бэкап начинаться заново
+            conn.execute("BEGIN")
+            conn.execute("SELECT count(*) FROM sqlite_master").fetchone()
+
+            # Временный снимок - на локальном диске рядом с базой, а не в папке бэкапов
+            fd, tmp_path = tempfile.mkstemp(
+                prefix=".snapshot_", suffix=".db",
+                dir=os.path.dirname(os.path.abspath(self.db_path)))
+            os.close(fd)
+            backup_database(conn, tmp_path, progress=self._progress(0, 50),
+                            pages=self.pages)
+            # Число записей снимка - для каталога (видно при выборе копии для восстановления)
+            records = conn.execute("SELECT count(*) FROM passwords").fetchone()[0]
+            conn.close()
+            conn = None
+
+            manifest = self.store.add_snapshot(tmp_path, self.name,
+                                               progress=self._progress(50, 50))
+            self.store.update_catalog(
+                self.name, created_at=manifest["created_at"], records=records,
+                size=manifest["size"], sha256=manifest["sha256"])
+            if self.retention:
+                self.prune()
+            self.events.put(("done", self.name))
+        except BackupCancelled:
+            self.events.put(("cancelled", None))
+        except Exception as e:
+            self.events.put(("error", str(e)))
+        finally:
+            if conn is not None:
+                conn.close()
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def prune(self):
+        """Удаляет снимки, вышедшие за политику хранения, и ставшие ненужными куски."""
+        try:
+            for name in expired_snapshots(self.store.list_snapshots(), *self.retention):
+                self.store.delete_snapshot(name)
+            self.store.collect_garbage()
+        except (OSError, ValueError) as e:
+            # Неудачная чистка не отменяет уже сделанную копию
+            # (ValueError - испорченный манифест какого-то снимка)
+            self.events.put(("prune_error", str(e)))
@@ -0,0 +1,219 @@
+import hashlib
+import json
+import os
+import threading
+import zlib
+from datetime import datetime
+
+# Размер куска файла БД. Кратен размеру страницы SQLite (4096), поэтому изменение
+# одной страницы меняет ровно один кусок, а остальные куски остаются прежними.
+CHUNK_SIZE = 64 * 1024
+# Версия формата манифеста (2 - куски сжаты zlib)
+MANIFEST_VERSION = 2
+# Уровень сжатия кусков: страницы SQLite с текстом и base64-шифротекстом жмутся хорошо
+COMPRESS_LEVEL = 6
+# Расширение файла сжатого куска (куски старого формата v1 лежат без расширения)
+COMPRESSED_EXT = ".z"
+# Каталог снимков (сводка по каждому бэкапу и результаты проверок)
+CATALOG_FILE = "catalog.json"
+
+# Каталог читают и пишут разные фоновые потоки (бэкап, проверка)
+_catalog_lock = threading.Lock()
+
+
+class ChunkStore:
+    """
+    Хранилище инкрементальных бэкапов с дедупликацией.
+
+    Файл БД режется на куски по CHUNK_SIZE, каждый кусок хранится один раз
+    под именем SHA-256 исходных данных (chunks/ab/abcdef....z) в сжатом виде.
+    Сжимается каждый кусок отдельно, поэтому вся база в память не загружается.
+    Сам бэкап - это манифест (snapshots/<имя>.json) со списком хэшей кусков
+    по порядку и хэшем всего файла.
+    Новый бэкап дописывает только куски, которых еще нет в хранилище,
+    а восстановление склеивает куски и проверяет, что файл совпал побайтно.
+    Рядом лежит каталог (catalog.json): краткие сведения о каждом снимке
+    (дата, число записей, размер, контрольная сумма, итог последней проверки).
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.chunks_dir = os.path.join(root, "chunks")
+        self.snapshots_dir = os.path.join(root, "snapshots")
+        self.catalog_path = os.path.join(root, CATALOG_FILE)
+
+    # --- ЗАПИСЬ ---
+
+    def chunk_path(self, digest, compressed=True):
+        """Путь к файлу куска (раскладка по подпапкам из первых двух символов хэша)."""
+        name = digest + COMPRESSED_EXT if compressed else digest
+        return os.path.join(self.chunks_dir, digest[:2], name)
+
+    def manifest_path(self, name):
+        return os.path.join(self.snapshots_dir, name + ".json")
+
+    def _write_atomic(self, path, data):
+        """Пишет файл целиком через временный файл (недописанных файлов не бывает)."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".part"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def add_snapshot(self, src_path, name, progress=None):
+        """
+        Сохраняет файл src_path как снимок name. Возвращает манифест (словарь).
+        progress(обработано_байт, всего_байт) вызывается после каждого куска;
+        исключение из него прерывает запись (манифест при этом не создается).
+        """
+        total = os.path.getsize(src_path)
+        file_hash = hashlib.sha256()
+        chunks = []
+        new_chunks = 0
+        stored = 0  # сколько байт реально записано в хранилище
+        done = 0
+        with open(src_path, "rb") as f:
+            while True:
+                data = f.read(CHUNK_SIZE)
+                if not data:
+                    break
+                file_hash.update(data)
+                digest = hashlib.sha256(data).hexdigest()
+                path = self.chunk_path(digest)
+                # Дедупликация: такой кусок уже есть - просто ссылаемся на него
+                if not os.path.exists(path):
+                    packed = zlib.compress(data, COMPRESS_LEVEL)
+                    self._write_atomic(path, packed)
+                    new_chunks += 1
+                    stored += len(packed)
+                chunks.append(digest)
+                done += len(data)
+                if progress:
+                    progress(done, total)
+
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "name": name,
+            "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "size": total,
+            "sha256": file_hash.hexdigest(),
+            "chunk_size": CHUNK_SIZE,
+            "compression": "zlib",
+            "new_chunks": new_chunks,
+            "stored_bytes": stored,
+            "chunks": chunks,
+        }
+        # Манифест пишется последним: снимок появляется, только когда все куски на месте
+        self._write_atomic(self.manifest_path(name),
+                           json.dumps(manifest, indent=1).encode("utf-8"))
+        return manifest
+
+    # --- ЧТЕНИЕ ---
+
+    def list_snapshots(self):
+        """Имена снимков (от старых к новым)."""
+        if not os.path.isdir(self.snapshots_dir):
+            return []
+        return sorted(f[:-5] for f in os.listdir(self.snapshots_dir)
+                      if f.endswith(".json"))
+
+    def read_manifest(self, name):
+        with open(self.manifest_path(name), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def restore(self, name, target_path):
+        """
+        Собирает снимок name в файл target_path.
+        Каждый кусок и весь файл сверяются с хэшами из манифеста;
+        при несовпадении бросается ValueError, а target_path не создается.
+        """
+        manifest = self.read_manifest(name)
+        compressed = manifest.get("compression") == "zlib"
+        file_hash = hashlib.sha256()
+        tmp = target_path + ".part"
+        try:
+            with open(tmp, "wb") as out:
+                for digest in manifest["chunks"]:
+                    with open(self.chunk_path(digest, compressed), "rb") as f:
+                        data = f.read()
+                    if compressed:
+                        data = zlib.decompress(data)
+                    if hashlib.sha256(data).hexdigest() != digest:
+                        raise ValueError(f"Поврежден кусок бэкапа {digest}")
+                    file_hash.update(data)
+                    out.write(data)
+            if file_hash.hexdigest() != manifest["sha256"]:
+                raise ValueError(f"Контрольная сумма снимка {name} не совпадает")
+            os.replace(tmp, target_path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return manifest
+
+    # --- КАТАЛОГ ---
+
+    def read_catalog(self):
+        """Каталог снимков {имя: сведения}; пустой, если файла еще нет или он испорчен."""
+        try:
+            with open(self.catalog_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def update_catalog(self, name, **fields):
+        """Дополняет сведения о снимке name в каталоге."""
+        with _catalog_lock:
+            catalog = self.read_catalog()
+            catalog.setdefault(name, {}).update(fields)
+            self._write_atomic(self.catalog_path,
+                               json.dumps(catalog, indent=1, ensure_ascii=False).encode("utf-8"))
+
+    def _drop_from_catalog(self, name):
+        with _catalog_lock:
+            catalog = self.read_catalog()
+            if catalog.pop(name, None) is not None:
+                self._write_atomic(self.catalog_path,
+                                   json.dumps(catalog, indent=1, ensure_ascii=False).encode("utf-8"))
+
+    # --- УДАЛЕНИЕ ---
+
+    def delete_snapshot(self, name):
+        """Удаляет манифест снимка и его строку в каталоге (куски удаляет collect_garbage)."""
+        path = self.manifest_path(name)
+        if os.path.exists(path):
+            os.remove(path)
+        self._drop_from_catalog(name)
+
+    def collect_garbage(self):
+        """
+        Удаляет куски, на которые не ссылается ни один манифест,
+        и брошенные временные файлы. Возвращает число удаленных файлов.
+        Вызывать только когда в хранилище никто не пишет.
+        """
+        alive = set()
+        for name in self.list_snapshots():
+            manifest = self.read_manifest(name)
+            compressed = manifest.get("compression") == "zlib"
+            alive.update(self.chunk_path(d, compressed) for d in manifest["chunks"])
+
+        removed = 0
+        if os.path.isdir(self.snapshots_dir):
+            for fname in os.listdir(self.snapshots_dir):
+                if fname.endswith(".part"):
+                    os.remove(os.path.join(self.snapshots_dir, fname))
+                    removed += 1
+        if not os.path.isdir(self.chunks_dir):
+            return removed
+        for sub in os.listdir(self.chunks_dir):
+            sub_dir = os.path.join(self.chunks_dir, sub)
+            if not os.path.isdir(sub_dir):
+                continue
+            for fname in os.listdir(sub_dir):
+                path = os.path.join(sub_dir, fname)
+                if path not in alive:
+                    os.remove(path)
+                    removed += 1
+            if not os.listdir(sub_dir):
+                os.rmdir(sub_dir)
+        return removed
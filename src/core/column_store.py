@@ -0,0 +1,333 @@
+import bisect
+
+try:
+    import numpy as np
+except ImportError:  # Без NumPy список строится запросами к SQLite, как раньше
+    np = None
+
+from src.core.repository import (DEFAULT_ORDER, LAST_USED_SORTS, LIST_COLUMNS, SORT_ORDERS,
+                                  sql_value_key)
+
+# Колонки, которые читаются в хранилище: колонки списка + время использования
+STORE_COLUMNS = LIST_COLUMNS + ("last_used_at",)
+ID_COL = LIST_COLUMNS.index("id")
+# Колонки-отметки времени (ключ сортировки - datetime64 в микросекундах)
+TIMESTAMP_COLUMNS = ("created_at", "updated_at", "last_used_at")
+# Текстовые колонки сортировки (ключ - ранг значения, см. _Collation)
+COLLATED_COLUMNS = ("name", "username")
+# Сколько id читать одним SELECT ... IN (...) при обновлении
+FETCH_CHUNK = 500
+
+
+def _parse_timestamps(values):
+    """Отметки времени -> int64 (мкс); NULL и нераспознанные - наименьшее значение, как NULL в SQLite."""
+    try:
+        parsed = np.array([v if v else "NaT" for v in values], dtype="datetime64[us]")
+    except (ValueError, TypeError):
+        parsed = np.empty(len(values), dtype="datetime64[us]")
+        for i, v in enumerate(values):
+            try:
+                parsed[i] = np.datetime64(v, "us") if v else np.datetime64("NaT")
+            except (ValueError, TypeError):
+                parsed[i] = np.datetime64("NaT")
+    # NaT в int64 - минимальное число, то есть "раньше всех"
+    return parsed.astype(np.int64)
+
+
+class _Collation:
+    """
+    Ключи сортировки текстовой колонки: ранг значения в порядке ORDER BY SQLite
+    (NULL, числа, текст побайтно - см. sql_value_key). Ранги дробные: новое
+    значение получает середину между соседями, поэтому запись через приложение
+    не требует пересчета всех ключей. Если между соседями не осталось места,
+    возвращается None и колонка пересчитывается целиком.
+    """
+
+    def __init__(self, values):
+        self.values = sorted(set(values), key=sql_value_key)
+        self.keys = [sql_value_key(v) for v in self.values]
+        self.ranks = {v: float(i) for i, v in enumerate(self.values)}
+
+    def key(self, value):
+        rank = self.ranks.get(value)
+        if rank is not None:
+            return rank
+        k = sql_value_key(value)
+        i = bisect.bisect_left(self.keys, k)
+        lo = self.ranks[self.values[i - 1]] if i > 0 else -1.0
+        hi = self.ranks[self.values[i]] if i < len(self.values) else lo + 2.0
+        rank = (lo + hi) / 2
+        if not lo < rank < hi:
+            return None
+        self.values.insert(i, value)
+        self.keys.insert(i, k)
+        self.ranks[value] = rank
+        return rank
+
+
+class ColumnStore:
+    """
+    Колонки списка записей в памяти (NumPy) для фильтра по типу и сортировок
+    без запроса к SQLite.
+
+    Загружается один раз после разблокировки (load) и очищается при блокировке
+    (clear). Тип записи хранится кодом, избранное - флагом, отметки времени -
+    datetime64, для сортировок по названию и логину заранее посчитаны ранги
+    значений (collation keys). Фильтр - булева маска, сортировка - np.lexsort
+    по ключам, поэтому смена фильтра или сортировки на сотнях тысяч записей
+    занимает миллисекунды. Полный порядок по каждой сортировке считается один раз
+    и запоминается до следующего изменения записей: смена фильтра - это только
+    выборка из готовой перестановки по маске. Готовые строки списка (кортежи
+    LIST_COLUMNS) хранятся по позициям; результат выдается видом RowView, который
+    достает строки лишь при обращении (таблица рисует только видимое окно).
+
+    Изменения записей через репозиторий применяются точечно (apply, touch):
+    строки перечитываются по id, удаленные помечаются неживыми.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    @staticmethod
+    def available():
+        """Есть ли NumPy (без него хранилище не используется)."""
+        return np is not None
+
+    @property
+    def loaded(self):
+        return self._rows is not None
+
+    def clear(self):
+        """Забывает все данные (блокировка приложения)."""
+        self._rows = None
+        self._pos = {}
+        self._types = {}
+        self._collations = {}
+        self.alive = self.type_code = self.favorite = self.id_array = None
+        self.times = {}
+        self.collated = {}
+        # Перестановки всех позиций по сортировкам: {сортировка: позиции}
+        self._orders = {}
+
+    def __len__(self):
+        return int(self.alive.sum()) if self.loaded else 0
+
+    # --- ЗАГРУЗКА ---
+
+    def load(self, conn):
+        """Читает колонки списка всех записей."""
+        rows = conn.execute(
+            f"SELECT {', '.join(STORE_COLUMNS)} FROM passwords ORDER BY id").fetchall()
+        self._rows = [row[:len(LIST_COLUMNS)] for row in rows]
+        self._pos = {row[ID_COL]: i for i, row in enumerate(rows)}
+        self.id_array = np.array([row[ID_COL] for row in rows], dtype=np.int64)
+        self.alive = np.ones(len(rows), dtype=bool)
+        self._orders = {}
+
+        self._types = {}
+        columns = list(zip(*rows)) if rows else [()] * len(STORE_COLUMNS)
+        values = dict(zip(STORE_COLUMNS, columns))
+        self.type_code = np.array([self._type_code(t) for t in values["type"]], dtype=np.int16)
+        self.favorite = np.array([1 if f else 0 for f in values["is_favorite"]], dtype=np.int8)
+        self.times = {c: _parse_timestamps(values[c]) for c in TIMESTAMP_COLUMNS}
+        for c in COLLATED_COLUMNS:
+            self._collate(c, values[c])
+
+    def _type_code(self, ptype):
+        return self._types.setdefault(ptype, len(self._types))
+
+    def _collate(self, column, values):
+        """Пересчитывает ранги колонки column по всем значениям."""
+        coll = self._collations[column] = _Collation(values)
+        self.collated[column] = np.array([coll.ranks[v] for v in values], dtype=np.float64)
+
+    # --- ТОЧЕЧНЫЕ ОБНОВЛЕНИЯ ---
+
+    def apply(self, kind, ids, conn):
+        """Изменения записей ids (см. VaultRepository.subscribe): "changed" или "deleted"."""
+        if not self.loaded:
+            return
+        if kind == "deleted":
+            for pid in ids:
+                pos = self._pos.pop(pid, None)
+                if pos is not None:
+                    self.alive[pos] = False
+            return
+        ids = list(ids)
+        for start in range(0, len(ids), FETCH_CHUNK):
+            chunk = ids[start:start + FETCH_CHUNK]
+            rows = conn.execute(
+                f"SELECT {', '.join(STORE_COLUMNS)} FROM passwords "
+                f"WHERE id IN ({','.join('?' * len(chunk))})", chunk).fetchall()
+            found = {row[ID_COL] for row in rows}
+            self.apply("deleted", [pid for pid in chunk if pid not in found], conn)
+            self._upsert(rows)
+
+    def touch(self, items):
+        """Записанные в БД отметки использования {id: время}."""
+        if not self.loaded:
+            return
+        keys = self.times["last_used_at"]
+        self._orders.clear()
+        for pid, ts in items.items():
+            pos = self._pos.get(pid)
+            if pos is not None:
+                keys[pos] = _parse_timestamps([ts])[0]
+
+    def _upsert(self, rows):
+        """Обновляет позиции существующих записей, новые дописывает в конец."""
+        # Удаление только снимает флаг alive и порядок не ломает, а тут ключи меняются
+        self._orders.clear()
+        new = [row for row in rows if row[ID_COL] not in self._pos]
+        if new:
+            n = len(self._rows)
+            self._rows.extend([None] * len(new))
+            for i, row in enumerate(new):
+                self._pos[row[ID_COL]] = n + i
+            grow = len(new)
+            self.id_array = np.concatenate(
+                [self.id_array, np.array([row[ID_COL] for row in new], dtype=np.int64)])
+            self.alive = np.concatenate([self.alive, np.zeros(grow, dtype=bool)])
+            self.type_code = np.concatenate([self.type_code, np.zeros(grow, dtype=np.int16)])
+            self.favorite = np.concatenate([self.favorite, np.zeros(grow, dtype=np.int8)])
+            self.times = {c: np.concatenate([a, np.zeros(grow, dtype=np.int64)])
+                          for c, a in self.times.items()}
+            self.collated = {c: np.concatenate([a, np.zeros(grow)])
+                             for c, a in self.collated.items()}
+
+        rebuild = set()
+        for row in rows:
+            values = dict(zip(STORE_COLUMNS, row))
+            pos = self._pos[row[ID_COL]]
+            self._rows[pos] = row[:len(LIST_COLUMNS)]
+            self.alive[pos] = True
+            self.type_code[pos] = self._type_code(values["type"])
+            self.favorite[pos] = 1 if values["is_favorite"] else 0
+            for c in TIMESTAMP_COLUMNS:
+                self.times[c][pos] = _parse_timestamps([values[c]])[0]
+            for c in COLLATED_COLUMNS:
+                rank = self._collations[c].key(values[c])
+                if rank is None:
+                    rebuild.add(c)
+                else:
+                    self.collated[c][pos] = rank
+        for c in rebuild:
+            self._collate(c, [r[LIST_COLUMNS.index(c)] for r in self._rows])
+
+    # --- СПИСОК ---
+
+    def _sort_key(self, column):
+        if column in TIMESTAMP_COLUMNS:
+            return self.times[column]
+        if column in self.collated:
+            return self.collated[column]
+        if column == "is_favorite":
+            return self.favorite
+        return None
+
+    def list_rows(self, ptype=None, sort=None, touches=None):
+        """
+        Строки списка (RowView из кортежей LIST_COLUMNS) с фильтром по типу и
+        сортировкой sort, как VaultRepository.list_rows без поиска. touches -
+        несохраненные отметки использования (TouchBuffer) для сортировок по
+        последнему использованию. Возвращает None, если сортировку хранилище
+        не поддерживает.
+        """
+        spec = SORT_ORDERS.get(sort, DEFAULT_ORDER)
+        order = self._orders.get(spec)
+        if order is None:
+            order = self._sort(spec)
+            if order is None:
+                return None
+            self._orders[spec] = order
+
+        mask = self.alive
+        if ptype and ptype != "Все":
+            code = self._types.get(ptype)
+            mask = mask & (self.type_code == code) if code is not None else np.zeros_like(mask)
+        # Порядок по всем позициям, из него - только подходящие под фильтр
+        order = order[mask[order]]
+
+        if touches is not None and touches.pending and sort in LAST_USED_SORTS:
+            order = self._with_touches(order, mask, touches, LAST_USED_SORTS[sort])
+        return RowView(self._rows, order, self.id_array[order])
+
+    def _sort(self, spec):
+        """Все позиции (и удаленные) в порядке ORDER BY spec или None."""
+        keys = []
+        for part in spec.split(","):
+            column, direction = part.split()
+            key = self._sort_key(column)
+            if key is None:
+                return None
+            if direction == "DESC":
+                # ~ для int64 переворачивает порядок без переполнения на минимуме
+                key = ~key if key.dtype == np.int64 else -key.astype(np.float64)
+            keys.append(key)
+        # При равных ключах порядок - как у SQLite: индекс сортировки (LIST_INDEXES,
+        # последняя колонка по возрастанию) при DESC в последней колонке читается
+        # с конца, и равные строки идут по убыванию id, иначе - по возрастанию
+        ids = ~self.id_array if direction == "DESC" else self.id_array
+        # lexsort: главный ключ - последний
+        return np.lexsort([ids] + keys[::-1])
+
+    def _with_touches(self, order, mask, touches, newest_first):
+        """Как TouchBuffer.order_rows: записи с несохраненной отметкой - в начало или конец."""
+        touched = [self._pos[pid] for pid in touches.pending if pid in self._pos]
+        touched = np.array([p for p in touched if mask[p]], dtype=order.dtype)
+        if not len(touched):
+            return order
+        rest = order[~np.isin(order, touched)]
+        if newest_first:
+            return np.concatenate([touched[::-1], rest])
+        return np.concatenate([rest, touched])
+
+
+class RowView:
+    """
+    Строки результата ColumnStore.list_rows в порядке позиций order. Поддерживает
+    len, индекс и срез (список кортежей); кортежи не копируются, а достаются по
+    позиции при обращении. ids - id строк в том же порядке (IdView).
+    """
+
+    def __init__(self, rows, order, ids):
+        self._rows = rows
+        self._order = order
+        self.ids = IdView(ids)
+
+    def __len__(self):
+        return len(self._order)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            rows = self._rows
+            return [rows[p] for p in self._order[index].tolist()]
+        return self._rows[self._order[index]]
+
+    def __iter__(self):
+        rows = self._rows
+        return (rows[p] for p in self._order.tolist())
+
+
+class IdView:
+    """id строк RowView: len, индекс, перебор и index() как у списка."""
+
+    def __init__(self, ids):
+        self._ids = ids
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._ids[index].tolist()
+        return int(self._ids[index])
+
+    def __iter__(self):
+        return iter(self._ids.tolist())
+
+    def index(self, pid):
+        found = np.flatnonzero(self._ids == pid)
+        if not len(found):
+            raise ValueError(f"{pid} is not in list")
+        return int(found[0])
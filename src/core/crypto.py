@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+from cryptography.fernet import Fernet, MultiFernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+# Формат шифротекста v2 (BLOB):
+#   версия (1 байт) | id ключа (4) | nonce (12) | AES-256-GCM шифротекст + тег (16)
+# Старый формат - токен Fernet (base64-строка, начинается с "gAAAAA").
+FORMAT_GCM = 2
+KEY_ID_SIZE = 4
+NONCE_SIZE = 12
+HEADER_SIZE = 1 + KEY_ID_SIZE + NONCE_SIZE
+# Контекст HKDF: ключ AES-GCM выводится из ключа хранилища (Fernet), отдельный ключ не хранится
+AEAD_INFO = b"vault secret field aes-gcm v2"
+
+
+def _aead_key(fernet_key):
+    """256-битный ключ AES-GCM из ключа Fernet."""
+    return HKDF(algorithm=hashes.SHA256(), length=32, salt=None,
+                info=AEAD_INFO).derive(fernet_key)
+
+
+def _key_id(aead_key):
+    """Короткий отпечаток ключа: по нему выбирается ключ при расшифровке."""
+    return hashlib.sha256(aead_key).digest()[:KEY_ID_SIZE]
+
+
+class VaultCipher:
+    """
+    Шифр секретных полей.
+    Шифрует в двоичный формат v2 (AES-GCM, одна операция вместо AES-CBC + HMAC,
+    без base64 - хранится как BLOB и занимает на ~60% меньше места, чем Fernet).
+    Расшифровывает по префиксу: BLOB v2 - AES-GCM по id ключа, строка или байты
+    токена Fernet - MultiFernet (записи, еще не переведенные в новый формат).
+    keys - ключи хранилища (Fernet, base64), первый - текущий, остальные - прежние
+    (после смены ключа, см. core.rotation); расшифровка подходит любым из них.
+    Открытый текст - str.
+    """
+
+    def __init__(self, keys):
+        self.keys = list(keys)
+        self._fernet = MultiFernet([Fernet(k) for k in self.keys])
+        self._aead = {}
+        for k in self.keys:
+            aead_key = _aead_key(k)
+            self._aead.setdefault(_key_id(aead_key), AESGCM(aead_key))
+        self._primary_id = _key_id(_aead_key(self.keys[0]))
+        self._primary = self._aead[self._primary_id]
+
+    def encrypt(self, text):
+        """Шифрует строку текущим ключом, возвращает bytes формата v2."""
+        nonce = os.urandom(NONCE_SIZE)
+        header = bytes([FORMAT_GCM]) + self._primary_id + nonce
+        # Заголовок идет в AAD: подмена версии или id ключа не пройдет проверку тега
+        return header + self._primary.encrypt(nonce, text.encode("utf-8"), header)
+
+    def decrypt(self, token):
+        """Расшифровывает значение любого поддерживаемого формата, возвращает str."""
+        if isinstance(token, memoryview):
+            token = token.tobytes()
+        if isinstance(token, bytes) and token[:1] == bytes([FORMAT_GCM]):
+            header = token[:HEADER_SIZE]
+            aead = self._aead.get(token[1:1 + KEY_ID_SIZE])
+            if aead is None:
+                raise ValueError("Неизвестный ключ шифрования")
+            nonce = token[1 + KEY_ID_SIZE:HEADER_SIZE]
+            return aead.decrypt(nonce, token[HEADER_SIZE:], header).decode("utf-8")
+        if isinstance(token, str):
+            token = token.encode()
+        return self._fernet.decrypt(token).decode("utf-8")
+
+    def encrypt_fields(self, fields):
+        """Конверт записи: все секретные поля {поле: текст} одним шифротекстом."""
+        return self.encrypt(json.dumps(fields, ensure_ascii=False, separators=(",", ":")))
+
+    def decrypt_fields(self, token):
+        """Поля записи из конверта (encrypt_fields)."""
+        return json.loads(self.decrypt(token))
+
+    def is_current(self, token):
+        """True, если значение уже в формате v2 и зашифровано текущим ключом."""
+        return (isinstance(token, bytes) and token[:1] == bytes([FORMAT_GCM])
+                and token[1:1 + KEY_ID_SIZE] == self._primary_id)
+
+    def upgrade(self, token):
+        """Перешифровывает значение текущим ключом в формат v2."""
+        return self.encrypt(self.decrypt(token))
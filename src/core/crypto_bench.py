@@ -0,0 +1,301 @@
+"""
+Микробенчмарк шифрования секретных полей (без Tk).
+
+Сравнивает старый путь Fernet (отдельный токен на поле), текущий формат
+VaultCipher (AES-GCM на поле и конверт на запись) и ChaCha20-Poly1305
+на наборах записей разных типов. Для каждого варианта и размера пачки
+измеряется пропускная способность (записей в секунду), задержка одной записи
+(медиана и p95) и объем шифротекста. Отдельно замеряется чтение записи из
+SQLite, чтобы было видно, что дороже - криптография или база.
+
+Запуск:
+    python -m src.core.crypto_bench --out bench.json
+    python -m src.core.crypto_bench --compare old.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import string
+import sys
+import tempfile
+import time
+from datetime import datetime
+import cryptography
+from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives.ciphers.aead import ChaCha20Poly1305
+from src.database import SCHEMA_VERSION, SECRET_FIELDS, ConnectionManager
+from src.core.crypto import VaultCipher
+from src.core.repository import VaultRepository
+from src.core.record_layout import LAYOUT_MAP
+
+# Размеры пачек записей (1 - одна запись, как при открытии карточки)
+BATCH_SIZES = (1, 100, 1000)
+# Сколько записей генерировать для замеров
+DEFAULT_RECORDS = 2000
+# Сколько раз повторять замер пачки (берется лучший)
+REPEATS = 3
+# Записей в тестовой базе для замера чтения из SQLite
+DB_RECORDS = 5000
+
+# Длина открытого текста по типу валидации поля формы (мин, макс)
+FIELD_LENGTHS = {
+    "password_row": (8, 24),
+    "password_simple": (4, 4),
+    "text_password": (6, 200),
+    "entry_cvv": (3, 3),
+    "entry_card": (16, 19),
+    "entry_account": (20, 20),
+}
+# Для остальных полей: число в конце имени типа - максимум (entry_sec_30 -> 30)
+DEFAULT_LENGTH = (6, 12)
+DIGIT_FIELDS = ("entry_cvv", "entry_card", "entry_account", "password_simple")
+
+
+def secret_layout():
+    """{тип записи: [(поле, тип_валидации), ...]} - секретные поля из LAYOUT_MAP."""
+    layout = {}
+    for ptype, rows in LAYOUT_MAP.items():
+        layout[ptype] = [(field, kind) for row in rows for field, _, _, kind in row
+                         if field in SECRET_FIELDS]
+    return layout
+
+
+def _length(kind):
+    if kind in FIELD_LENGTHS:
+        return FIELD_LENGTHS[kind]
+    tail = kind.rsplit("_", 1)[-1]
+    if tail.isdigit():
+        return (min(DEFAULT_LENGTH[0], int(tail)), int(tail))
+    return DEFAULT_LENGTH
+
+
+def make_records(count, seed=0):
+    """Записи [(тип, {поле: текст})] с секретными полями реалистичной длины."""
+    rnd = random.Random(seed)
+    layout = {t: f for t, f in secret_layout().items() if f}
+    types = sorted(layout)
+    alphabet = string.ascii_letters + string.digits + "!@#$%^&*"
+    records = []
+    for _ in range(count):
+        ptype = rnd.choice(types)
+        fields = {}
+        for field, kind in layout[ptype]:
+            lo, hi = _length(kind)
+            chars = string.digits if kind in DIGIT_FIELDS else alphabet
+            fields[field] = "".join(rnd.choice(chars) for _ in range(rnd.randint(lo, hi)))
+        records.append((ptype, fields))
+    return records
+
+
+# --- ВАРИАНТЫ ШИФРОВАНИЯ ---
+# Каждый вариант: (шифровать запись -> список шифротекстов, расшифровать обратно)
+
+def _fernet_variant(key):
+    f = Fernet(key)
+
+    def enc(fields):
+        return [f.encrypt(v.encode()).decode() for v in fields.values()]
+
+    def dec(tokens):
+        return [f.decrypt(t.encode()).decode() for t in tokens]
+    return enc, dec
+
+
+def _aesgcm_field_variant(key):
+    c = VaultCipher([key])
+
+    def enc(fields):
+        return [c.encrypt(v) for v in fields.values()]
+
+    def dec(tokens):
+        return [c.decrypt(t) for t in tokens]
+    return enc, dec
+
+
+def _aesgcm_envelope_variant(key):
+    c = VaultCipher([key])
+
+    def enc(fields):
+        return [c.encrypt_fields(fields)]
+
+    def dec(tokens):
+        return [c.decrypt_fields(tokens[0])]
+    return enc, dec
+
+
+def _chacha_field_variant(key):
+    aead = ChaCha20Poly1305(ChaCha20Poly1305.generate_key())
+
+    def enc(fields):
+        out = []
+        for v in fields.values():
+            nonce = os.urandom(12)
+            out.append(nonce + aead.encrypt(nonce, v.encode(), None))
+        return out
+
+    def dec(tokens):
+        return [aead.decrypt(t[:12], t[12:], None).decode() for t in tokens]
+    return enc, dec
+
+
+VARIANTS = {
+    "fernet_field": _fernet_variant,
+    "aesgcm_field": _aesgcm_field_variant,
+    "aesgcm_envelope": _aesgcm_envelope_variant,
+    "chacha20_field": _chacha_field_variant,
+}
+
+
+def _size(tokens):
+    return sum(len(t) for t in tokens)
+
+
+def bench_variant(name, records, batch_sizes=BATCH_SIZES, repeats=REPEATS):
+    """Замеры одного варианта шифрования: задержки, пропускная способность и объем."""
+    enc, dec = VARIANTS[name](Fernet.generate_key())
+    fields = [f for _, f in records]
+    encrypted = [enc(f) for f in fields]
+
+    # Задержка одной записи (как при открытии/сохранении карточки)
+    enc_lat, dec_lat = [], []
+    for f, tokens in zip(fields, encrypted):
+        start = time.perf_counter()
+        enc(f)
+        enc_lat.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        dec(tokens)
+        dec_lat.append(time.perf_counter() - start)
+
+    throughput = {}
+    for size in batch_sizes:
+        size = min(size, len(records))
+        best_enc = best_dec = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            for f in fields[:size]:
+                enc(f)
+            best_enc = min(best_enc, time.perf_counter() - start)
+            start = time.perf_counter()
+            for tokens in encrypted[:size]:
+                dec(tokens)
+            best_dec = min(best_dec, time.perf_counter() - start)
+        throughput[str(size)] = {"encrypt_rps": round(size / best_enc),
+                                 "decrypt_rps": round(size / best_dec)}
+
+    return {
+        "variant": name,
+        "records": len(records),
+        "crypto_ops_per_record": round(statistics.mean(len(t) for t in encrypted), 2),
+        "bytes_per_record": round(statistics.mean(_size(t) for t in encrypted), 1),
+        "plain_bytes_per_record": round(statistics.mean(
+            sum(len(v.encode()) for v in f.values()) for f in fields), 1),
+        "encrypt_latency_us": _latency(enc_lat),
+        "decrypt_latency_us": _latency(dec_lat),
+        "throughput": throughput,
+    }
+
+
+def _latency(samples):
+    ordered = sorted(samples)
+    return {"median": round(statistics.median(ordered) * 1e6, 2),
+            "p95": round(ordered[int(len(ordered) * 0.95) - 1] * 1e6, 2)}
+
+
+def bench_database(records, count=DB_RECORDS, envelope=True):
+    """
+    Чтение записи из SQLite через VaultRepository: отдельно строка с полями
+    (get_record) и секреты (get_secrets = SELECT + расшифровка), чтобы сравнить
+    долю базы и криптографии. База временная, на диске.
+    """
+    work_dir = tempfile.mkdtemp(prefix="crypto_bench_")
+    db = ConnectionManager(os.path.join(work_dir, "bench.db"))
+    try:
+        repo = VaultRepository(db.conn, cipher=VaultCipher([Fernet.generate_key()]),
+                               secret_ttl=0, envelope=envelope)
+        rows = [dict(fields, name=f"record {i}", type=ptype)
+                for i, (ptype, fields) in enumerate((records * (count // len(records) + 1))[:count])]
+        repo.import_rows([repo.seal(r) for r in rows])
+        ids = [r[0] for r in db.conn.execute("SELECT id FROM passwords")]
+        sample = random.Random(1).sample(ids, min(len(ids), 1000))
+
+        record_lat, secret_lat = [], []
+        for pid in sample:
+            start = time.perf_counter()
+            repo.get_record(pid)
+            record_lat.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            repo.get_secrets(pid)
+            secret_lat.append(time.perf_counter() - start)
+        return {"records": count, "envelope": envelope,
+                "get_record_latency_us": _latency(record_lat),
+                "get_secrets_latency_us": _latency(secret_lat)}
+    finally:
+        db.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def run(records=DEFAULT_RECORDS, batch_sizes=BATCH_SIZES, label=""):
+    """Все замеры; возвращает словарь для JSON."""
+    data = make_records(records)
+    return {
+        "label": label,
+        "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "schema_version": SCHEMA_VERSION,
+        "python": platform.python_version(),
+        "cryptography": cryptography.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "record_types": {t: [f for f, _ in fs] for t, fs in secret_layout().items()},
+        "variants": [bench_variant(name, data, batch_sizes) for name in VARIANTS],
+        "database": [bench_database(data, envelope=e) for e in (False, True)],
+    }
+
+
+def compare(old, new):
+    """Строки отчета: отношение новой пропускной способности к старой по вариантам."""
+    lines = []
+    old_variants = {v["variant"]: v for v in old.get("variants", [])}
+    for v in new["variants"]:
+        prev = old_variants.get(v["variant"])
+        if not prev:
+            continue
+        for size, tp in v["throughput"].items():
+            before = prev["throughput"].get(size)
+            if not before:
+                continue
+            for metric in ("encrypt_rps", "decrypt_rps"):
+                ratio = tp[metric] / before[metric] if before[metric] else 0
+                mark = "  <-- регрессия" if ratio < 0.9 else ""
+                lines.append(f"{v['variant']:<16} пачка {size:>5} {metric}: "
+                             f"{before[metric]} -> {tp[metric]} ({ratio:.2f}x){mark}")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк шифрования секретных полей")
+    parser.add_argument("--out", help="куда записать JSON (по умолчанию - stdout)")
+    parser.add_argument("--records", type=int, default=DEFAULT_RECORDS)
+    parser.add_argument("--batch", type=int, nargs="+", default=list(BATCH_SIZES))
+    parser.add_argument("--label", default="", help="метка прогона (версия, ветка)")
+    parser.add_argument("--compare", help="JSON прошлого прогона для сравнения")
+    args = parser.parse_args(argv)
+
+    result = run(args.records, args.batch, args.label)
+    text = json.dumps(result, indent=1, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            old = json.load(f)
+        print("\n".join(compare(old, result)), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+import base64
+import hashlib
+import json
+import math
+import os
+import time
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+
+# Настройка в app_settings, где лежит обернутый ключ хранилища и параметры KDF
+KEY_SETTING = "vault_key"
+# Старый формат: несоленый SHA-256 мастер-пароля (до перехода на KDF)
+LEGACY_HASH_SETTING = "master_hash"
+# Ключ хранилища в открытом виде: старый формат и режим "без пароля при входе"
+KEY_FILE = "encryption.key"
+
+# Желаемое время разблокировки (мс) на машине пользователя
+TARGET_UNLOCK_MS = 300
+# Параметры scrypt: память = 128 * r * n байт, время ~ n * p
+SCRYPT_R = 8
+# 2^14 - нижняя граница стойкости даже на медленных машинах,
+# 2^17 при r=8 - 128 МиБ памяти; дальше время добирается через p
+MIN_LOG_N = 14
+MAX_LOG_N = 17
+SALT_SIZE = 16
+# Если разблокировка заняла меньше цель/2 или больше цель*2 - параметры пересчитываются
+RECALIBRATE_FACTOR = 2
+
+
+class WrongPassword(Exception):
+    """Мастер-пароль не подошел."""
+
+
+def _derive(password, salt, n, r, p):
+    """Ключ шифрования ключа (KEK) из мастер-пароля в формате ключа Fernet."""
+    kdf = Scrypt(salt=salt, length=32, n=n, r=r, p=p)
+    return base64.urlsafe_b64encode(kdf.derive(password.encode("utf-8")))
+
+
+def params_for(elapsed, n, p, target_ms=TARGET_UNLOCK_MS):
+    """
+    Подбирает параметры scrypt под target_ms по замеру: elapsed секунд при (n, p).
+    Время scrypt линейно по n*p, поэтому нужный "бюджет" - это n*p*цель/замер.
+    n берется степенью двойки в пределах [MIN_LOG_N, MAX_LOG_N],
+    остаток бюджета (на быстрых машинах) добирается параллелизмом p.
+    """
+    budget = n * p * (target_ms / 1000) / max(elapsed, 1e-6)
+    log_n = max(MIN_LOG_N, min(MAX_LOG_N, round(math.log2(max(budget, 1)))))
+    n = 2 ** log_n
+    return {"n": n, "r": SCRYPT_R, "p": max(1, round(budget / n))}
+
+
+def calibrate(target_ms=TARGET_UNLOCK_MS):
+    """Замеряет scrypt на этой машине и возвращает параметры под target_ms."""
+    salt = os.urandom(SALT_SIZE)
+    n = 2 ** MIN_LOG_N
+    timings = []
+    # Лучший из двух замеров: первый прогон включает выделение памяти
+    for _ in range(2):
+        start = time.perf_counter()
+        _derive("calibration", salt, n, SCRYPT_R, 1)
+        timings.append(time.perf_counter() - start)
+    return params_for(min(timings), n, 1, target_ms)
+
+
+def read_key_file():
+    """Ключ хранилища из файла KEY_FILE или None, если файла нет."""
+    try:
+        with open(KEY_FILE, "rb") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def write_key_file(key):
+    with open(KEY_FILE, "wb") as f:
+        f.write(key)
+
+
+def remove_key_file():
+    if os.path.exists(KEY_FILE):
+        os.remove(KEY_FILE)
+
+
+class Keyring:
+    """
+    Ключ хранилища (Fernet), обернутый мастер-паролем.
+
+    Из мастер-пароля со случайной солью через scrypt получается ключ шифрования
+    ключа (KEK), которым зашифрован сам ключ хранилища. Обертка, соль и параметры
+    KDF лежат в app_settings (KEY_SETTING). Отдельного хэша пароля нет: неверный
+    пароль дает другой KEK, и Fernet не проходит проверку подписи.
+    Смена пароля перешифровывает только ключ, записи не трогаются.
+
+    Параметры scrypt подбираются замером (calibrate) под target_ms; если на этой
+    машине разблокировка заметно быстрее или медленнее цели, ключ при входе
+    перезаворачивается с новыми параметрами.
+
+    keep_key_file - режим без пароля при входе: ключ остается и в файле KEY_FILE,
+    иначе файл удаляется, как только ключ обернут паролем.
+    """
+
+    def __init__(self, repo, target_ms=TARGET_UNLOCK_MS, keep_key_file=False):
+        self.repo = repo
+        self.target_ms = target_ms
+        self.keep_key_file = keep_key_file
+        self.key = None  # Ключ хранилища после разблокировки
+
+    def _record(self):
+        value = self.repo.get_setting(KEY_SETTING)
+        return json.loads(value) if value else None
+
+    def has_password(self):
+        """Задан ли мастер-пароль (в новом или старом формате)."""
+        return (self.repo.get_setting(KEY_SETTING) is not None
+                or self.repo.get_setting(LEGACY_HASH_SETTING) is not None)
+
+    def load_without_password(self):
+        """
+        Ключ для режима без пароля при входе: из файла KEY_FILE.
+        Если файла нет и пароль не задан (новая база) - создает новый ключ.
+        Возвращает None, если ключ есть только в обертке (нужен пароль).
+        """
+        key = read_key_file()
+        if key is None and not self.has_password():
+            key = Fernet.generate_key()
+            write_key_file(key)
+        self.key = key
+        return key
+
+    def unlock(self, password):
+        """
+        Проверяет мастер-пароль и достает ключ хранилища.
+        Базы со старым SHA-256 хэшем переводятся на scrypt при первом входе.
+        Бросает WrongPassword, если пароль не подошел.
+        """
+        record = self._record()
+        if record is None:
+            return self._unlock_legacy(password)
+
+        start = time.perf_counter()
+        key = self._unwrap(record, password)
+        elapsed = time.perf_counter() - start
+        self.key = key
+
+        # Машина заметно быстрее/медленнее той, где подбирались параметры
+        target = self.target_ms / 1000
+        if not target / RECALIBRATE_FACTOR <= elapsed <= target * RECALIBRATE_FACTOR:
+            self._store(password, params_for(elapsed, record["n"], record["p"],
+                                             self.target_ms))
+        return key
+
+    @staticmethod
+    def _unwrap(record, password):
+        """Ключ хранилища из обертки record (бросает WrongPassword)."""
+        kek = _derive(password, base64.b64decode(record["salt"]),
+                      record["n"], record["r"], record["p"])
+        try:
+            return Fernet(kek).decrypt(record["wrapped"].encode())
+        except InvalidToken:
+            raise WrongPassword() from None
+
+    def _check_legacy(self, password):
+        stored_hash = self.repo.get_setting(LEGACY_HASH_SETTING)
+        return (stored_hash is not None
+                and hashlib.sha256(password.encode()).hexdigest() == stored_hash)
+
+    def _unlock_legacy(self, password):
+        if not self._check_legacy(password):
+            raise WrongPassword()
+        self.set_password(password)
+        return self.key
+
+    def verify(self, password):
+        """
+        True, если password - текущий мастер-пароль. В отличие от unlock
+        ничего не записывает: ни перекалибровки, ни перевода старого хэша.
+        """
+        record = self._record()
+        if record is None:
+            return self._check_legacy(password)
+        try:
+            self._unwrap(record, password)
+            return True
+        except WrongPassword:
+            return False
+
+    def use_key(self, key):
+        """
+        Ключ базы без мастер-пароля (восстановленная копия без пароля): без
+        обертки он хранится только в файле KEY_FILE.
+        """
+        self.key = key
+        write_key_file(key)
+
+    def forget(self):
+        """
+        Забывает ключ в памяти, не трогая базу (база подменена копией:
+        ключ и пароль теперь те, что в ней, и достаются заново при входе).
+        """
+        self.key = None
+
+    def set_password(self, password):
+        """
+        Задает мастер-пароль: оборачивает текущий ключ (или ключ из файла,
+        или новый) с параметрами, подобранными под эту машину.
+        """
+        if self.key is None:
+            self.key = read_key_file() or Fernet.generate_key()
+        self._store(password, calibrate(self.target_ms))
+        self.repo.delete_setting(LEGACY_HASH_SETTING)
+        if not self.keep_key_file:
+            remove_key_file()
+
+    def change_password(self, old_password, new_password):
+        """Смена пароля: ключ хранилища тот же, меняется только обертка."""
+        self.unlock(old_password)
+        self.set_password(new_password)
+
+    def replace_key(self, new_key, password=None):
+        """
+        Подменяет ключ хранилища (смена ключа, см. core.rotation).
+        Если задан мастер-пароль, новый ключ оборачивается им с прежними параметрами KDF.
+        """
+        record = self._record()
+        if record is not None:
+            self.unlock(password or "")
+        self.key = new_key
+        if record is not None:
+            self._store(password, {k: record[k] for k in ("n", "r", "p")})
+        if self.keep_key_file or record is None:
+            write_key_file(new_key)
+
+    def reset(self):
+        """Забывает мастер-пароль и обернутый ключ (данные под ним станут недоступны)."""
+        self.repo.delete_setting(KEY_SETTING)
+        self.repo.delete_setting(LEGACY_HASH_SETTING)
+        self.key = None
+
+    def set_keep_key_file(self, keep):
+        """Переключает режим без пароля при входе (см. keep_key_file)."""
+        self.keep_key_file = keep
+        if keep and self.key is not None:
+            write_key_file(self.key)
+        elif not keep and self._record() is not None:
+            # Удаляем файл, только если ключ уже обернут - иначе он бы потерялся
+            remove_key_file()
+
+    def _store(self, password, params):
+        salt = os.urandom(SALT_SIZE)
+        kek = _derive(password, salt, params["n"], params["r"], params["p"])
+        record = dict(params, kdf="scrypt",
+                      salt=base64.b64encode(salt).decode(),
+                      wrapped=Fernet(kek).encrypt(self.key).decode())
+        self.repo.set_setting(KEY_SETTING, json.dumps(record))
@@ -0,0 +1,15 @@
+# --- КАРТА ПОЛЕЙ (LAYOUT MAP) ---
+# Описывает структуру формы для каждого типа записи (окно windows.add_edit;
+# по ней же строятся реалистичные записи в бенчмарке core.crypto_bench).
+# Лежит в core, а не в окне, чтобы без Tk ее можно было импортировать.
+# Формат: [ [ (поле, метка, обязательность, тип_валидации), ... ], ... ]
+# обязательность: 2=critical (красный), 1=important (оранжевый), 0=normal
+LAYOUT_MAP = {
+    "WEB": [[("name", "★ Название сайта", 2, "entry_name_50")], [("username", "★ Логин", 2, "entry_login_20"), ("password", "★ Пароль", 2, "password_row")], [("url", "◆ Веб-адрес", 1, "entry"), ("email", "◆ Email аккаунта", 1, "entry_email_20")], [("phone", "○ Телефон", 0, "entry_phone"), ("category", "○ Категория", 0, "entry_category_10")], [("security_question", "○ Вопрос безопасности", 0, "entry_sec_30"), ("security_answer", "○ Ответ", 0, "entry_sec_30")], [("recovery_email", "○ Резервный Email", 0, "entry_email_20"), ("recovery_phone", "○ Рез. Телефон", 0, "entry_phone")], [("notes", "○ Примечания", 0, "text_notes_60")]],
+    "OFFLINE": [[("name", "★ Название кода", 2, "entry_name_strict_20")], [("password", "★ Код / Текст", 2, "text_password")], [("tags", "○ Теги", 0, "entry_category_10"), ("category", "○ Категория", 0, "entry_category_10")], [("notes", "○ Примечания", 0, "text_notes_60")]],
+    "SOCIAL": [[("name", "★ Соц. сеть", 2, "entry_name_50")], [("username", "★ Никнейм", 2, "entry_login_20"), ("password", "★ Пароль", 2, "password_row")], [("email", "◆ Email аккаунта", 1, "entry_email_20"), ("url", "◆ Ссылка на профиль", 1, "entry")], [("phone", "○ Телефон", 0, "entry_phone"), ("full_name", "○ ФИО", 0, "entry")], [("recovery_email", "○ Email восст.", 0, "entry_email_20"), ("recovery_phone", "○ Тел. восст.", 0, "entry_phone")], [("notes", "○ Примечания", 0, "text_notes_60")]],
+    "EMAIL": [[("name", "★ Название почты", 2, "entry_name_50")], [("username", "★ Email адрес", 2, "entry_email_20"), ("password", "★ Пароль", 2, "password_row")], [("phone", "◆ Телефон", 1, "entry_phone"), ("full_name", "◆ ФИО владельца", 1, "entry")], [("date_of_birth", "○ Дата рождения", 0, "entry_date_full"), ("recovery_email", "○ Рез. Email", 0, "entry_email_20")], [("security_question", "○ Вопрос безопасности", 0, "entry_sec_30"), ("security_answer", "○ Ответ", 0, "entry_sec_30")], [("notes", "○ Примечания", 0, "text_notes_60")]],
+    "BANK": [[("name", "★ Название счета", 2, "entry_name_strict_20")], [("username", "★ Логин/Договор", 2, "entry_login_20"), ("password", "★ Пароль", 2, "password_row")], [("account_number", "★ Номер счета (20)", 2, "entry_account"), ("bank_name", "◆ Банк", 1, "entry")], [("card_number", "◆ Привязанная карта", 1, "entry_card"), ("phone", "◆ Телефон", 1, "entry_phone")], [("bank_bik", "○ БИК (9)", 0, "entry_bik"), ("currency", "○ Валюта", 0, "entry")], [("full_name", "○ ФИО владельца", 0, "entry"), ("date_of_birth", "○ Дата рождения", 0, "entry_date_full")], [("identification_number", "○ ИНН/ID", 0, "entry"), ("address", "○ Адрес", 0, "entry")], [("notes", "○ Примечания", 0, "text_notes_60")]],
+    "CARD": [[("name", "★ Название карты", 2, "entry_name_strict_20")], [("card_number", "★ Номер карты", 2, "entry_card")], [("card_cvv", "★ CVV/CVC", 2, "entry_cvv"), ("card_expire", "★ Срок (MM/YY)", 2, "entry_date")], [("card_holder", "◆ Владелец", 1, "entry"), ("bank_name", "◆ Банк", 1, "entry")], [("card_pin", "○ PIN код", 0, "password_simple"), ("card_type", "○ Тип", 0, "entry")], [("cardholder_phone", "○ Телефон", 0, "entry_phone"), ("limit_amount", "○ Лимит", 0, "entry")], [("passport_number", "○ Паспорт", 0, "entry"), ("currency", "○ Валюта", 0, "entry")], [("notes", "○ Примечания", 0, "text_notes_60")]],
+    "CUSTOM": [[("name", "★ Название", 2, "entry_name_50")], [("username", "★ Поле 1 (Логин)", 2, "entry"), ("password", "★ Поле 2 (Пароль)", 2, "password_row")], [("custom_field_1", "○ Поле 1", 0, "entry"), ("custom_field_2", "○ Поле 2", 0, "entry")]]
+}
@@ -0,0 +1,593 @@
+import re
+import sqlite3
+from src.database import (ENVELOPE_COLUMN, FTS_COLUMNS, HOT_COLUMNS, RECORD_EXTRA_COLUMNS,
+                          SECRET_FIELDS)
+from src.core.touch_buffer import TouchBuffer
+from src.core.secret_cache import DEFAULT_SECRET_TTL, SecretCache
+
+
+# Колонки таблицы passwords, которые разрешено писать.
+# Имена колонок никогда не берутся из пользовательских данных напрямую:
+# всё остальное уходит в record_fields как значение (защита от SQL-инъекций через CSV).
+RECORD_COLUMNS = tuple(c for c in HOT_COLUMNS if c != "id") + (ENVELOPE_COLUMN,)
+# Секретные поля, которые (без конверта) лежат в record_fields
+SECRET_EXTRA_FIELDS = tuple(f for f in SECRET_FIELDS if f != "password")
+
+# Допустимое имя дополнительного поля записи (custom_field_12, card_pin...)
+FIELD_NAME_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+# Пользовательские поля, которые добавляет окно записи (их число не ограничено)
+CUSTOM_FIELD_RE = re.compile(r"^custom_field_\d+$")
+
+# Порядок вывода известных полей; неизвестные - после них, с учетом чисел в имени
+_FIELD_ORDER = {name: i for i, name in enumerate(RECORD_EXTRA_COLUMNS)}
+
+
+def is_record_field(name):
+    """
+    Известное приложению поле записи: колонка passwords, поле из
+    RECORD_EXTRA_COLUMNS или custom_field_N. Репозиторий сам пишет в record_fields
+    любое имя вида FIELD_NAME_RE - внешние данные (CSV) фильтруются этим заранее.
+    """
+    return (name in HOT_COLUMNS or name in RECORD_EXTRA_COLUMNS
+            or bool(CUSTOM_FIELD_RE.match(name or "")))
+
+
+def field_sort_key(name):
+    """Ключ сортировки имен полей: известные по порядку, custom_field_2 раньше custom_field_10."""
+    natural = [int(p) if p.isdigit() else p for p in re.split(r"(\d+)", name)]
+    return (_FIELD_ORDER.get(name, len(_FIELD_ORDER)), natural)
+
+# Колонки, которые нужны таблице для отрисовки списка (в этом порядке)
+LIST_COLUMNS = ("type", "name", "username", "email", "category",
+                "created_at", "id", "is_favorite", "updated_at")
+
+# Живой поиск: сколько лучших совпадений показывать и веса колонок для bm25
+SEARCH_LIMIT = 500
+# Ранжировать по bm25, только если совпадений не больше этого числа.
+# Для запросов вроде одной буквы, совпадающих с десятками тысяч записей,
+# подсчет релевантности дорог и бесполезен - там показываем самые новые записи.
+RANK_LIMIT = 2000
+FTS_WEIGHTS = {"name": 10.0, "username": 5.0, "email": 4.0, "url": 2.0,
+               "notes": 1.0, "tags": 3.0, "category": 3.0}
+BM25 = "bm25(passwords_fts, {})".format(
+    ", ".join(str(FTS_WEIGHTS[c]) for c in FTS_COLUMNS))
+
+# Варианты сортировки из PasswordManager.sort_options -> ORDER BY
+SORT_ORDERS = {
+    "Дата изменения (новые)": "updated_at DESC",
+    "Дата изменения (старые)": "updated_at ASC",
+    "Название (А→Я) ↑": "name ASC",
+    "Название (Я→А) ↓": "name DESC",
+    "Логин (А→Я) ↑": "username ASC",
+    "Логин (Я→А) ↓": "username DESC",
+    "Последнее использование (недавние)": "last_used_at DESC",
+    "Последнее использование (давние)": "last_used_at ASC",
+    "Избранные в начале": "is_favorite DESC, name ASC",
+    "Избранные в конце": "is_favorite ASC, name ASC",
+}
+DEFAULT_ORDER = "created_at DESC"
+# Сколько id удалять одним DELETE ... IN (...): меньше старого лимита SQLite в 999 параметров
+DELETE_CHUNK = 500
+# Сортировки по last_used_at: в них подмешиваются несохраненные отметки (True = новые сверху)
+LAST_USED_SORTS = {
+    "Последнее использование (недавние)": True,
+    "Последнее использование (давние)": False,
+}
+# Порядок типов значений в ORDER BY SQLite: NULL < числа < текст < BLOB
+_SQL_TYPE_RANK = ((type(None), 0), (int, 1), (float, 1), (str, 2), (bytes, 3))
+
+
+def sort_columns(sort):
+    """
+    Порядок сортировки sort в виде [(индекс колонки в LIST_COLUMNS, по убыванию?)].
+    None, если сортировка идет по колонке вне LIST_COLUMNS (последнее использование):
+    тогда положение строки в списке можно узнать только новым запросом.
+    """
+    columns = []
+    for part in SORT_ORDERS.get(sort, DEFAULT_ORDER).split(","):
+        col, direction = part.split()
+        if col not in LIST_COLUMNS:
+            return None
+        columns.append((LIST_COLUMNS.index(col), direction == "DESC"))
+    return columns
+
+
+def sql_value_key(value):
+    """Ключ сравнения значения в порядке ORDER BY SQLite."""
+    for cls, rank in _SQL_TYPE_RANK:
+        if isinstance(value, cls):
+            return (rank, value)
+    return (2, str(value))
+
+
+def row_before(a, b, columns):
+    """
+    True, если строка a стоит раньше строки b при сортировке columns (см. sort_columns).
+    Сравнение как в ORDER BY SQLite (NULL меньше любого значения, текст - побайтно).
+    """
+    for index, desc in columns:
+        ka, kb = sql_value_key(a[index]), sql_value_key(b[index])
+        if ka != kb:
+            return (ka > kb) if desc else (ka < kb)
+    return False
+
+
+class VaultRepository:
+    """
+    Единая точка доступа к данным хранилища.
+    Все SQL-запросы приложения живут здесь. Тексты запросов фиксированы и
+    параметризованы, поэтому sqlite3 переиспользует подготовленные выражения
+    из своего кэша, а не разбирает SQL заново на каждое нажатие клавиши.
+    """
+
+    def __init__(self, conn, cipher=None, secret_ttl=DEFAULT_SECRET_TTL, envelope=True):
+        self.conn = conn
+        # Шифр для reveal() и кэш уже расшифрованных значений
+        self.cipher = cipher
+        # True - секреты записи пишутся одним конвертом (см. seal)
+        self.envelope = envelope
+        self.secrets = SecretCache(secret_ttl)
+        # Версии строк для ключей кэша: растут при каждой записи в запись через репозиторий
+        self._versions = {}
+        # Кэш уже собранных текстов запросов списка: (тип?, поиск?, сортировка) -> SQL
+        self._list_sql = {}
+        # Отложенные отметки "последнее использование" (сбрасываются flush_touches)
+        self.touches = TouchBuffer()
+        # Подписчики на изменения записей (см. subscribe)
+        self._listeners = []
+        # Колонки списка в памяти (core.column_store.ColumnStore) или None:
+        # если загружены, список без поиска строится без запроса к SQLite
+        self.columns = None
+
+    # --- ПОДПИСКА НА ИЗМЕНЕНИЯ ---
+
+    def subscribe(self, callback):
+        """
+        callback(kind, ids) вызывается после каждой записи через репозиторий:
+        kind = "changed" (записи добавлены или изменены) или "deleted".
+        По нему таблица обновляет только затронутые строки.
+        """
+        self._listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _notify(self, kind, ids):
+        ids = list(ids)
+        # Сначала колонки в памяти: подписчики уже читают список через них
+        if self.columns is not None:
+            self.columns.apply(kind, ids, self.conn)
+        for callback in list(self._listeners):
+            callback(kind, ids)
+
+    # --- СПИСОК ЗАПИСЕЙ ---
+
+    def _build_list_sql(self, with_type, with_search, sort):
+        """
+        Собирает (один раз) текст запроса для заданной комбинации фильтров.
+        with_search: False, "rank" (по релевантности) или "recent" (по новизне).
+        """
+        key = (with_type, with_search, sort)
+        sql = self._list_sql.get(key)
+        if sql is None:
+            cols = ", ".join(f"p.{c}" for c in LIST_COLUMNS)
+            if with_search:
+                # Поиск идет по FTS-индексу
+                sql = (f"SELECT {cols} FROM passwords_fts f JOIN passwords p ON p.id = f.rowid"
+                       " WHERE passwords_fts MATCH ?")
+                if with_type:
+                    sql += " AND p.type=?"
+                order = BM25 if with_search == "rank" else "f.rowid DESC"
+                sql += f" ORDER BY {order} LIMIT {SEARCH_LIMIT}"
+            else:
+                sql = f"SELECT {cols} FROM passwords p"
+                if with_type:
+                    sql += " WHERE p.type=?"
+                sql += f" ORDER BY {SORT_ORDERS.get(sort, DEFAULT_ORDER)}"
+            self._list_sql[key] = sql
+        return sql
+
+    @staticmethod
+    def build_match(search):
+        """
+        Превращает строку поиска в запрос FTS5: каждое слово ищется как префикс,
+        все слова должны встретиться (AND). Спецсимволы FTS в запрос не попадают.
+        Возвращает None, если в строке нет ни одного слова.
+        """
+        # Та же нормализация, что и при индексации (database.fts_normalize_sql)
+        search = (search or "").replace("ё", "е").replace("Ё", "Е")
+        words = re.findall(r"[^\W_]+", search)
+        if not words:
+            return None
+        return " ".join(f'"{w}"*' for w in words)
+
+    def list_rows(self, ptype=None, search="", sort=None):
+        """
+        Возвращает строки для таблицы (колонки LIST_COLUMNS).
+        ptype: код типа (WEB, CARD...) или None/"Все" для всех типов.
+        search: строка поиска; при поиске возвращается не более SEARCH_LIMIT
+        строк по релевантности (bm25), иначе - все строки в порядке sort
+        (подпись из sort_options). Без поиска при загруженном хранилище колонок
+        (self.columns) строки берутся из него (column_store.RowView).
+        """
+        if not search and self.columns is not None and self.columns.loaded:
+            rows = self.columns.list_rows(ptype, sort, self.touches)
+            if rows is not None:
+                return rows
+        with_type = bool(ptype) and ptype != "Все"
+        params = []
+        mode = False
+        if search:
+            match = self.build_match(search)
+            if match is None:
+                return []
+            params.append(match)
+            mode = "rank" if self._count_matches(match) <= RANK_LIMIT else "recent"
+        if with_type:
+            params.append(ptype)
+        sql = self._build_list_sql(with_type, mode, sort)
+        rows = self.conn.execute(sql, params).fetchall()
+        if not mode and sort in LAST_USED_SORTS:
+            rows = self.touches.order_rows(
+                rows, LAST_USED_SORTS[sort], LIST_COLUMNS.index("id"))
+        return rows
+
+    def get_list_rows(self, ids, ptype=None):
+        """
+        Строки списка (колонки LIST_COLUMNS) для записей ids, подходящих под фильтр
+        типа ptype (None/"Все" - любой тип). Порядок строк не определен.
+        """
+        ids = list(ids)
+        cols = ", ".join(LIST_COLUMNS)
+        rows = []
+        for start in range(0, len(ids), DELETE_CHUNK):
+            chunk = ids[start:start + DELETE_CHUNK]
+            sql = f"SELECT {cols} FROM passwords WHERE id IN ({','.join('?' * len(chunk))})"
+            params = list(chunk)
+            if ptype and ptype != "Все":
+                sql += " AND type=?"
+                params.append(ptype)
+            rows += self.conn.execute(sql, params).fetchall()
+        return rows
+
+    def get_search_text(self, ids):
+        """Тексты колонок поиска (FTS_COLUMNS) записей ids: {id: (значения...)}."""
+        ids = list(ids)
+        cols = ", ".join(FTS_COLUMNS)
+        texts = {}
+        for start in range(0, len(ids), DELETE_CHUNK):
+            chunk = ids[start:start + DELETE_CHUNK]
+            for row in self.conn.execute(
+                    f"SELECT id, {cols} FROM passwords WHERE id IN ({','.join('?' * len(chunk))})",
+                    chunk):
+                texts[row[0]] = row[1:]
+        return texts
+
+    def _count_matches(self, match):
+        """Число совпадений FTS-запроса, но не больше RANK_LIMIT + 1 (дешевая проба)."""
+        return self.conn.execute(
+            "SELECT count(*) FROM (SELECT rowid FROM passwords_fts WHERE passwords_fts MATCH ? LIMIT ?)",
+            (match, RANK_LIMIT + 1)).fetchone()[0]
+
+    def last_modified(self):
+        """Дата последнего изменения любой записи (для статус-бара)."""
+        # MAX по индексу idx_passwords_updated - одно чтение вместо прохода по таблице
+        # (updated_at заполняется по умолчанию при вставке, поэтому COALESCE не нужен)
+        res = self.conn.execute(
+            "SELECT MAX(updated_at) FROM passwords").fetchone()
+        return res[0] if res else None
+
+    # --- ОДНА ЗАПИСЬ ---
+
+    def get_record(self, pid):
+        """
+        Полная запись в виде словаря {колонка: значение} или None.
+        Поля из record_fields подмешиваются к колонкам passwords.
+        """
+        cur = self.conn.execute("SELECT * FROM passwords WHERE id=?", (pid,))
+        row = cur.fetchone()
+        if not row:
+            return None
+        cols = [d[0] for d in cur.description]
+        record = dict(zip(cols, row))
+        record.update(self.get_fields(pid))
+        pending = self.touches.get(pid)
+        if pending:
+            record["last_used_at"] = pending
+        return record
+
+    def get_fields(self, pid):
+        """Дополнительные поля записи {поле: значение} в порядке вывода."""
+        rows = self.conn.execute(
+            "SELECT field, value FROM record_fields WHERE record_id=?", (pid,)).fetchall()
+        return dict(sorted(rows, key=lambda r: field_sort_key(r[0])))
+
+    def get_secret(self, pid):
+        """Зашифрованный пароль записи (или None)."""
+        res = self.conn.execute(
+            "SELECT password FROM passwords WHERE id=?", (pid,)).fetchone()
+        return res[0] if res else None
+
+    def get_login(self, pid):
+        """Логин записи: username, а если его нет - email."""
+        res = self.conn.execute(
+            "SELECT username, email FROM passwords WHERE id=?", (pid,)).fetchone()
+        if not res:
+            return None
+        return res[0] if res[0] else (res[1] if res[1] else "")
+
+    def reveal(self, pid, field="password"):
+        """
+        Расшифрованное значение секретного поля записи (или None, если поле пустое).
+        Повторные вызовы в пределах TTL отдаются из памяти без SELECT и расшифровки.
+        Ошибку расшифровки пробрасывает.
+        """
+        value = self.secrets.get((pid, self._versions.get(pid, 0), field))
+        if value is not None:
+            return value
+        return self.get_secrets(pid).get(field)
+
+    def get_secrets(self, pid):
+        """
+        Все секретные поля записи в открытом виде {поле: значение}.
+        Конверт расшифровывается одной операцией; значения кладутся в кэш секретов,
+        так что reveal остальных полей той же записи уже не идет в БД.
+        """
+        row = self.conn.execute(
+            f"SELECT password, {ENVELOPE_COLUMN} FROM passwords WHERE id=?", (pid,)).fetchone()
+        if not row:
+            return {}
+        marks = ",".join("?" * len(SECRET_EXTRA_FIELDS))
+        fields = dict(self.conn.execute(
+            f"SELECT field, value FROM record_fields WHERE record_id=? AND field IN ({marks})",
+            (pid,) + SECRET_EXTRA_FIELDS).fetchall())
+        result = self._decrypt_secrets(row[0], row[1], fields)
+        version = self._versions.get(pid, 0)
+        for field, value in result.items():
+            self.secrets.put((pid, version, field), value)
+        return result
+
+    def _decrypt_secrets(self, token, envelope, fields):
+        """
+        Открытые секреты записи из конверта и отдельных токенов (записи,
+        сохраненные до включения конверта или с выключенным конвертом).
+        """
+        result = self.cipher.decrypt_fields(envelope) if envelope else {}
+        if token:
+            result["password"] = self.cipher.decrypt(token)
+        for field in SECRET_EXTRA_FIELDS:
+            if fields.get(field):
+                result[field] = self.cipher.decrypt(fields[field])
+        return {f: v for f, v in result.items() if v}
+
+    def seal(self, data, pid=None):
+        """
+        Шифрует секретные поля data (открытый текст) перед insert_record/update_record.
+        С конвертом все секреты записи уходят одним шифротекстом в колонку
+        ENVELOPE_COLUMN, а сами поля очищаются; без него каждое поле шифруется
+        отдельно, а конверт очищается. pid - id редактируемой записи: ее секреты,
+        которых нет в data, сохраняются. Возвращает новый словарь.
+        """
+        data = dict(data)
+        plain = {f: data.pop(f) for f in SECRET_FIELDS if f in data}
+        if pid is not None:
+            plain = dict(self.get_secrets(pid), **plain)
+        plain = {f: v for f, v in plain.items() if v}
+        if self.envelope:
+            data[ENVELOPE_COLUMN] = self.cipher.encrypt_fields(plain) if plain else None
+            data.update({f: None for f in SECRET_FIELDS})
+        else:
+            data[ENVELOPE_COLUMN] = None
+            data.update({f: self.cipher.encrypt(plain[f]) if f in plain else None
+                         for f in SECRET_FIELDS})
+        return data
+
+    def _changed(self, ids):
+        """Отмечает запись измененной: старые расшифрованные значения больше не выдаются."""
+        for pid in ids:
+            self._versions[pid] = self._versions.get(pid, 0) + 1
+        self.secrets.discard_records(ids)
+
+    def _split(self, data):
+        """
+        Делит данные записи на колонки passwords (в фиксированном порядке)
+        и дополнительные поля для record_fields.
+        """
+        columns = [(col, data[col]) for col in RECORD_COLUMNS if col in data]
+        fields = [(k, v) for k, v in data.items()
+                  if k not in HOT_COLUMNS and k != ENVELOPE_COLUMN
+                  and isinstance(k, str) and FIELD_NAME_RE.match(k)]
+        return columns, fields
+
+    def _write_fields(self, pid, fields):
+        """Сохраняет дополнительные поля: пустое значение удаляет поле."""
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO record_fields (record_id, field, value) VALUES (?, ?, ?)",
+            [(pid, k, v) for k, v in fields if v not in (None, "")])
+        self.conn.executemany(
+            "DELETE FROM record_fields WHERE record_id=? AND field=?",
+            [(pid, k) for k, v in fields if v in (None, "")])
+
+    def insert_record(self, data, commit=True):
+        """Добавляет запись, возвращает её id."""
+        columns, fields = self._split(data)
+        cols = ",".join(c for c, _ in columns)
+        marks = ",".join("?" * len(columns))
+        try:
+            cur = self.conn.execute(
+                f"INSERT INTO passwords ({cols}) VALUES ({marks})", [v for _, v in columns])
+            self._write_fields(cur.lastrowid, fields)
+        except sqlite3.Error:
+            if commit:
+                self.conn.rollback()
+            raise
+        if commit:
+            self.conn.commit()
+            self._notify("changed", [cur.lastrowid])
+        return cur.lastrowid
+
+    def update_record(self, pid, data):
+        """Обновляет переданные колонки и поля записи (одной транзакцией)."""
+        self._changed([pid])
+        columns, fields = self._split(data)
+        try:
+            if columns:
+                sets = ",".join(f"{c}=?" for c, _ in columns)
+                self.conn.execute(f"UPDATE passwords SET {sets} WHERE id=?",
+                                  [v for _, v in columns] + [pid])
+            self._write_fields(pid, fields)
+            self.conn.commit()
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+        self._notify("changed", [pid])
+
+    def toggle_favorite(self, pid):
+        """Добавляет/убирает запись из избранного."""
+        self._changed([pid])
+        self.conn.execute(
+            "UPDATE passwords SET is_favorite = NOT is_favorite WHERE id=?", (pid,))
+        self.conn.commit()
+        self._notify("changed", [pid])
+
+    def touch(self, ids):
+        """
+        Отмечает использование записей. В БД ничего не пишется:
+        отметки копятся в памяти до flush_touches().
+        """
+        self.touches.add(ids)
+
+    def flush_touches(self):
+        """Записывает накопленные отметки использования одной транзакцией."""
+        items = self.touches.take()
+        if not items:
+            return 0
+        try:
+            self.conn.executemany(
+                "UPDATE passwords SET last_used_at=? WHERE id=?",
+                [(ts, pid) for pid, ts in items.items()])
+            self.conn.commit()
+        except sqlite3.Error:
+            self.conn.rollback()
+            # Не теряем отметки: попробуем снова при следующем сбросе
+            self.touches.restore(items)
+            raise
+        if self.columns is not None:
+            self.columns.touch(items)
+        return len(items)
+
+    def delete(self, ids, progress=None):
+        """
+        Удаляет записи по списку id одной транзакцией.
+        Id отправляются пачками по DELETE_CHUNK, поэтому число записей не ограничено
+        лимитом параметров SQLite. progress(удалено, всего) вызывается после каждой пачки.
+        """
+        ids = list(ids)
+        self.touches.discard(ids)
+        self._changed(ids)
+        try:
+            for start in range(0, len(ids), DELETE_CHUNK):
+                chunk = ids[start:start + DELETE_CHUNK]
+                marks = ",".join("?" * len(chunk))
+                self.conn.execute(
+                    f"DELETE FROM passwords WHERE id IN ({marks})", chunk)
+                if progress:
+                    progress(start + len(chunk), len(ids))
+            self.conn.commit()
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+        self._notify("deleted", ids)
+
+    # --- ИМПОРТ / ЭКСПОРТ ---
+
+    def export_rows(self, decrypt=False):
+        """
+        Все записи целиком: (список колонок, список строк).
+        Колонки - это колонки passwords плюс все встречающиеся дополнительные поля.
+        decrypt=True - секретные поля в открытом виде (одна расшифровка конверта
+        на запись), без служебной колонки конверта.
+        """
+        fields = {}
+        for pid, field, value in self.conn.execute(
+                "SELECT record_id, field, value FROM record_fields"):
+            fields.setdefault(pid, {})[field] = value
+        names = {f for d in fields.values() for f in d}
+        if decrypt:
+            names.update(SECRET_EXTRA_FIELDS)
+        field_names = sorted(names, key=field_sort_key)
+
+        cur = self.conn.execute("SELECT * FROM passwords")
+        cols = [d[0] for d in cur.description]
+        pw_idx = cols.index("password")
+        env_idx = cols.index(ENVELOPE_COLUMN)
+        rows = []
+        for row in cur:
+            extra = fields.get(row[0], {})
+            if decrypt:
+                secrets = self._decrypt_secrets(row[pw_idx], row[env_idx], extra)
+                extra = dict(extra)
+                extra.update({f: secrets.get(f) for f in SECRET_EXTRA_FIELDS})
+                row = list(row)
+                row[pw_idx] = secrets.get("password")
+                del row[env_idx]
+            rows.append(tuple(row) + tuple(extra.get(f) for f in field_names))
+        if decrypt:
+            cols = [c for c in cols if c != ENVELOPE_COLUMN]
+        return cols + field_names, rows
+
+    def import_rows(self, rows):
+        """Добавляет пачку записей (словарей) одной транзакцией. Возвращает количество."""
+        ids = []
+        try:
+            for row in rows:
+                ids.append(self.insert_record(row, commit=False))
+            self.conn.commit()
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+        self._notify("changed", ids)
+        return len(ids)
+
+    def restore_records(self, records):
+        """
+        Возвращает записи из бэкапа (словари как у get_record) одной транзакцией.
+        Запись с тем же id заменяется целиком (вместе с полями),
+        отсутствующая - добавляется под прежним id. Возвращает количество.
+        """
+        self._changed([data["id"] for data in records])
+        try:
+            for data in records:
+                pid = data["id"]
+                # Триггеры сами уберут старые поля записи и строку FTS-индекса
+                self.conn.execute("DELETE FROM passwords WHERE id=?", (pid,))
+                columns, fields = self._split(data)
+                cols = ",".join(["id"] + [c for c, _ in columns])
+                marks = ",".join("?" * (len(columns) + 1))
+                self.conn.execute(f"INSERT INTO passwords ({cols}) VALUES ({marks})",
+                                  [pid] + [v for _, v in columns])
+                self._write_fields(pid, fields)
+            self.conn.commit()
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+        self.touches.discard([data["id"] for data in records])
+        self._notify("changed", [data["id"] for data in records])
+        return len(records)
+
+    # --- СИСТЕМНЫЕ НАСТРОЙКИ (app_settings) ---
+
+    def get_setting(self, key):
+        res = self.conn.execute(
+            "SELECT value FROM app_settings WHERE key=?", (key,)).fetchone()
+        return res[0] if res else None
+
+    def set_setting(self, key, value):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO app_settings (key, value) VALUES (?, ?)", (key, value))
+        self.conn.commit()
+
+    def delete_setting(self, key):
+        self.conn.execute("DELETE FROM app_settings WHERE key=?", (key,))
+        self.conn.commit()
@@ -0,0 +1,124 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+from pathlib import Path
+from src.database import SCHEMA_VERSION, get_schema_version, migrate
+from src.core.chunk_store import ChunkStore
+
+# Суффикс копии текущей базы, которая остается рядом после восстановления
+PRE_RESTORE_SUFFIX = ".pre_restore"
+
+
+def materialize_snapshot(store_dir, name, work_dir):
+    """
+    Собирает снимок name из хранилища store_dir во временный файл в work_dir
+    и готовит его к работе: ChunkStore.restore сверяет хэши кусков и всего файла,
+    затем PRAGMA quick_check и миграции до текущей схемы (старые бэкапы).
+    Возвращает путь к файлу; удалять его должен вызывающий.
+    При любой ошибке временный файл удаляется, а исключение пробрасывается.
+    """
+    fd, tmp_path = tempfile.mkstemp(prefix=".restore_", suffix=".db", dir=work_dir)
+    os.close(fd)
+    try:
+        ChunkStore(store_dir).restore(name, tmp_path)
+        conn = sqlite3.connect(tmp_path)
+        try:
+            check = conn.execute("PRAGMA quick_check").fetchone()[0]
+            if check != "ok":
+                raise ValueError(f"Копия повреждена: {check}")
+            migrate(conn)
+        finally:
+            conn.close()
+        return tmp_path
+    except BaseException:
+        remove_database_file(tmp_path)
+        raise
+
+
+def open_read_only(path):
+    """
+    Открывает файл БД строго для чтения как immutable: SQLite не создает
+    -wal/-shm/-journal, не берет блокировок и не проверяет изменения файла,
+    поэтому открытие мгновенное при любом размере, а сам файл не трогается.
+    """
+    uri = Path(path).resolve().as_uri() + "?mode=ro&immutable=1"
+    return sqlite3.connect(uri, uri=True)
+
+
+def open_backup_for_browsing(path, work_dir):
+    """
+    Открывает файл бэкапа для просмотра. Возвращает (соединение, временный_файл или None).
+    Файл текущей схемы открывается напрямую (open_read_only, без копирования);
+    старую базу приходится скопировать во временный файл и прогнать миграции,
+    потому что в immutable-файл писать нельзя.
+    """
+    conn = open_read_only(path)
+    try:
+        conn.execute("SELECT 1 FROM passwords LIMIT 1").fetchall()
+        if get_schema_version(conn) >= SCHEMA_VERSION:
+            return conn, None
+    except sqlite3.Error:
+        conn.close()
+        raise
+    conn.close()
+
+    fd, tmp_path = tempfile.mkstemp(prefix=".browse_", suffix=".db", dir=work_dir)
+    os.close(fd)
+    try:
+        shutil.copyfile(path, tmp_path)
+        rw = sqlite3.connect(tmp_path)
+        try:
+            migrate(rw)
+            rw.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            rw.close()
+        return open_read_only(tmp_path), tmp_path
+    except BaseException:
+        remove_database_file(tmp_path)
+        raise
+
+
+def remove_database_file(path):
+    """Удаляет файл БД вместе с возможными -wal/-shm/-journal рядом."""
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def swap_database(db, new_path):
+    """
+    Подменяет файл базы менеджера соединения db на new_path и открывает его заново.
+    Текущая база сохраняется рядом как <база>.pre_restore (жесткая ссылка, без
+    копирования данных, если ФС это позволяет). Сама подмена - os.replace,
+    то есть по пути базы всегда лежит либо старый, либо новый файл целиком.
+    Другие соединения с базой (поток поиска, фоновые задачи) вызывающий
+    закрывает заранее. Возвращает новое соединение.
+    """
+    # WAL переносится в основной файл, пока соединение еще открыто: закрытие
+    # сливает журнал, только если оно последнее, а .pre_restore должна получить
+    # все зафиксированные транзакции
+    busy = db.checkpoint()[0]
+    if busy:
+        raise sqlite3.OperationalError(
+            "База занята другим соединением: журнал не удалось перенести в файл")
+    db.close()
+    try:
+        # Журнал после TRUNCATE пуст; его файлы относятся к старой базе
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(db.path + suffix):
+                os.remove(db.path + suffix)
+
+        keep_path = db.path + PRE_RESTORE_SUFFIX
+        if os.path.exists(db.path):
+            if os.path.exists(keep_path):
+                os.remove(keep_path)
+            try:
+                os.link(db.path, keep_path)
+            except OSError:
+                shutil.copy2(db.path, keep_path)
+        os.replace(new_path, db.path)
+    finally:
+        # Даже если подмена не удалась, приложение должно остаться с открытой базой
+        db.open()
+    return db.conn
@@ -0,0 +1,335 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet, InvalidToken
+from src.database import BUSY_TIMEOUT_MS, ENVELOPE_COLUMN, SECRET_FIELDS
+from src.core.crypto import VaultCipher
+from src.core.keyring import KEY_SETTING, LEGACY_HASH_SETTING
+from src.core.repository import SECRET_EXTRA_FIELDS, VaultRepository
+
+# Состояние незавершенной смены ключа (чекпоинт) в app_settings
+ROTATION_SETTING = "key_rotation"
+# Прежние ключи хранилища (зашифрованы текущим ключом): ими читаются старые бэкапы
+RETIRED_SETTING = "retired_keys"
+# Сколько записей перешифровывать в одной транзакции
+ROTATION_BATCH = 500
+# Потоков перешифровки (криптография cryptography отпускает GIL внутри OpenSSL)
+ROTATION_WORKERS = min(8, os.cpu_count() or 1)
+
+
+class RotationCancelled(Exception):
+    """Смена ключа остановлена; продолжится с чекпоинта при следующем запуске."""
+
+
+def _decrypt_keys(key, token):
+    """Список ключей из токена, зашифрованного ключом key (None, если не подходит)."""
+    try:
+        return json.loads(Fernet(key).decrypt(token.encode()))
+    except InvalidToken:
+        return None
+
+
+def _encrypt_keys(key, keys):
+    return Fernet(key).encrypt(json.dumps(keys).encode()).decode()
+
+
+def retired_keys(repo, key):
+    """Прежние ключи хранилища (str) - из RETIRED_SETTING и незавершенной смены ключа."""
+    keys = []
+    token = repo.get_setting(RETIRED_SETTING)
+    if token:
+        keys = _decrypt_keys(key, token) or []
+    state = rotation_state(repo, key)
+    if state:
+        keys += [k for k in _decrypt_keys(key, state["keys"]) if k not in keys]
+    return keys
+
+
+def rotation_state(repo, key):
+    """
+    Чекпоинт незавершенной смены ключа или None.
+    Состояние зашифровано новым ключом; если текущий ключ к нему не подходит,
+    значит сбой случился до подмены ключа и перешифровка еще не начиналась.
+    """
+    value = repo.get_setting(ROTATION_SETTING)
+    if not value:
+        return None
+    state = json.loads(value)
+    if _decrypt_keys(key, state["keys"]) is None:
+        return None
+    return state
+
+
+def make_cipher(repo, key):
+    """
+    Шифр хранилища (VaultCipher): шифрует текущим ключом, расшифровывает любым
+    из ключей, включая прежние (данные в процессе смены ключа и старые бэкапы).
+    """
+    return VaultCipher([key] + [k.encode() for k in retired_keys(repo, key)])
+
+
+def can_decrypt(repo, cipher):
+    """
+    Пробная расшифровка: True, если cipher открывает секреты одной записи
+    базы repo (или секретов в базе нет вовсе).
+    """
+    marks = ",".join("?" * len(SECRET_EXTRA_FIELDS))
+    row = repo.conn.execute(
+        f"""SELECT id FROM passwords WHERE (password IS NOT NULL AND password != '')
+                OR {ENVELOPE_COLUMN} IS NOT NULL
+            UNION ALL
+            SELECT record_id FROM record_fields WHERE field IN ({marks}) AND value != ''
+            LIMIT 1""", SECRET_EXTRA_FIELDS).fetchone()
+    if row is None:
+        return True
+    probe = VaultRepository(repo.conn, cipher=cipher, secret_ttl=0)
+    try:
+        probe.get_secrets(row[0])
+        return True
+    except (InvalidToken, InvalidTag, ValueError):
+        return False
+
+
+def prepare_restore_keys(conn, key, keys):
+    """
+    Готовит файл копии (соединение conn) к восстановлению.
+    У копии со своим мастер-паролем ключ достается из нее при входе - возвращается
+    None. Копия без пароля будет работать с текущим ключом key (без обертки ключ
+    живет только в файле, а тот уже перезаписан текущим): к ее прежним ключам
+    дописываются ключи текущего шифра keys, чтобы открывались и записи,
+    зашифрованные ключом, смененным уже после копии. Возвращает key.
+    Бросает ValueError, если записи копии не открываются и так.
+    """
+    repo = VaultRepository(conn, secret_ttl=0)
+    if repo.get_setting(KEY_SETTING) is not None or repo.get_setting(LEGACY_HASH_SETTING) is not None:
+        return None
+    merged = retired_keys(repo, key)
+    merged += [k.decode() for k in keys if k != key and k.decode() not in merged]
+    if merged:
+        repo.set_setting(RETIRED_SETTING, _encrypt_keys(key, merged))
+    if not can_decrypt(repo, make_cipher(repo, key)):
+        raise ValueError("Записи копии зашифрованы ключом, которого нет "
+                         "ни в копии, ни в текущей базе")
+    return key
+
+
+def needs_upgrade(repo, envelope=False):
+    """
+    Есть ли секретные поля в старом формате (токены Fernet хранятся текстом),
+    а с envelope=True - вообще отдельные секретные поля вне конверта.
+    """
+    fields = [f for f in SECRET_FIELDS if f != "password"]
+    marks = ",".join("?" * len(fields))
+    legacy = "1" if envelope else "typeof({}) = 'text'"
+    return repo.conn.execute(
+        f"""SELECT EXISTS (SELECT 1 FROM passwords
+                           WHERE {legacy.format("password")} AND password != '')
+            OR EXISTS (SELECT 1 FROM record_fields WHERE field IN ({marks})
+                       AND {legacy.format("value")} AND value != '')""", fields).fetchone()[0] == 1
+
+
+def begin_upgrade(repo, key):
+    """
+    Запускает перевод старых значений в текущий формат без смены ключа:
+    тот же проход RotationWorker, только набор ключей не меняется.
+    """
+    repo.set_setting(ROTATION_SETTING, json.dumps(
+        {"keys": _encrypt_keys(key, retired_keys(repo, key)), "last_id": 0, "done": 0}))
+
+
+def begin_rotation(repo, keyring, password=None):
+    """
+    Начинает смену ключа хранилища: создает новый ключ, сохраняет чекпоинт
+    со старыми ключами (зашифрованными новым) и подменяет ключ в keyring.
+    Записи после этого перешифровывает RotationWorker.
+    Бросает keyring.WrongPassword, если пароль не подошел.
+    """
+    old_key = keyring.key
+    new_key = Fernet.generate_key()
+    keys = retired_keys(repo, old_key) + [old_key.decode()]
+    # Сначала чекпоинт, потом ключ: при сбое между ними чекпоинт не расшифруется
+    # текущим (старым) ключом и будет просто проигнорирован
+    repo.set_setting(ROTATION_SETTING, json.dumps(
+        {"keys": _encrypt_keys(new_key, keys), "last_id": 0, "done": 0}))
+    try:
+        keyring.replace_key(new_key, password)
+    except Exception:
+        repo.delete_setting(ROTATION_SETTING)
+        raise
+    return new_key
+
+
+class RotationWorker(threading.Thread):
+    """
+    Фоновая перешифровка всех секретных полей текущим ключом в текущем формате
+    (после смены ключа или для перевода старых токенов Fernet в формат v2).
+    Записи идут по возрастанию id порциями по ROTATION_BATCH: каждая порция
+    перешифровывается в пуле потоков и записывается одной транзакцией вместе
+    с чекпоинтом (last_id), поэтому после сбоя или выхода работа продолжается
+    с места остановки, а в памяти одновременно только одна порция.
+    Значения, уже зашифрованные текущим ключом в формате v2, пропускаются;
+    с envelope=True отдельные секретные поля записи собираются в конверт
+    (одна операция шифрования на запись, см. VaultRepository.seal).
+    Строка обновляется, только если шифротекст не изменился с момента чтения:
+    запись, отредактированная в это время в окне, уже зашифрована новым ключом.
+    Запись, которую не расшифровать ни одним ключом, пропускается и остается
+    как есть (иначе проход падал бы на ней при каждом входе и не завершился бы);
+    ее id копятся в чекпоинте (skipped).
+    События ("progress", сделано, всего), ("done", всего, [пропущенные id]),
+    ("cancelled", None) и ("error", текст) кладутся в очередь events.
+    """
+
+    def __init__(self, db_path, key, envelope=True, batch=ROTATION_BATCH, workers=ROTATION_WORKERS):
+        super().__init__(daemon=True)
+        self.db_path = db_path
+        self.key = key
+        # True - заодно собрать отдельные секретные поля записей в конверт
+        self.envelope = envelope
+        self.batch = batch
+        self.workers = workers
+        self.events = queue.Queue()
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        """Просит поток остановиться после текущей порции."""
+        self._cancel.set()
+
+    def run(self):
+        conn = None
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                self.rotate(conn, pool)
+        except RotationCancelled:
+            self.events.put(("cancelled", None))
+        except Exception as e:
+            self.events.put(("error", str(e)))
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def rotate(self, conn, pool):
+        row = conn.execute("SELECT value FROM app_settings WHERE key=?",
+                           (ROTATION_SETTING,)).fetchone()
+        state = json.loads(row[0])
+        keys = [self.key] + [k.encode() for k in _decrypt_keys(self.key, state["keys"])]
+        cipher = VaultCipher(keys)
+        total = conn.execute("SELECT count(*) FROM passwords").fetchone()[0]
+        fields = [f for f in SECRET_FIELDS if f != "password"]
+
+        while True:
+            if self._cancel.is_set():
+                raise RotationCancelled()
+            rows = conn.execute(
+                f"SELECT id, password, {ENVELOPE_COLUMN} FROM passwords "
+                "WHERE id > ? ORDER BY id LIMIT ?",
+                (state["last_id"], self.batch)).fetchall()
+            if not rows:
+                break
+            ids = [r[0] for r in rows]
+            marks = ",".join("?" * len(ids))
+            extra = {}
+            for rid, field, token in conn.execute(
+                    f"SELECT record_id, field, value FROM record_fields "
+                    f"WHERE record_id IN ({marks}) AND field IN ({','.join('?' * len(fields))}) "
+                    f"AND value IS NOT NULL AND value != ''", ids + fields):
+                extra.setdefault(rid, {})[field] = token
+
+            # (id, пароль, конверт, {поле: токен}) - только записи, где есть что менять
+            records = [(pid, token, envelope, extra.get(pid, {}))
+                       for pid, token, envelope in rows]
+            records = [r for r in records if self._needs_work(cipher, r)]
+            results = self._process_records(pool, cipher, records)
+            # None - запись не расшифровалась: пропускаем ее, а не всю порцию
+            skipped = [r[0] for r, res in zip(records, results) if res is None]
+            if skipped:
+                state["skipped"] = state.get("skipped", []) + skipped
+                records = [r for r, res in zip(records, results) if res is not None]
+                results = [res for res in results if res is not None]
+
+            state["last_id"] = ids[-1]
+            state["done"] += len(rows)
+            try:
+                for (pid, token, envelope, old_fields), (new_token, new_envelope, new_fields) \
+                        in zip(records, results):
+                    cur = conn.execute(
+                        f"UPDATE passwords SET password=?, {ENVELOPE_COLUMN}=? "
+                        f"WHERE id=? AND password IS ? AND {ENVELOPE_COLUMN} IS ?",
+                        (new_token, new_envelope, pid, token, envelope))
+                    if cur.rowcount == 0:
+                        continue  # Запись изменили в окне - она уже в текущем виде
+                    for field, old in old_fields.items():
+                        new = new_fields.get(field)
+                        if new is None:
+                            conn.execute("DELETE FROM record_fields "
+                                         "WHERE record_id=? AND field=? AND value=?",
+                                         (pid, field, old))
+                        elif new != old:
+                            conn.execute("UPDATE record_fields SET value=? "
+                                         "WHERE record_id=? AND field=? AND value=?",
+                                         (new, pid, field, old))
+                conn.execute("UPDATE app_settings SET value=? WHERE key=?",
+                             (json.dumps(state), ROTATION_SETTING))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            self.events.put(("progress", min(state["done"], total), total))
+
+        # Готово: прежние ключи переезжают в RETIRED_SETTING, чекпоинт удаляется
+        try:
+            conn.execute("INSERT OR REPLACE INTO app_settings (key, value) VALUES (?, ?)",
+                         (RETIRED_SETTING, state["keys"]))
+            conn.execute("DELETE FROM app_settings WHERE key=?", (ROTATION_SETTING,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        self.events.put(("done", total, state.get("skipped", [])))
+
+    def _needs_work(self, cipher, record):
+        _, token, envelope, fields = record
+        if self.envelope and (token or fields):
+            return True  # Отдельные токены надо собрать в конверт
+        return any(t and not cipher.is_current(t) for t in (token, envelope, *fields.values()))
+
+    def _process(self, cipher, record):
+        """Новые (пароль, конверт, {поле: токен}) записи."""
+        _, token, envelope, fields = record
+        if self.envelope:
+            # Все секреты записи - в один конверт, отдельные токены очищаются
+            plain = cipher.decrypt_fields(envelope) if envelope else {}
+            if token:
+                plain["password"] = cipher.decrypt(token)
+            plain.update({f: cipher.decrypt(t) for f, t in fields.items()})
+            return None, cipher.encrypt_fields(plain) if plain else None, {}
+
+        def current(t):
+            return t if not t or cipher.is_current(t) else cipher.upgrade(t)
+        return current(token), current(envelope), {f: current(t) for f, t in fields.items()}
+
+    def _process_records(self, pool, cipher, records):
+        """
+        Перешифровывает записи порции, разбив их между потоками пула.
+        Для записи, которая не расшифровалась, результат - None.
+        """
+        if not records:
+            return []
+        step = -(-len(records) // self.workers)
+        parts = [records[i:i + step] for i in range(0, len(records), step)]
+
+        def process(record):
+            try:
+                return self._process(cipher, record)
+            except (InvalidToken, InvalidTag, ValueError):
+                return None
+
+        def process_part(part):
+            return [process(r) for r in part]
+
+        return [r for part in pool.map(process_part, parts) for r in part]
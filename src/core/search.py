@@ -0,0 +1,171 @@
+import queue
+import re
+import sqlite3
+import threading
+from src.database import BUSY_TIMEOUT_MS, FTS_COLUMNS, FTS_TOKENIZE
+from src.core.repository import LIST_COLUMNS, SEARCH_LIMIT, VaultRepository
+from src.core.restore import open_read_only
+
+# Позиции id и типа записи в строке списка (LIST_COLUMNS)
+ID_COL = LIST_COLUMNS.index("id")
+TYPE_COL = LIST_COLUMNS.index("type")
+
+
+def search_words(search):
+    """Слова строки поиска в нижнем регистре (как их разбирает build_match)."""
+    search = (search or "").replace("ё", "е").replace("Ё", "Е").lower()
+    return re.findall(r"[^\W_]+", search)
+
+
+def _normalize(value):
+    """Та же нормализация, что у индекса базы (database.fts_normalize_sql)."""
+    return value.replace("ё", "е").replace("Ё", "Е") if isinstance(value, str) else value
+
+
+def _with_type(ptype):
+    return bool(ptype) and ptype != "Все"
+
+
+class SearchWorker(threading.Thread):
+    """
+    Живой поиск в фоне на отдельном соединении (только чтение).
+
+    Окно отправляет запросы через submit(); из очереди берется только самый
+    свежий, а выполняющийся запрос к базе прерывается (sqlite3 interrupt),
+    как только приходит новый - результат устаревшего текста никому не нужен.
+
+    Если прошлый результат из базы был полным (меньше SEARCH_LIMIT строк), а новый
+    запрос его уточняет (слова дописаны или добавлены, тип сужен), строки
+    отбираются из прошлого результата без обращения к базе: по ним строится
+    маленький FTS5-индекс в памяти с тем же токенизатором, поэтому совпадения
+    те же, что дал бы индекс базы. Порядок - как в прошлом результате.
+
+    События ("rows", seq, строки) и ("error", seq, текст) кладутся в очередь events.
+    """
+
+    def __init__(self, db_path, immutable=False):
+        super().__init__(daemon=True)
+        self.db_path = db_path
+        # True - файл копии (просмотр бэкапа), открывается как immutable
+        self.immutable = immutable
+        self.events = queue.Queue()
+        # Сколько запросов ушло в базу (остальные отобраны в памяти)
+        self.queries = 0
+        self._requests = queue.Queue()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._busy = False
+        # True - данные изменились, прошлый результат для уточнения не годится
+        self._stale = False
+        # Полный прошлый результат: (тип, слова, строки)
+        self._base = None
+
+    def submit(self, seq, ptype, search):
+        """Ставит запрос в очередь и прерывает выполняющийся запрос к базе."""
+        self._requests.put((seq, ptype, search))
+        self._interrupt()
+
+    def invalidate(self):
+        """Записи изменились: следующий запрос пойдет в базу."""
+        self._stale = True
+
+    def stop(self):
+        self._requests.put(None)
+        self._interrupt()
+
+    def _interrupt(self):
+        with self._lock:
+            if self._busy:
+                self._conn.interrupt()
+
+    def run(self):
+        try:
+            if self.immutable:
+                self._conn = open_read_only(self.db_path)
+            else:
+                self._conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000)
+            repo = VaultRepository(self._conn, secret_ttl=0)
+            mem = sqlite3.connect(":memory:")
+            mem.execute(f"CREATE VIRTUAL TABLE results USING fts5("
+                        f"{', '.join(FTS_COLUMNS)}, tokenize='{FTS_TOKENIZE}')")
+        except Exception as e:
+            self.events.put(("error", None, str(e)))
+            return
+
+        try:
+            while True:
+                request = self._next_request()
+                if request is None:
+                    break
+                seq, ptype, search = request
+                try:
+                    rows = self._narrow(mem, ptype, search)
+                    if rows is None:
+                        rows = self._query(repo, mem, ptype, search)
+                except sqlite3.OperationalError as e:
+                    if "interrupted" in str(e):
+                        continue  # Пришел более свежий запрос
+                    self.events.put(("error", seq, str(e)))
+                    continue
+                self.events.put(("rows", seq, rows))
+        finally:
+            mem.close()
+            self._conn.close()
+
+    def _next_request(self):
+        """Самый свежий запрос из очереди (None - остановка)."""
+        request = self._requests.get()
+        while request is not None:
+            try:
+                request = self._requests.get_nowait()
+            except queue.Empty:
+                break
+        return request
+
+    def _query(self, repo, mem, ptype, search):
+        """Запрос к базе; полный результат запоминается для уточнений."""
+        with self._lock:
+            self._busy = True
+        try:
+            self._stale = False
+            rows = repo.list_rows(ptype, search)
+            texts = repo.get_search_text(row[ID_COL] for row in rows)
+        finally:
+            with self._lock:
+                self._busy = False
+        self.queries += 1
+
+        mem.execute("DELETE FROM results")
+        self._base = None
+        words = search_words(search)
+        if words and len(rows) < SEARCH_LIMIT:
+            # rowid строки индекса = позиция в результате
+            empty = (None,) * len(FTS_COLUMNS)
+            mem.executemany(
+                f"INSERT INTO results (rowid, {', '.join(FTS_COLUMNS)}) "
+                f"VALUES (?{', ?' * len(FTS_COLUMNS)})",
+                [(i, *map(_normalize, texts.get(row[ID_COL], empty)))
+                 for i, row in enumerate(rows)])
+            self._base = (ptype, words, rows)
+        return rows
+
+    def _narrow(self, mem, ptype, search):
+        """Строки из прошлого полного результата или None, если нужен запрос к базе."""
+        if self._stale or self._base is None:
+            return None
+        base_type, base_words, rows = self._base
+        words = search_words(search)
+        if not words:
+            return None
+        # Тип тот же или сужен со "Все" до конкретного
+        if _with_type(base_type) and base_type != ptype:
+            return None
+        # Каждое прежнее слово-префикс уточнено новым словом
+        if not all(any(w.startswith(b) for w in words) for b in base_words):
+            return None
+        match = VaultRepository.build_match(search)
+        found = [rows[i] for (i,) in mem.execute(
+            "SELECT rowid FROM results WHERE results MATCH ? ORDER BY rowid", (match,))]
+        if _with_type(ptype) and not _with_type(base_type):
+            found = [row for row in found if row[TYPE_COL] == ptype]
+        return found
@@ -0,0 +1,56 @@
+import time
+from collections import OrderedDict
+
+# Сколько расшифрованных значений держать одновременно
+SECRET_CACHE_SIZE = 64
+# Сколько секунд расшифрованное значение живет в памяти по умолчанию
+DEFAULT_SECRET_TTL = 30
+
+
+class SecretCache:
+    """
+    Небольшой LRU-кэш расшифрованных секретов с ограниченным временем жизни.
+    Повторное копирование/показ того же пароля через несколько секунд
+    не требует нового SELECT и расшифровки Fernet.
+    Ключ - (id записи, версия строки, поле); значения старше ttl секунд
+    не выдаются. Кэш очищается явно при блокировке и при записи в запись.
+    ttl = 0 отключает кэш.
+    """
+
+    def __init__(self, ttl=DEFAULT_SECRET_TTL, maxsize=SECRET_CACHE_SIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        # ключ -> (время истечения, значение); порядок = давность использования
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key):
+        """Значение по ключу или None (если его нет или истек срок)."""
+        item = self._items.get(key)
+        if item is None:
+            return None
+        expires, value = item
+        if time.monotonic() >= expires:
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        if self.ttl <= 0:
+            return
+        self._items[key] = (time.monotonic() + self.ttl, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def discard_records(self, ids):
+        """Забывает все значения переданных записей."""
+        ids = set(ids)
+        for key in [k for k in self._items if k[0] in ids]:
+            del self._items[key]
+
+    def clear(self):
+        self._items.clear()
@@ -0,0 +1,70 @@
+from datetime import datetime, timezone
+
+
+class TouchBuffer:
+    """
+    Буфер отметок "последнее использование" (write-behind).
+    Копирование логина/пароля и открытие записи не пишут в БД сразу:
+    отметка запоминается в памяти, а репозиторий периодически сбрасывает
+    все накопленные отметки одной транзакцией.
+    Повторные отметки одной записи схлопываются в одну (последнюю).
+    """
+
+    def __init__(self):
+        # id записи -> время отметки в формате CURRENT_TIMESTAMP (UTC).
+        # Порядок ключей = порядок использования (последняя отметка в конце).
+        self.pending = {}
+
+    def __len__(self):
+        return len(self.pending)
+
+    def add(self, ids):
+        """Запоминает использование записей."""
+        ts = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        for pid in ids:
+            # Удаляем и вставляем заново, чтобы запись переехала в конец порядка
+            self.pending.pop(pid, None)
+            self.pending[pid] = ts
+
+    def get(self, pid):
+        """Несохраненная отметка записи или None."""
+        return self.pending.get(pid)
+
+    def take(self):
+        """Забирает все накопленные отметки (буфер становится пустым)."""
+        items, self.pending = self.pending, {}
+        return items
+
+    def restore(self, items):
+        """Возвращает отметки в буфер, если сброс в БД не удался (новые важнее)."""
+        merged = dict(items)
+        merged.update(self.pending)
+        self.pending = merged
+
+    def discard(self, ids):
+        """Забывает отметки удаленных записей."""
+        for pid in ids:
+            self.pending.pop(pid, None)
+
+    def order_rows(self, rows, newest_first, id_index):
+        """
+        Подмешивает несохраненные отметки в список, отсортированный по last_used_at.
+        Несохраненная отметка всегда новее любой записанной, поэтому такие строки
+        просто переезжают в начало (newest_first) или в конец списка,
+        упорядоченные между собой по времени использования.
+        """
+        if not self.pending:
+            return rows
+        touched = {}
+        rest = []
+        for row in rows:
+            if row[id_index] in self.pending:
+                touched[row[id_index]] = row
+            else:
+                rest.append(row)
+        if not touched:
+            return rows
+        ordered = [touched[pid] for pid in self.pending if pid in touched]
+        if newest_first:
+            return ordered[::-1] + rest
+        return rest + ordered
@@ -0,0 +1,148 @@
+import math
+import os
+import queue
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from src.database import ENVELOPE_COLUMN, SECRET_FIELDS
+from src.core.chunk_store import ChunkStore
+
+# Доля секретных полей, которые пробуем расшифровать при проверке (0.1 = 10%)
+DEFAULT_SAMPLE_SHARE = 0.1
+# Пауза между расшифровками (сек): проверка уступает процессор интерфейсу
+YIELD_SLEEP = 0.002
+# "Вежливость" потока проверки для планировщика ОС (больше - ниже приоритет)
+WORKER_NICE = 10
+
+
+def lower_thread_priority():
+    """
+    Понижает приоритет текущего потока (только Linux: там setpriority с id
+    потока действует на этот поток). В macOS и BSD тот же вызов ждет pid
+    и понизил бы приоритет постороннего процесса, поэтому там не делается ничего.
+    """
+    if not sys.platform.startswith("linux") or not hasattr(os, "setpriority"):
+        return
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), WORKER_NICE)
+    except (OSError, AttributeError):
+        pass
+
+
+def verify_database(path, cipher, sample_share=DEFAULT_SAMPLE_SHARE):
+    """
+    Проверяет файл БД бэкапа: открывает только для чтения, делает
+    PRAGMA quick_check и пробует расшифровать долю sample_share секретных полей.
+    Возвращает словарь с итогами (status "ok"/"failed", message, records, sampled,
+    decrypt_errors).
+    """
+    # URI из пути с экранированием (?, #, % в имени, пути Windows), как в restore.open_read_only
+    conn = sqlite3.connect(Path(path).resolve().as_uri() + "?mode=ro", uri=True)
+    try:
+        check = conn.execute("PRAGMA quick_check").fetchone()[0]
+        if check != "ok":
+            return {"status": "failed", "message": f"quick_check: {check}"}
+        records = conn.execute("SELECT count(*) FROM passwords").fetchone()[0]
+
+        secrets = [r[0] for r in conn.execute(
+            "SELECT password FROM passwords WHERE password IS NOT NULL AND password != ''")]
+        # Конверты записей (в копиях до миграции №5 колонки нет)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(passwords)")}
+        if ENVELOPE_COLUMN in columns:
+            secrets += [r[0] for r in conn.execute(
+                f"SELECT {ENVELOPE_COLUMN} FROM passwords WHERE {ENVELOPE_COLUMN} IS NOT NULL")]
+        fields = [f for f in SECRET_FIELDS if f != "password"]
+        marks = ",".join("?" * len(fields))
+        secrets += [r[0] for r in conn.execute(
+            f"SELECT value FROM record_fields WHERE field IN ({marks})", fields)]
+    finally:
+        conn.close()
+
+    # Случайная выборка, но не меньше одного поля, если секреты вообще есть
+    count = min(len(secrets), math.ceil(len(secrets) * sample_share))
+    sample = secrets if count >= len(secrets) else random.sample(secrets, count)
+    errors = 0
+    for token in sample:
+        try:
+            cipher.decrypt(token)
+        except Exception:
+            errors += 1
+        time.sleep(YIELD_SLEEP)
+
+    result = {"status": "ok", "message": "", "records": records,
+              "sampled": len(sample), "decrypt_errors": errors}
+    if errors:
+        result["status"] = "failed"
+        result["message"] = f"не расшифровано {errors} из {len(sample)} полей"
+    return result
+
+
+class BackupVerifier(threading.Thread):
+    """
+    Фоновая проверка бэкапов с пониженным приоритетом.
+    Для каждого снимка без отметки о проверке собирает его во временный файл
+    (ChunkStore.restore сверяет хэши кусков и всего файла), проверяет как
+    verify_database и записывает итог в каталог хранилища.
+    Снимок, удаленный во время проверки (чистка после бэкапа), пропускается.
+    События ("verified", имя) и ("failed", имя, причина) кладутся в очередь events;
+    главный поток забирает их через root.after и показывает сбои в статус-баре.
+    """
+
+    def __init__(self, store_dir, work_dir, cipher, sample_share=DEFAULT_SAMPLE_SHARE):
+        super().__init__(daemon=True)
+        self.store = ChunkStore(store_dir)
+        self.work_dir = work_dir
+        self.cipher = cipher
+        self.sample_share = sample_share
+        self.events = queue.Queue()
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        """Просит поток остановиться после текущего снимка."""
+        self._cancel.set()
+
+    def run(self):
+        lower_thread_priority()
+        catalog = self.store.read_catalog()
+        pending = []
+        for name in self.store.list_snapshots():
+            entry = catalog.get(name, {})
+            if "verified_at" not in entry:
+                pending.append(name)
+            elif entry.get("status") == "failed":
+                # Сбои прошлых проверок тоже показываем (повторно не проверяем)
+                self.events.put(("failed", name, entry.get("message", "")))
+
+        for name in pending:
+            if self._cancel.is_set():
+                break
+            result = self.verify(name)
+            # Снимок удалили по политике хранения, пока шла проверка: его куски
+            # могли пропасть посреди сборки, и это не сбой копии - снимок пропускаем
+            if not os.path.exists(self.store.manifest_path(name)):
+                continue
+            result["verified_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            self.store.update_catalog(name, **result)
+            if result["status"] == "ok":
+                self.events.put(("verified", name))
+            else:
+                self.events.put(("failed", name, result["message"]))
+
+    def verify(self, name):
+        """Проверяет один снимок, возвращает словарь с итогами."""
+        fd, tmp_path = tempfile.mkstemp(prefix=".verify_", suffix=".db",
+                                        dir=self.work_dir)
+        os.close(fd)
+        try:
+            self.store.restore(name, tmp_path)
+            return verify_database(tmp_path, self.cipher, self.sample_share)
+        except Exception as e:
+            return {"status": "failed", "message": str(e)}
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
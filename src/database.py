@@ -1,95 +1,388 @@
 import sqlite3
 import os
-from cryptography.fernet import Fernet
 
 
-def init_database():
+# Файл базы данных хранилища
+DB_FILE = 'password_manager.db'
+
+# Колонки таблицы passwords сверх базовых (id, даты, name, type, password, username).
+# Раньше они добавлялись через ALTER TABLE при каждом запуске,
+# теперь - один раз миграцией №1 для старых баз. С миграции №4 большая часть
+# из них хранится построчно в record_fields (см. HOT_COLUMNS), а порядок
+# здесь задает порядок вывода полей записи.
+RECORD_EXTRA_COLUMNS = {
+    "email": "TEXT", "url": "TEXT", "phone": "TEXT", "category": "TEXT", "tags": "TEXT",
+    "notes": "TEXT", "is_favorite": "BOOLEAN DEFAULT 0", "last_used_at": "TIMESTAMP",
+    "security_question": "TEXT", "security_answer": "TEXT", "recovery_email": "TEXT",
+    "recovery_phone": "TEXT", "full_name": "TEXT", "date_of_birth": "TEXT", "address": "TEXT",
+    "passport_number": "TEXT", "identification_number": "TEXT", "account_number": "TEXT",
+    "bank_name": "TEXT", "card_number": "TEXT", "card_cvv": "TEXT", "card_expire": "TEXT",
+    "card_holder": "TEXT", "card_pin": "TEXT", "card_type": "TEXT", "bank_bik": "TEXT",
+    "account_type": "TEXT", "currency": "TEXT", "limit_amount": "TEXT",
+    "cardholder_phone": "TEXT", "cardholder_full_name": "TEXT",
+    # Поля для пользовательских типов записей
+    "custom_field_1": "TEXT", "custom_field_2": "TEXT", "custom_field_3": "TEXT",
+    "custom_field_4": "TEXT", "custom_field_5": "TEXT", "custom_field_6": "TEXT",
+    "custom_field_7": "TEXT", "custom_field_8": "TEXT", "custom_field_9": "TEXT",
+    "custom_field_10": "TEXT"
+}
+
+# Поля записи, которые хранятся зашифрованными
+SECRET_FIELDS = ("password", "card_number", "card_cvv", "card_pin",
+                 "security_answer", "account_number", "passport_number")
+# Колонка passwords с конвертом: все секретные поля записи одним шифротекстом
+ENVELOPE_COLUMN = "secrets"
+
+
+# Режимы надежности записи (настройка "db_durability" -> PRAGMA synchronous).
+# В режиме WAL "NORMAL" не теряет целостность базы при сбое питания,
+# но последние транзакции могут откатиться. "FULL" делает fsync на каждый commit.
+DURABILITY_MODES = {
+    "Обычная (быстрее)": "NORMAL",
+    "Полная (надежнее)": "FULL",
+}
+DEFAULT_DURABILITY = "Обычная (быстрее)"
+
+# Сколько ждать освобождения блокировки другим соединением (мс)
+BUSY_TIMEOUT_MS = 5000
+
+
+class ConnectionManager:
     """
-    Инициализирует подключение к БД и создает необходимые таблицы, если их нет.
-    Возвращает объект соединения (connection).
+    Владелец единственного соединения с базой хранилища.
+    Все окна работают через него (через VaultRepository), а не открывают
+    свои соединения. При открытии включает WAL, таймаут блокировок,
+    подбирает cache_size/mmap_size под размер базы и прогоняет миграции.
     """
-    # Подключаемся к файлу базы данных
-    conn = sqlite3.connect('password_manager.db')
-    cursor = conn.cursor()
 
-    # Создаем основную таблицу для хранения записей.
-    # Используем IF NOT EXISTS, чтобы не сломать существующую базу.
-    cursor.execute('''
+    def __init__(self, path=DB_FILE, durability=DEFAULT_DURABILITY):
+        self.path = path
+        self.durability = durability
+        self.conn = None
+        self.open()
+
+    def open(self):
+        """Открывает соединение и настраивает его."""
+        # cached_statements: с запасом под все запросы репозитория
+        conn = sqlite3.connect(
+            self.path, timeout=BUSY_TIMEOUT_MS / 1000, cached_statements=256)
+        # WAL: читатели не блокируются писателем, commit не переписывает основной файл
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        self._tune_memory(conn)
+        self.conn = conn
+        self.set_durability(self.durability)
+        migrate(conn)
+        return conn
+
+    def _tune_memory(self, conn):
+        """Размер кэша страниц и mmap в зависимости от размера файла базы."""
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            size = 0
+        # Кэш страниц: весь файл + 25% на рост, но от 2 до 64 МБ (в КиБ, знак "-")
+        cache_kib = min(max(int(size * 1.25) // 1024, 2048), 64 * 1024)
+        conn.execute(f"PRAGMA cache_size=-{cache_kib}")
+        # mmap: вдвое больше файла, от 16 до 256 МБ
+        mmap_bytes = min(max(size * 2, 16 * 1024 * 1024), 256 * 1024 * 1024)
+        conn.execute(f"PRAGMA mmap_size={mmap_bytes}")
+
+    def set_durability(self, durability):
+        """Переключает режим надежности записи (подпись из DURABILITY_MODES)."""
+        self.durability = durability if durability in DURABILITY_MODES else DEFAULT_DURABILITY
+        self.conn.execute(
+            f"PRAGMA synchronous={DURABILITY_MODES[self.durability]}")
+
+    def checkpoint(self):
+        """
+        Переносит содержимое WAL-журнала в основной файл базы.
+        Возвращает (busy, страниц в журнале, перенесено); busy=1 - другое
+        соединение помешало перенести журнал целиком.
+        """
+        return self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+
+    def close(self):
+        """Закрывает соединение (SQLite сам сольет WAL в основной файл)."""
+        if self.conn is not None:
+            # Дешевое обновление статистики индексов, если она устарела
+            self.conn.execute("PRAGMA optimize")
+            self.conn.close()
+            self.conn = None
+
+
+# --- МИГРАЦИИ СХЕМЫ ---
+# Каждая миграция - функция, получающая соединение. Миграции выполняются
+# строго по порядку, каждая ровно один раз и в своей транзакции.
+# Номер последней примененной миграции хранится в таблице schema_version.
+# ВАЖНО: уже выпущенные миграции не меняем, новые изменения - только новым шагом.
+
+def _migration_base_schema(conn):
+    """Базовая схема: таблицы passwords и app_settings со всеми колонками."""
+    extra = ",\n".join(
+        f"{col} {dtype}" for col, dtype in RECORD_EXTRA_COLUMNS.items() if col != "last_used_at")
+    # Основная таблица для хранения записей.
+    # IF NOT EXISTS - на случай базы, созданной до появления schema_version.
+    conn.execute(f'''
         CREATE TABLE IF NOT EXISTS passwords (
-            id INTEGER PRIMARY KEY AUTOINCREMENT, 
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, 
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, 
-            last_used_at TIMESTAMP, 
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_used_at TIMESTAMP,
             name TEXT NOT NULL,       -- Название записи
             type TEXT NOT NULL,       -- Тип (WEB, CARD, ...)
             password TEXT,            -- Зашифрованный пароль
-            username TEXT             -- Логин/Имя пользователя
+            username TEXT,            -- Логин/Имя пользователя
+            {extra}
         )
     ''')
 
     # Таблица для хранения системных настроек, например, хэша мастер-пароля.
     # (Остальные настройки хранятся в JSON, но хэш безопаснее держать в БД)
-    cursor.execute(
+    conn.execute(
         "CREATE TABLE IF NOT EXISTS app_settings (key TEXT PRIMARY KEY, value TEXT)")
 
-    # Проверяем, все ли колонки есть в таблице (миграция структуры)
-    ensure_columns(cursor)
+    # Старые базы могли быть созданы без части колонок - добавляем недостающие
+    existing_columns = {row[1]
+                        for row in conn.execute("PRAGMA table_info(passwords)")}
+    for col, dtype in RECORD_EXTRA_COLUMNS.items():
+        if col not in existing_columns:
+            conn.execute(f"ALTER TABLE passwords ADD COLUMN {col} {dtype}")
+
+
+# Индексы под каждый вариант сортировки таблицы (PasswordManager.sort_options):
+# отдельно для списка "Все" и в паре с фильтром по типу (type=?).
+# Так SQLite читает строки сразу в нужном порядке, без полного прохода и временной сортировки.
+LIST_INDEXES = {
+    "idx_passwords_updated": "updated_at",
+    "idx_passwords_type_updated": "type, updated_at",
+    "idx_passwords_name": "name",
+    "idx_passwords_type_name": "type, name",
+    "idx_passwords_username": "username",
+    "idx_passwords_type_username": "type, username",
+    "idx_passwords_last_used": "last_used_at",
+    "idx_passwords_type_last_used": "type, last_used_at",
+    # "Избранные в начале": is_favorite DESC, name ASC
+    "idx_passwords_fav_first": "is_favorite DESC, name",
+    "idx_passwords_type_fav_first": "type, is_favorite DESC, name",
+    # "Избранные в конце": is_favorite ASC, name ASC
+    "idx_passwords_fav_last": "is_favorite, name",
+    "idx_passwords_type_fav_last": "type, is_favorite, name",
+    # Порядок по умолчанию (repository.DEFAULT_ORDER): created_at DESC
+    "idx_passwords_created": "created_at",
+    "idx_passwords_type_created": "type, created_at",
+}
+
+
+def _create_list_indexes(conn):
+    for name, columns in LIST_INDEXES.items():
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {name} ON passwords ({columns})")
+
 
-    conn.commit()
-    return conn
+def _migration_list_indexes(conn):
+    """Индексы для сортировок и фильтра по типу в главной таблице."""
+    _create_list_indexes(conn)
+    # Статистика для планировщика запросов
+    conn.execute("ANALYZE passwords")
 
 
-def ensure_columns(cursor):
+# Несекретные текстовые колонки, по которым работает живой поиск (FTS5).
+# Порядок важен: он совпадает с весами bm25 в репозитории.
+FTS_COLUMNS = ("name", "username", "email", "url", "notes", "tags", "category")
+# Токенизатор индекса (им же индексирует поиск в памяти, см. core.search)
+FTS_TOKENIZE = "unicode61 remove_diacritics 2"
+
+
+def fts_normalize_sql(expr):
     """
-    Проверяет структуру таблицы passwords и добавляет недостающие колонки.
-    Это простая система миграций: если мы добавили новое поле (например, 'bank_bik'),
-    оно автоматически добавится в старую базу данных пользователя.
+    SQL-выражение, нормализующее текст перед индексацией: "ё" -> "е".
+    Регистр (в т.ч. кириллицу) токенизатор unicode61 приводит сам.
+    Тот же прием применяется к строке поиска в репозитории.
     """
-    # Список всех возможных полей для всех типов записей
-    required_columns = {
-        "email": "TEXT", "url": "TEXT", "phone": "TEXT", "category": "TEXT", "tags": "TEXT",
-        "notes": "TEXT", "is_favorite": "BOOLEAN DEFAULT 0", "last_used_at": "TIMESTAMP",
-        "security_question": "TEXT", "security_answer": "TEXT", "recovery_email": "TEXT",
-        "recovery_phone": "TEXT", "full_name": "TEXT", "date_of_birth": "TEXT", "address": "TEXT",
-        "passport_number": "TEXT", "identification_number": "TEXT", "account_number": "TEXT",
-        "bank_name": "TEXT", "card_number": "TEXT", "card_cvv": "TEXT", "card_expire": "TEXT",
-        "card_holder": "TEXT", "card_pin": "TEXT", "card_type": "TEXT", "bank_bik": "TEXT",
-        "account_type": "TEXT", "currency": "TEXT", "limit_amount": "TEXT",
-        "cardholder_phone": "TEXT", "cardholder_full_name": "TEXT",
-        # Поля для пользовательских типов записей
-        "custom_field_1": "TEXT", "custom_field_2": "TEXT", "custom_field_3": "TEXT",
-        "custom_field_4": "TEXT", "custom_field_5": "TEXT", "custom_field_6": "TEXT",
-        "custom_field_7": "TEXT", "custom_field_8": "TEXT", "custom_field_9": "TEXT",
-        "custom_field_10": "TEXT"
-    }
-
-    # Получаем список уже существующих колонок в БД
-    cursor.execute("PRAGMA table_info(passwords)")
-    existing_columns = {row[1] for row in cursor.fetchall()}
-
-    # Добавляем те, которых не хватает
-    for col, dtype in required_columns.items():
-        if col not in existing_columns:
-            try:
-                cursor.execute(
-                    f"ALTER TABLE passwords ADD COLUMN {col} {dtype}")
-            except:
-                pass
+    return f"replace(replace({expr}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+def _create_fts_triggers(conn):
+    """Триггеры, поддерживающие passwords_fts в актуальном состоянии."""
+    cols = ", ".join(FTS_COLUMNS)
+    new_vals = ", ".join(fts_normalize_sql(f"new.{c}") for c in FTS_COLUMNS)
+    old_vals = ", ".join(fts_normalize_sql(f"old.{c}") for c in FTS_COLUMNS)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS passwords_fts_ai AFTER INSERT ON passwords BEGIN
+            INSERT INTO passwords_fts (rowid, {cols}) VALUES (new.id, {new_vals});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS passwords_fts_ad AFTER DELETE ON passwords BEGIN
+            INSERT INTO passwords_fts (passwords_fts, rowid, {cols}) VALUES ('delete', old.id, {old_vals});
+        END
+    """)
+    # Только при изменении текстовых колонок: отметки "использовано" и
+    # переключение избранного индекс не трогают
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS passwords_fts_au AFTER UPDATE OF {cols} ON passwords BEGIN
+            INSERT INTO passwords_fts (passwords_fts, rowid, {cols}) VALUES ('delete', old.id, {old_vals});
+            INSERT INTO passwords_fts (rowid, {cols}) VALUES (new.id, {new_vals});
+        END
+    """)
+
+
+def _migration_fulltext_search(conn):
+    """
+    Полнотекстовый индекс passwords_fts (FTS5) по несекретным колонкам.
+    Индекс "без содержимого" (content=''): сам текст живет только в passwords,
+    в индекс попадает нормализованная копия. Токенизатор unicode61 приводит
+    к нижнему регистру и кириллицу, префиксные индексы ускоряют поиск по первым
+    буквам слова.
+    """
+    cols = ", ".join(FTS_COLUMNS)
+    conn.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS passwords_fts USING fts5(
+            {cols},
+            content='',
+            tokenize='{FTS_TOKENIZE}',
+            prefix='1 2 3'
+        )
+    """)
+    _create_fts_triggers(conn)
+    # Индексируем уже существующие записи
+    vals = ", ".join(fts_normalize_sql(c) for c in FTS_COLUMNS)
+    conn.execute(
+        f"INSERT INTO passwords_fts (rowid, {cols}) SELECT id, {vals} FROM passwords")
 
 
-def get_encryption_key():
+# "Горячие" колонки, которые остаются в строке passwords: то, что нужно
+# списку, поиску и копированию. Остальные (поля карт, счетов, паспорта,
+# пользовательские поля) живут в таблице record_fields: поле = строка.
+HOT_COLUMNS = ("id", "created_at", "updated_at", "last_used_at", "name", "type",
+               "password", "username", "email", "url", "phone", "category",
+               "tags", "notes", "is_favorite")
+
+
+def _migration_record_fields(conn):
     """
-    Загружает или генерирует ключ шифрования (Fernet).
-    Ключ хранится в файле encryption.key.
-    ВНИМАНИЕ: Потеря этого файла означает потерю доступа ко всем паролям!
+    Выносит редкие (типоспецифичные) колонки из passwords в record_fields
+    и пересобирает passwords без них: строки становятся короче,
+    а новые поля больше не требуют ALTER TABLE.
     """
+    # WITHOUT ROWID: поля одной записи лежат рядом, по первичному ключу
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS record_fields (
+            record_id INTEGER NOT NULL,
+            field TEXT NOT NULL,
+            value,
+            PRIMARY KEY (record_id, field)
+        ) WITHOUT ROWID
+    """)
+
+    existing = [row[1] for row in conn.execute("PRAGMA table_info(passwords)")]
+    for col in existing:
+        if col in HOT_COLUMNS:
+            continue
+        # Имя колонки взято из схемы самой базы, а не из пользовательских данных
+        conn.execute(f"""
+            INSERT OR REPLACE INTO record_fields (record_id, field, value)
+            SELECT id, ?, "{col}" FROM passwords WHERE "{col}" IS NOT NULL AND "{col}" <> ''
+        """, (col,))
+
+    # Пересборка таблицы: создаем узкую копию, переливаем данные, меняем местами
+    conn.execute("""
+        CREATE TABLE passwords_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_used_at TIMESTAMP,
+            name TEXT NOT NULL,       -- Название записи
+            type TEXT NOT NULL,       -- Тип (WEB, CARD, ...)
+            password TEXT,            -- Зашифрованный пароль
+            username TEXT,            -- Логин/Имя пользователя
+            email TEXT,
+            url TEXT,
+            phone TEXT,
+            category TEXT,
+            tags TEXT,
+            notes TEXT,
+            is_favorite BOOLEAN DEFAULT 0
+        )
+    """)
+    cols = ", ".join(HOT_COLUMNS)
+    conn.execute(
+        f"INSERT INTO passwords_new ({cols}) SELECT {cols} FROM passwords")
+    # Вместе со старой таблицей удаляются её индексы и триггеры
+    conn.execute("DROP TABLE passwords")
+    conn.execute("ALTER TABLE passwords_new RENAME TO passwords")
+
+    _create_list_indexes(conn)
+    _create_fts_triggers(conn)
+    # Поля записи удаляются вместе с ней
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS passwords_fields_ad AFTER DELETE ON passwords BEGIN
+            DELETE FROM record_fields WHERE record_id = old.id;
+        END
+    """)
+    conn.execute("ANALYZE passwords")
+
+
+def _migration_secret_envelope(conn):
+    """Колонка для конверта секретных полей записи (см. VaultRepository.seal)."""
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(passwords)")}
+    if ENVELOPE_COLUMN not in existing:
+        conn.execute(f"ALTER TABLE passwords ADD COLUMN {ENVELOPE_COLUMN} BLOB")
+
+
+def _migration_default_order_index(conn):
+    """Индексы порядка по умолчанию (created_at), добавленного в LIST_INDEXES позже."""
+    _create_list_indexes(conn)
+    conn.execute("ANALYZE passwords")
+
+
+# Упорядоченный список миграций: (номер версии, описание, функция)
+MIGRATIONS = [
+    (1, "Базовая схема", _migration_base_schema),
+    (2, "Индексы сортировок", _migration_list_indexes),
+    (3, "Полнотекстовый поиск", _migration_fulltext_search),
+    (4, "Редкие поля в record_fields", _migration_record_fields),
+    (5, "Конверт секретных полей", _migration_secret_envelope),
+    (6, "Индекс порядка по умолчанию", _migration_default_order_index),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    """Текущая версия схемы базы (0 - база без schema_version)."""
     try:
-        # Пытаемся прочитать существующий ключ
-        with open('encryption.key', 'rb') as f:
-            return f.read()
-    except FileNotFoundError:
-        # Если ключа нет, генерируем новый и сохраняем его
-        key = Fernet.generate_key()
-        with open('encryption.key', 'wb') as f:
-            f.write(key)
-        return key
+        row = conn.execute("SELECT version FROM schema_version").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] if row else 0
+
+
+def migrate(conn):
+    """
+    Применяет все недостающие миграции.
+    Для актуальной базы стоит ровно одно чтение номера версии.
+    """
+    current = get_schema_version(conn)
+    if current >= SCHEMA_VERSION:
+        return current
+
+    for version, description, step in MIGRATIONS:
+        if version <= current:
+            continue
+        # Шаг и запись его номера - одна транзакция: либо всё, либо ничего
+        conn.execute("BEGIN")
+        try:
+            step(conn)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)")
+            conn.execute("DELETE FROM schema_version")
+            conn.execute(
+                "INSERT INTO schema_version (version) VALUES (?)", (version,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        current = version
+    return current
+
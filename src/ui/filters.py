@@ -36,9 +36,9 @@ class UIFilterBar:
         self.app.search_entry.bind('<FocusIn>', self._on_focus_in)
         self.app.search_entry.bind('<FocusOut>', self._on_focus_out)
 
-        # Живой поиск: обновляем таблицу при каждом отпускании клавиши
+        # Живой поиск: нажатия сливаются, запрос уходит после паузы в наборе
         self.app.search_entry.bind(
-            '<KeyRelease>', lambda e: self.app.filter_passwords())
+            '<KeyRelease>', lambda e: self.app.schedule_search())
 
         # --- Выпадающий список "Тип" ---
         tk.Label(self.frame, text="Тип:", bg="#ecf0f1",
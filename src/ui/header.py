@@ -24,8 +24,13 @@ class UIHeader:
             tk.Label(status_frame, image=icon, bg="#2c3e50").pack(
                 side=tk.LEFT, padx=(0, 5))
 
-        tk.Label(status_frame, text="Хранилище разблокировано",
-                 font=self.app.f_head, bg="#2c3e50", fg="#2ecc71").pack(side=tk.LEFT)
+        if self.app.browse:
+            # Режим просмотра копии: явно показываем, что данные не рабочие и не меняются
+            tk.Label(status_frame, text=f"Просмотр копии: {self.app.browse['label']} (только чтение)",
+                     font=self.app.f_head, bg="#2c3e50", fg="#f39c12").pack(side=tk.LEFT)
+        else:
+            tk.Label(status_frame, text="Хранилище разблокировано",
+                     font=self.app.f_head, bg="#2c3e50", fg="#2ecc71").pack(side=tk.LEFT)
 
         # --- Правая часть: Кнопка "Заблокировать" ---
         lock_icon = self.app.icon_mgr.get(
@@ -36,3 +41,9 @@ class UIHeader:
                         fg="white", font=("Arial", 10, "bold"), relief="flat",
                         command=self.app.lock_app, cursor="hand2")
         btn.pack(side=tk.RIGHT, padx=20, pady=10, ipady=2)
+
+        if self.app.browse:
+            c_back = "#f39c12"
+            tk.Button(self.frame, text="Закрыть просмотр", bg=c_back, activebackground=darken(c_back),
+                      fg="white", font=("Arial", 10, "bold"), relief="flat",
+                      command=self.app.close_browse, cursor="hand2").pack(side=tk.RIGHT, pady=10, ipady=2)
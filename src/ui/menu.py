@@ -8,7 +8,7 @@ def create_main_menu(app):
 
     Аргументы:
         app: Ссылка на главный класс приложения (PasswordManager), 
-             чтобы вызывать его методы (app.add_password, app.root.quit и т.д.).
+             чтобы вызывать его методы (app.add_password, app.quit_app и т.д.).
     """
     menubar = Menu(app.root)
     app.root.config(menu=menubar)
@@ -26,12 +26,16 @@ def create_main_menu(app):
                           command=app.import_csv, image=ic.get("import", "small"), compound="left")
     file_menu.add_command(label="Экспортировать", accelerator="Ctrl+E",
                           command=app.export_csv, image=ic.get("export", "small"), compound="left")
+    file_menu.add_command(label="Восстановить из копии...",
+                          command=app.open_restore, image=ic.get("import", "small"), compound="left")
+    file_menu.add_command(label="Открыть копию для просмотра...",
+                          command=app.open_backup_file, image=ic.get("view", "small"), compound="left")
     file_menu.add_separator()  # Разделитель
     file_menu.add_command(label="Настройки", accelerator="Ctrl+,",
                           command=app.open_settings, image=ic.get("settings", "small"), compound="left")
     file_menu.add_separator()
     file_menu.add_command(label="Выход", accelerator="Ctrl+Q",
-                          command=app.root.quit, image=ic.get("exit", "small"), compound="left")
+                          command=app.quit_app, image=ic.get("exit", "small"), compound="left")
 
     # --- Меню "Вид" (View) ---
     view_menu = Menu(menubar, tearoff=0)
@@ -3,6 +3,25 @@ from tkinter import ttk, Menu, messagebox
 from datetime import datetime
 from src.windows.details import DetailModal
 from src.windows.add_edit import AddEditPasswordWindow
+from src.core.repository import LIST_COLUMNS, row_before, sort_columns
+from src.core.column_store import RowView
+from src.core.search import SearchWorker
+
+# Сколько строк держать в Treeview сверх видимых (запас снизу окна)
+OVERSCAN_ROWS = 10
+# На сколько строк прокручивает один шаг колеса мыши
+WHEEL_ROWS = 3
+# Высота строки по умолчанию, если стиль ее не задал
+DEFAULT_ROW_HEIGHT = 25
+# Позиция id записи в строке запроса (LIST_COLUMNS)
+ID_COL = LIST_COLUMNS.index("id")
+# При изменении большего числа записей разом (импорт) проще перечитать список
+CHANGE_RELOAD_LIMIT = 200
+# Живой поиск: пауза после последнего нажатия перед запросом и опрос результата (мс)
+SEARCH_DEBOUNCE_MS = 150
+SEARCH_POLL_MS = 15
+# Сколько ждать остановки потока поиска (запрос к базе при этом прерывается)
+SEARCH_JOIN_TIMEOUT = 2
 
 
 class UITable:
@@ -13,12 +32,49 @@ class UITable:
     - Загрузку данных из БД с фильтрацией
     - Обработку кликов (выделение, копирование)
     - Контекстное меню (ПКМ)
+
+    Таблица виртуальная: результат запроса хранится списком строк (self.rows),
+    а в Treeview вставлены только строки видимого окна (плюс OVERSCAN_ROWS).
+    Прокрутка сдвигает окно по списку (self.top) и заменяет лишь ушедшие
+    и появившиеся строки, поэтому число элементов Tk не зависит от размера базы.
+    iid элемента = id записи; галочки и выделение хранятся по id, а не по элементам.
+
+    Модель списка - строки self.rows и их id (self.ids). Таблица подписана на
+    изменения репозитория (VaultRepository.subscribe): сохранение, избранное
+    или удаление одной записи меняют одну строку модели (на месте или с
+    переносом в нужную позицию сортировки), положение прокрутки сохраняется.
+    Если список пришел из хранилища колонок (RowView), он просто перечитывается
+    из него - это миллисекунды, - а в Treeview обновляются только измененные строки.
+
+    Живой поиск (request_search) идет в фоне через SearchWorker: нажатия
+    сливаются в один запрос по паузе SEARCH_DEBOUNCE_MS, устаревшие запросы
+    прерываются, уточнения прошлого результата отбираются в памяти.
     """
 
     def __init__(self, app):
         self.app = app
         # Множество ID выбранных записей (для множественного выбора)
         self.checked_items = set()
+        # Строки результата запроса (колонки LIST_COLUMNS) и индекс первой видимой
+        self.rows = []
+        self.top = 0
+        # id строк в том же порядке
+        self.ids = []
+        # Фильтры, с которыми загружен список: (тип, поиск, сортировка)
+        self.query = (None, "", None)
+        # Репозиторий, на изменения которого подписана таблица
+        self._repo = None
+        # Живой поиск: таймер паузы, фоновый поток, номер последнего запроса
+        # и фильтры, для которых ждем результат (None - не ждем)
+        self._debounce = None
+        self._search_worker = None
+        self._search_seq = 0
+        self._pending = None
+        # id записи, выделенной курсором (может быть за пределами окна)
+        self.selected = None
+        # True, пока _render перестраивает окно (события выделения игнорируются)
+        self._rendering = False
+        self._now = datetime.now()
 
         # Фрейм-контейнер для таблицы и скроллбара
         self.frame = tk.Frame(app.root)
@@ -28,6 +84,9 @@ class UITable:
         self._build_scrollbar()     # Создание скроллбара
         self._build_context_menu()  # Создание меню ПКМ
         self._bind_events()         # Привязка событий мыши
+        # Таблица пересоздается при reload_ui - старая отписывается от репозитория
+        # и останавливает поток поиска
+        self.frame.bind("<Destroy>", self._on_destroy)
 
     def _build_table(self):
         """Настройка колонок Treeview."""
@@ -73,11 +132,14 @@ class UITable:
         self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
     def _build_scrollbar(self):
-        """Добавляет вертикальную полосу прокрутки."""
-        scrollbar = ttk.Scrollbar(
-            self.frame, orient="vertical", command=self.tree.yview)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.tree.configure(yscrollcommand=scrollbar.set)
+        """
+        Добавляет вертикальную полосу прокрутки.
+        Полоса привязана не к Treeview, а к списку строк: положение ползунка -
+        доля self.top от общего числа строк.
+        """
+        self.scrollbar = ttk.Scrollbar(
+            self.frame, orient="vertical", command=self._on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
     def _build_context_menu(self):
         """Создает контекстное меню (появляется при клике ПКМ)."""
@@ -121,16 +183,39 @@ class UITable:
         if self.app.config['show_passwords_table']:
             self.tree.bind("<Motion>", self._on_hover)
 
+        # Прокрутка окна строк: колесо (Windows/macOS и X11), клавиши, размер
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll_rows(-WHEEL_ROWS))
+        self.tree.bind("<Button-5>", lambda e: self.scroll_rows(WHEEL_ROWS))
+        self.tree.bind("<Up>", lambda e: self._move_selection(-1))
+        self.tree.bind("<Down>", lambda e: self._move_selection(1))
+        self.tree.bind("<Prior>", lambda e: self._move_selection(-self._visible_count()))
+        self.tree.bind("<Next>", lambda e: self._move_selection(self._visible_count()))
+        self.tree.bind("<Home>", lambda e: self._move_selection(-len(self.rows)))
+        self.tree.bind("<End>", lambda e: self._move_selection(len(self.rows)))
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        self.tree.bind("<Configure>", lambda e: self._render())
+
     # --- ПУБЛИЧНЫЕ МЕТОДЫ (вызываются из app.py) ---
 
-    def reload_data(self):
+    def reload_data(self, keep_position=False):
         """
         Основной метод загрузки данных.
         1. Считывает фильтры из app.search_entry и app.filter_combobox.
-        2. Формирует SQL запрос.
+        2. Запрашивает строки у репозитория (app.repo).
         3. Очищает таблицу и заполняет новыми данными.
+        keep_position=True - не сбрасывать прокрутку в начало списка.
         """
-        # Считывание фильтров
+        query = self._read_query()
+        # Синхронная загрузка отменяет ожидаемый результат фонового поиска
+        self._search_seq += 1
+        self._pending = None
+        self._watch_repo(self.app.repo)
+        # Запрос строит репозиторий (фиксированный набор параметризованных SQL)
+        self._show_rows(query, self.app.repo.list_rows(*query), keep_position)
+
+    def _read_query(self):
+        """Текущие фильтры из панели: (тип, строка поиска, сортировка)."""
         search = self.app.search_entry.get().lower()
         if search == "поиск...":
             search = ""
@@ -138,81 +223,439 @@ class UITable:
         ptype_display = self.app.filter_combobox.get()
         ptype = self.app.type_map_filter.get(ptype_display, "Все")
         sort_val = self.app.sort_combobox.get()
+        return (ptype, search, sort_val)
+
+    def _show_rows(self, query, rows, keep_position=False):
+        """Показывает результат запроса с фильтрами query."""
+        self.query = query
+        self._set_rows(rows)
+        self._now = datetime.now()
+        if not keep_position:
+            self.top = 0
+        # Элементы окна пересоздаются: значения строк могли измениться
+        self.tree.delete(*self.tree.get_children())
+        # Выделение переживает обновление, только если запись осталась в списке
+        if self._index_of(self.selected) is None:
+            self.selected = None
+
+        self._render()
+        self.update_status_bar()
+
+    def _set_rows(self, rows):
+        if isinstance(rows, RowView):
+            # Строки из хранилища колонок не копируются: окно берет их по индексу
+            self.rows = rows
+            self.ids = rows.ids
+        else:
+            self.rows = list(rows)
+            self.ids = [row[ID_COL] for row in self.rows]
+
+    # --- ЖИВОЙ ПОИСК ---
+
+    def request_search(self):
+        """
+        Поиск по мере ввода: каждое нажатие откладывает запрос на SEARCH_DEBOUNCE_MS,
+        поэтому быстрый набор дает один запрос по последнему тексту.
+        """
+        if self._debounce is not None:
+            self.app.root.after_cancel(self._debounce)
+        self._debounce = self.app.root.after(SEARCH_DEBOUNCE_MS, self._run_search)
+
+    def _run_search(self):
+        self._debounce = None
+        query = self._read_query()
+        # Стрелки, Shift и т.п. текст не меняют - запрос не нужен
+        if query == (self._pending or self.query):
+            return
+        ptype, search, _ = query
+        if not search:
+            self.reload_data()
+            return
+        worker = self._get_search_worker()
+        if worker is None:
+            self.reload_data()
+            return
+        self._search_seq += 1
+        waiting = self._pending is not None
+        self._pending = query
+        worker.submit(self._search_seq, ptype, search)
+        if not waiting:
+            self.app.root.after(SEARCH_POLL_MS, self._poll_search)
+
+    def _poll_search(self):
+        """Забирает результат фонового поиска (устаревшие отбрасываются по номеру)."""
+        worker = self._search_worker
+        if self._pending is None or worker is None:
+            return
+        while not worker.events.empty():
+            kind, seq, data = worker.events.get_nowait()
+            if seq != self._search_seq:
+                continue
+            if kind == "error":
+                # Поиск в фоне не удался - выполняем его обычным запросом
+                self.reload_data()
+                return
+            query, self._pending = self._pending, None
+            self._show_rows(query, data)
+            return
+        self.app.root.after(SEARCH_POLL_MS, self._poll_search)
+
+    def _get_search_worker(self):
+        """Поток поиска для файла текущего репозитория (создается при первом поиске)."""
+        try:
+            path = self.app.repo.conn.execute("PRAGMA database_list").fetchone()[2]
+        except Exception:
+            return None
+        if not path:
+            return None  # База в памяти - второго соединения к ней не открыть
+        immutable = bool(self.app.browse)
+        worker = self._search_worker
+        if worker is None or (worker.db_path, worker.immutable) != (path, immutable):
+            self.stop_search()
+            worker = self._search_worker = SearchWorker(path, immutable)
+            worker.start()
+        return worker
+
+    def stop_search(self):
+        """
+        Останавливает поток поиска и ждет, пока он закроет соединение
+        (перед удалением или подменой файла базы; при следующем поиске откроется заново).
+        """
+        if self._search_worker is not None:
+            self._search_worker.stop()
+            self._search_worker.join(SEARCH_JOIN_TIMEOUT)
+            self._search_worker = None
+        self._pending = None
 
-        # Формирование сортировки SQL
-        order_by = "created_at DESC"
-        if sort_val == "Дата изменения (новые)":
-            order_by = "updated_at DESC"
-        elif sort_val == "Дата изменения (старые)":
-            order_by = "updated_at ASC"
-        elif sort_val == "Название (А→Я) ↑":
-            order_by = "name ASC"
-        elif sort_val == "Название (Я→А) ↓":
-            order_by = "name DESC"
-        elif sort_val == "Логин (А→Я) ↑":
-            order_by = "username ASC"
-        elif sort_val == "Логин (Я→А) ↓":
-            order_by = "username DESC"
-        elif sort_val == "Последнее использование (недавние)":
-            order_by = "last_used_at DESC"
-        elif sort_val == "Последнее использование (давние)":
-            order_by = "last_used_at ASC"
-        elif sort_val == "Избранные в начале":
-            order_by = "is_favorite DESC, name ASC"
-        elif sort_val == "Избранные в конце":
-            order_by = "is_favorite ASC, name ASC"
-
-        # Очистка текущих данных
+    def clear_rows(self):
+        """
+        Забывает строки списка и элементы таблицы (блокировка: список записей
+        не должен оставаться в памяти). Останавливает и поток поиска - он
+        держит прошлый результат. Заново список загружает reload_data.
+        """
+        if self._debounce is not None:
+            self.app.root.after_cancel(self._debounce)
+            self._debounce = None
+        self._search_seq += 1
+        self.stop_search()
+        self._set_rows([])
+        self.top = 0
+        self.selected = None
         self.tree.delete(*self.tree.get_children())
 
-        # Сборка SQL запроса
-        query = "SELECT type, name, username, email, category, created_at, id, is_favorite, updated_at FROM passwords WHERE 1=1"
-        params = []
-        if ptype != "Все":
-            query += " AND type=?"
-            params.append(ptype)
-        if search:
-            query += " AND (lower(name) LIKE ? OR lower(username) LIKE ?)"
-            params.extend([f"%{search}%", f"%{search}%"])
-        query += f" ORDER BY {order_by}"
-
-        self.app.cursor.execute(query, params)
-        now = datetime.now()
-
-        # Заполнение таблицы строками
-        for row in self.app.cursor.fetchall():
-            ptype, name, user, email, cat, date, pid, is_fav, updated_at = row
-
-            display_ptype = self.app.type_map_display.get(ptype, ptype)
-            login = user if user else (email if email else "-")
-            d_date = date.split()[0] if date else "-"
-            display_name = ("★ " + name) if is_fav else name
-
-            # Теги для строки (ID записи и статус просроченности)
-            tags = [str(pid)]
-            if self.app.config['notify_expired'] and updated_at:
-                try:
-                    dt = datetime.strptime(updated_at.split('.')[
-                                           0], "%Y-%m-%d %H:%M:%S")
-                    if (now - dt).days > 365:
-                        tags.append("expired")
-                except:
-                    pass
+    def _on_destroy(self, event):
+        if event.widget is self.frame:
+            self._watch_repo(None)
+            self.stop_search()
 
-            row_vals = [("☑" if pid in self.checked_items else "☐"),
-                        display_ptype, display_name, login, cat or "-"]
+    # --- ТОЧЕЧНЫЕ ОБНОВЛЕНИЯ (по изменениям репозитория) ---
 
-            if self.app.config['show_passwords_table']:
-                row_vals.append("••••••••")  # Пароль скрыт точками
-            row_vals.append(d_date)
+    def _watch_repo(self, repo):
+        """Переподписывает таблицу на изменения repo (None - только отписаться)."""
+        if repo is self._repo:
+            return
+        if self._repo is not None:
+            self._repo.unsubscribe(self._on_repo_change)
+        self._repo = repo
+        if repo is not None:
+            repo.subscribe(self._on_repo_change)
+
+    def _on_repo_change(self, kind, ids):
+        """Применяет к списку изменения записей ids (см. VaultRepository.subscribe)."""
+        if self._search_worker is not None:
+            self._search_worker.invalidate()
+        if isinstance(self.rows, RowView):
+            self._reread_rows(ids)
+            return
+        if kind == "deleted":
+            self.remove_rows(ids)
+            return
+        ptype, search, sort_val = self.query
+        # Положение в результатах поиска (релевантность) и в сортировке по
+        # последнему использованию без запроса не вычислить
+        columns = None if search else sort_columns(sort_val)
+        if columns is None or len(ids) > CHANGE_RELOAD_LIMIT:
+            self.reload_data(keep_position=True)
+            return
 
-            self.tree.insert("", tk.END, values=row_vals, tags=tuple(tags))
+        rows = {row[ID_COL]: row for row in self.app.repo.get_list_rows(ids, ptype)}
+        self._now = datetime.now()
+        for pid in ids:
+            self._apply_row(pid, rows.get(pid), columns)
+        self._render()
+        self.update_status_bar()
 
+    def _reread_rows(self, ids):
+        """
+        Перечитывает список из хранилища колонок (репозиторий уже применил к нему
+        изменения), сохраняя первую видимую строку. Элементы окна, кроме строк
+        записей ids, остаются на месте; _render лишь досоздает недостающие.
+        """
+        top_id = self.ids[self.top] if self.top < len(self.ids) else None
+        self._set_rows(self.app.repo.list_rows(*self.query))
+        top = self._index_of(top_id)
+        if top is not None:
+            self.top = top
+        self._now = datetime.now()
+        if len(ids) > CHANGE_RELOAD_LIMIT:
+            self.tree.delete(*self.tree.get_children())
+        else:
+            for pid in ids:
+                if self.tree.exists(str(pid)):
+                    self.tree.delete(str(pid))
+        if self._index_of(self.selected) is None:
+            self.selected = None
+        # Галочки записей, которые ушли из списка (удалены или не подходят под фильтр)
+        self.checked_items.difference_update(
+            [pid for pid in ids if self._index_of(pid) is None])
+        self._render()
+        self.update_status_bar()
+
+    def _apply_row(self, pid, row, columns):
+        """
+        Приводит строку записи pid к новой версии row (None - запись больше
+        не подходит под фильтр): обновление на месте, перенос или вставка.
+        """
+        index = self._index_of(pid)
+        if index is not None:
+            if row is not None and self._fits_at(index, row, columns):
+                # Порядок не изменился - меняются только значения одной строки
+                self.rows[index] = row
+                if self.tree.exists(str(pid)):
+                    values, tags = self._row_values(row)
+                    self.tree.item(str(pid), values=values, tags=tags)
+                return
+            self._remove_at(index)
+        if row is None:
+            self.checked_items.discard(pid)
+            if self.selected == pid:
+                self.selected = None
+            return
+        self._insert_sorted(row, columns)
+
+    def _fits_at(self, index, row, columns):
+        """Остается ли строка row на позиции index при сортировке columns."""
+        if index > 0 and row_before(row, self.rows[index - 1], columns):
+            return False
+        if index + 1 < len(self.rows) and row_before(self.rows[index + 1], row, columns):
+            return False
+        return True
+
+    def _remove_at(self, index):
+        pid = self.ids.pop(index)
+        del self.rows[index]
+        # Строки выше окна сдвигают его - видимые строки остаются на месте
+        if index < self.top:
+            self.top -= 1
+        if self.tree.exists(str(pid)):
+            self.tree.delete(str(pid))
+
+    def _insert_sorted(self, row, columns):
+        """Вставляет строку в позицию по сортировке (двоичный поиск, после равных)."""
+        lo, hi = 0, len(self.rows)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if row_before(row, self.rows[mid], columns):
+                hi = mid
+            else:
+                lo = mid + 1
+        self.rows.insert(lo, row)
+        self.ids.insert(lo, row[ID_COL])
+        if lo < self.top:
+            self.top += 1
+
+    def _row_values(self, row):
+        """Значения колонок и теги строки Treeview для строки запроса."""
+        ptype, name, user, email, cat, date, pid, is_fav, updated_at = row
+
+        display_ptype = self.app.type_map_display.get(ptype, ptype)
+        login = user if user else (email if email else "-")
+        d_date = date.split()[0] if date else "-"
+        display_name = ("★ " + name) if is_fav else name
+
+        # Теги для строки (ID записи и статус просроченности)
+        tags = [str(pid)]
+        if self.app.config['notify_expired'] and updated_at:
+            try:
+                dt = datetime.strptime(updated_at.split('.')[
+                                       0], "%Y-%m-%d %H:%M:%S")
+                if (self._now - dt).days > 365:
+                    tags.append("expired")
+            except:
+                pass
+
+        row_vals = [("☑" if pid in self.checked_items else "☐"),
+                    display_ptype, display_name, login, cat or "-"]
+
+        if self.app.config['show_passwords_table']:
+            row_vals.append("••••••••")  # Пароль скрыт точками
+        row_vals.append(d_date)
+        return row_vals, tuple(tags)
+
+    # --- ВИРТУАЛЬНОЕ ОКНО СТРОК ---
+
+    def _row_height(self):
+        try:
+            return int(ttk.Style().lookup("Treeview", "rowheight")) or DEFAULT_ROW_HEIGHT
+        except (ValueError, tk.TclError):
+            return DEFAULT_ROW_HEIGHT
+
+    def _visible_count(self):
+        """Сколько строк помещается в видимой части таблицы (без заголовка)."""
+        height = self.tree.winfo_height()
+        if height <= 1:
+            # Окно еще не отрисовано - берем высоту из настройки Treeview
+            return int(self.tree.cget("height"))
+        # Заголовок ~ одна строка; bbox первой строки дает точное смещение
+        children = self.tree.get_children()
+        bbox = self.tree.bbox(children[0]) if children else None
+        head = bbox[1] if bbox else self._row_height()
+        return max(1, (height - head) // self._row_height())
+
+    def _max_top(self):
+        return max(0, len(self.rows) - self._visible_count())
+
+    def _render(self):
+        """
+        Приводит элементы Treeview к окну self.rows[top : top + видимые + запас].
+        Строки, оставшиеся в окне, только переставляются, остальные
+        удаляются/вставляются - при прокрутке на шаг колеса это несколько вызовов Tk.
+        """
+        self._restore_hidden_passwords()
+        self.top = max(0, min(self.top, self._max_top()))
+        window = self.rows[self.top:self.top + self._visible_count() + OVERSCAN_ROWS]
+        wanted = [str(row[ID_COL]) for row in window]
+
+        self._rendering = True
+        try:
+            current = self.tree.get_children()
+            if list(current) != wanted:
+                keep = set(wanted)
+                stale = [i for i in current if i not in keep]
+                if stale:
+                    self.tree.delete(*stale)
+                kept = [i for i in current if i in keep]
+                present = set(kept)
+                # При прокрутке оставшиеся строки уже стоят в нужном порядке -
+                # достаточно вставить новые; иначе (смена порядка) переставляем
+                in_order = kept == [i for i in wanted if i in present]
+                for index, (iid, row) in enumerate(zip(wanted, window)):
+                    if iid in present:
+                        if not in_order:
+                            self.tree.move(iid, "", index)
+                    else:
+                        values, tags = self._row_values(row)
+                        self.tree.insert("", index, iid=iid, values=values, tags=tags)
+
+            # Выделение восстанавливается по id, если запись в окне
+            sel = str(self.selected) if self.selected is not None else None
+            if sel in wanted:
+                if self.tree.selection() != (sel,):
+                    self.tree.selection_set(sel)
+            elif self.tree.selection():
+                self.tree.selection_remove(self.tree.selection())
+            # Собственная прокрутка Treeview не используется - окно всегда сверху
+            self.tree.yview_moveto(0)
+        finally:
+            self._rendering = False
+
+        total = len(self.rows)
+        if total:
+            shown = min(total, self.top + self._visible_count())
+            self.scrollbar.set(self.top / total, shown / total)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def scroll_rows(self, delta):
+        """Сдвигает окно на delta строк (отрицательное - вверх)."""
+        top = max(0, min(self.top + delta, self._max_top()))
+        if top != self.top:
+            self.top = top
+            self._render()
+        return "break"
+
+    def _on_mousewheel(self, event):
+        # Windows: delta кратно 120, macOS: небольшие значения
+        step = -1 if event.delta > 0 else 1
+        return self.scroll_rows(step * WHEEL_ROWS)
+
+    def _on_scrollbar(self, action, value, unit=None):
+        """Команда полосы прокрутки: moveto доля | scroll n units/pages."""
+        if action == "moveto":
+            self.top = int(float(value) * len(self.rows))
+            self._render()
+        elif action == "scroll":
+            step = self._visible_count() if unit == "pages" else 1
+            self.scroll_rows(int(value) * step)
+
+    def _index_of(self, pid):
+        """Позиция записи в self.rows или None."""
+        if pid is None:
+            return None
+        try:
+            return self.ids.index(pid)
+        except ValueError:
+            return None
+
+    def see(self, index):
+        """Прокручивает окно так, чтобы строка index была видна."""
+        visible = self._visible_count()
+        if index < self.top:
+            self.top = index
+        elif index >= self.top + visible:
+            self.top = index - visible + 1
+        self._render()
+
+    def _move_selection(self, delta):
+        """Перемещает выделение клавишами на delta строк с прокруткой окна."""
+        if not self.rows:
+            return "break"
+        index = self._index_of(self.selected) if self.selected is not None else None
+        if index is None:
+            index = self.top - 1 if delta > 0 else self.top
+        index = max(0, min(index + delta, len(self.rows) - 1))
+        self.selected = self.ids[index]
+        self.see(index)
+        return "break"
+
+    def _on_select(self, event):
+        """Запоминает id выделенной строки (выделение в Tk живет только в окне)."""
+        if self._rendering:
+            return
+        sel = self.tree.selection()
+        if sel:
+            self.selected = int(sel[0])
+        elif self.selected is not None and self.tree.exists(str(self.selected)):
+            # Снятие выделения с видимой строки. Если же строка ушла из окна
+            # при прокрутке (событие приходит из очереди позже), id сохраняется
+            self.selected = None
+
+    def selected_id(self):
+        """id записи, выделенной курсором, или None."""
+        return self.selected
+
+    def remove_rows(self, ids):
+        """Убирает из таблицы строки удаленных записей (без перезагрузки всего списка)."""
+        removed = set(ids).intersection(self.ids)
+        if len(removed) > CHANGE_RELOAD_LIMIT:
+            # Большая выборка - один проход по списку вместо поиска каждой строки
+            above = sum(1 for pid in self.ids[:self.top] if pid in removed)
+            self._set_rows([row for row in self.rows if row[ID_COL] not in removed])
+            self.top -= above
+        else:
+            for pid in removed:
+                self._remove_at(self.ids.index(pid))
+        if self.selected in removed:
+            self.selected = None
+        self.checked_items.difference_update(ids)
+        self._render()
+        self.tree.heading("check", text="☐")
         self.update_status_bar()
 
     def clear_selection(self):
         """Полностью снимает выделение со всех строк."""
         self.tree.selection_remove(self.tree.selection())
+        self.selected = None
         self.checked_items.clear()
         # Визуально снимаем галочки
         for i in self.tree.get_children():
@@ -225,8 +668,8 @@ class UITable:
 
     def toggle_all_checks(self):
         """Переключатель 'Выбрать все / Снять все' в заголовке таблицы."""
-        all_items = self.tree.get_children()
-        all_ids = [int(self.tree.item(i, "tags")[0]) for i in all_items]
+        # Все записи результата, а не только строки видимого окна
+        all_ids = self.ids
 
         # Если уже все выбрано -> Снимаем выбор
         if len(self.checked_items) == len(all_ids) and len(all_ids) > 0:
@@ -237,7 +680,7 @@ class UITable:
             sym = "☑"
 
         self.tree.heading("check", text=sym)
-        for i in all_items:
+        for i in self.tree.get_children():
             vals = list(self.tree.item(i, "values"))
             vals[0] = sym
             self.tree.item(i, values=vals)
@@ -245,19 +688,17 @@ class UITable:
 
     def update_status_bar(self):
         """Обновляет текст внизу (кол-во записей, последнее изменение) и активирует кнопки."""
-        total = len(self.tree.get_children())
+        total = len(self.rows)
         selected = len(self.checked_items)
 
         # Получаем дату последнего изменения БД
-        self.app.cursor.execute(
-            "SELECT COALESCE(updated_at, created_at) as last_mod FROM passwords ORDER BY last_mod DESC LIMIT 1")
-        res = self.app.cursor.fetchone()
+        last_mod = self.app.repo.last_modified()
 
         last_change = "нет данных"
-        if res and res[0]:
+        if last_mod:
             try:
                 dt = datetime.strptime(
-                    res[0].split('.')[0], "%Y-%m-%d %H:%M:%S")
+                    last_mod.split('.')[0], "%Y-%m-%d %H:%M:%S")
                 diff = datetime.now() - dt
                 mins = int(diff.total_seconds() / 60)
                 if mins < 1:
@@ -271,13 +712,17 @@ class UITable:
             except:
                 pass
 
-        self.app.status_bar.config(
-            text=f"Статус: {total} записей | Выбрано: {selected} | Последнее изменение: {last_change}")
+        text = f"Статус: {total} записей | Выбрано: {selected} | Последнее изменение: {last_change}"
+        # Бэкапы, не прошедшие фоновую проверку (см. app.start_verifier)
+        failures = getattr(self.app, 'backup_failures', {})
+        if failures:
+            text += f" | ⚠ Бэкапов с ошибками: {len(failures)} (последний: {max(failures)})"
+        self.app.status_bar.config(text=text)
 
         # Активация/деактивация кнопок в Toolbar (через ссылку на app)
         if hasattr(self.app, 'ui_toolbar'):
             # Редактировать можно только 1 запись
-            state = "normal" if selected == 1 else "disabled"
+            state = "normal" if selected == 1 and not self.app.browse else "disabled"
             self.app.btn_edit.config(state=state)
 
             # Удалять можно сколько угодно
@@ -318,11 +763,9 @@ class UITable:
             pass_idx = self.tree["columns"].index("password_col") + 1
             if col_idx == pass_idx and self.app.verify_master_password():
                 pid = int(self.tree.item(item_id)['tags'][0])
-                self.app.cursor.execute(
-                    "SELECT password FROM passwords WHERE id=?", (pid,))
-                res = self.app.cursor.fetchone()
-                if res and res[0]:
-                    self.app._copy_to_clip(self.app.decrypt_password(res[0]))
+                secret = self.app.reveal_secret(pid)
+                if secret:
+                    self.app._copy_to_clip(secret)
                     self.app.show_tooltip(
                         event.x_root, event.y_root, "Скопировано!")
                     self.app.update_last_used(pid)
@@ -346,10 +789,9 @@ class UITable:
         """Двойной клик открывает окно деталей."""
         if event and self.tree.identify_region(event.x, event.y) == "separator":
             return
-        sel = self.tree.selection()
-        if not sel:
+        pid = self.selected_id()
+        if pid is None:
             return
-        pid = int(self.tree.item(sel[0])['tags'][0])
         DetailModal(self.app, pid)
 
     def show_context_menu(self, event):
@@ -360,7 +802,15 @@ class UITable:
             self.tree.selection_set(item_id)
             self.checked_items.clear()
             pid = int(self.tree.item(item_id)['tags'][0])
+            self.selected = pid
             self.checked_items.add(pid)
+            # Галочки видимых строк - по новому набору выбранных
+            for i in self.tree.get_children():
+                vals = list(self.tree.item(i, "values"))
+                sym = "☑" if int(i) == pid else "☐"
+                if vals[0] != sym:
+                    vals[0] = sym
+                    self.tree.item(i, values=vals)
             self.update_status_bar()
             for i in range(10):
                 try:
@@ -397,12 +847,9 @@ class UITable:
             # Если это новый элемент (не тот, на котором мышь была раньше)
             if getattr(self, "last_hovered_pass", None) != (item, pid):
                 self._restore_hidden_passwords()  # Скрываем предыдущий
-                self.app.cursor.execute(
-                    "SELECT password FROM passwords WHERE id=?", (pid,))
-                res = self.app.cursor.fetchone()
-                if res and res[0]:
+                dec = self.app.reveal_secret(pid)
+                if dec:
                     try:
-                        dec = self.app.decrypt_password(res[0])
                         # Показываем пароль
                         self.tree.set(item, "password_col", dec)
                         self.last_hovered_pass = (item, pid)
@@ -445,7 +892,8 @@ class UITable:
         from tkinter import font
         font_obj = font.Font(font=('Arial', 12))
         max_width = font_obj.measure(col.title()) + 20
-        # Проходим по всем строкам и ищем самую длинную
+        # Ищем самую длинную среди строк окна (в Treeview только они;
+        # измерять шрифтом весь результат на больших базах слишком долго)
         for item in self.tree.get_children():
             val = self.tree.set(item, col)
             w = font_obj.measure(val) + 20
@@ -460,37 +908,27 @@ class UITable:
     def _ctx_copy_pass(self):
         if not self.app.verify_master_password():
             return
-        sel = self.tree.selection()
-        if not sel:
+        pid = self.selected_id()
+        if pid is None:
             return
-        pid = int(self.tree.item(sel[0])['tags'][0])
-        self.app.cursor.execute(
-            "SELECT password FROM passwords WHERE id=?", (pid,))
-        res = self.app.cursor.fetchone()
-        if res and res[0]:
-            self.app._copy_to_clip(self.app.decrypt_password(res[0]))
+        secret = self.app.reveal_secret(pid)
+        if secret:
+            self.app._copy_to_clip(secret)
             self.app.update_last_used(pid)
 
     def _ctx_copy_login(self):
-        sel = self.tree.selection()
-        if not sel:
+        pid = self.selected_id()
+        if pid is None:
             return
-        pid = int(self.tree.item(sel[0])['tags'][0])
-        self.app.cursor.execute(
-            "SELECT username, email FROM passwords WHERE id=?", (pid,))
-        res = self.app.cursor.fetchone()
-        if res:
-            login = res[0] if res[0] else (res[1] if res[1] else "")
+        login = self.app.repo.get_login(pid)
+        if login is not None:
             self.app._copy_to_clip(login)
             self.app.update_last_used(pid)
 
     def _ctx_toggle_fav(self):
         """Добавляет/убирает из избранного через контекстное меню."""
-        sel = self.tree.selection()
-        if not sel:
+        pid = self.selected_id()
+        if pid is None or self.app.read_only_blocked():
             return
-        pid = int(self.tree.item(sel[0])['tags'][0])
-        self.app.cursor.execute(
-            "UPDATE passwords SET is_favorite = NOT is_favorite WHERE id=?", (pid,))
-        self.app.conn.commit()
-        self.reload_data()
+        # Строку обновит подписка на изменения репозитория (_on_repo_change)
+        self.app.repo.toggle_favorite(pid)
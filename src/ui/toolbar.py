@@ -39,6 +39,11 @@ class UIToolbar:
                                       padx=15, pady=5, command=self.app.edit_password, cursor="hand2")
         self.app.btn_edit.pack(side=tk.LEFT, padx=5, pady=5)
 
+        # В режиме просмотра копии данные менять нельзя
+        if self.app.browse:
+            for btn in (self.app.btn_add, self.app.btn_del, self.app.btn_edit):
+                btn.config(state="disabled")
+
         # --- Мини-генератор паролей (справа) ---
         self._build_mini_gen(ic)
 
@@ -4,6 +4,8 @@ import re
 from datetime import datetime
 from src.windows.generator import PasswordGenerator
 from src.utils import darken
+from src.database import SECRET_FIELDS
+from src.core.record_layout import LAYOUT_MAP
 
 
 class AddEditPasswordWindow:
@@ -52,12 +54,7 @@ class AddEditPasswordWindow:
 
         # Если редактируем - загружаем данные из БД
         if mode == "edit" and password_id:
-            self.parent.cursor.execute(
-                "SELECT * FROM passwords WHERE id=?", (password_id,))
-            cols = [d[0] for d in self.parent.cursor.description]
-            row = self.parent.cursor.fetchone()
-            if row:
-                self.record_data = dict(zip(cols, row))
+            self.record_data = self.parent.repo.get_record(password_id)
 
         self.create_layout()
         self.center_window()
@@ -231,21 +228,7 @@ class AddEditPasswordWindow:
         # Получаем реальный код типа (WEB, BANK...)
         ptype = self.type_map.get(self.type_var_display.get(), "WEB")
 
-        # --- КАРТА ПОЛЕЙ (LAYOUT MAP) ---
-        # Описывает структуру формы для каждого типа записи.
-        # Формат: [ [ (поле, метка, обязательность, тип_валидации), ... ], ... ]
-        # обязательность: 2=critical (красный), 1=important (оранжевый), 0=normal
-        layout_map = {
-            "WEB": [[("name", "★ Название сайта", 2, "entry_name_50")], [("username", "★ Логин", 2, "entry_login_20"), ("password", "★ Пароль", 2, "password_row")], [("url", "◆ Веб-адрес", 1, "entry"), ("email", "◆ Email аккаунта", 1, "entry_email_20")], [("phone", "○ Телефон", 0, "entry_phone"), ("category", "○ Категория", 0, "entry_category_10")], [("security_question", "○ Вопрос безопасности", 0, "entry_sec_30"), ("security_answer", "○ Ответ", 0, "entry_sec_30")], [("recovery_email", "○ Резервный Email", 0, "entry_email_20"), ("recovery_phone", "○ Рез. Телефон", 0, "entry_phone")], [("notes", "○ Примечания", 0, "text_notes_60")]],
-            "OFFLINE": [[("name", "★ Название кода", 2, "entry_name_strict_20")], [("password", "★ Код / Текст", 2, "text_password")], [("tags", "○ Теги", 0, "entry_category_10"), ("category", "○ Категория", 0, "entry_category_10")], [("notes", "○ Примечания", 0, "text_notes_60")]],
-            "SOCIAL": [[("name", "★ Соц. сеть", 2, "entry_name_50")], [("username", "★ Никнейм", 2, "entry_login_20"), ("password", "★ Пароль", 2, "password_row")], [("email", "◆ Email аккаунта", 1, "entry_email_20"), ("url", "◆ Ссылка на профиль", 1, "entry")], [("phone", "○ Телефон", 0, "entry_phone"), ("full_name", "○ ФИО", 0, "entry")], [("recovery_email", "○ Email восст.", 0, "entry_email_20"), ("recovery_phone", "○ Тел. восст.", 0, "entry_phone")], [("notes", "○ Примечания", 0, "text_notes_60")]],
-            "EMAIL": [[("name", "★ Название почты", 2, "entry_name_50")], [("username", "★ Email адрес", 2, "entry_email_20"), ("password", "★ Пароль", 2, "password_row")], [("phone", "◆ Телефон", 1, "entry_phone"), ("full_name", "◆ ФИО владельца", 1, "entry")], [("date_of_birth", "○ Дата рождения", 0, "entry_date_full"), ("recovery_email", "○ Рез. Email", 0, "entry_email_20")], [("security_question", "○ Вопрос безопасности", 0, "entry_sec_30"), ("security_answer", "○ Ответ", 0, "entry_sec_30")], [("notes", "○ Примечания", 0, "text_notes_60")]],
-            "BANK": [[("name", "★ Название счета", 2, "entry_name_strict_20")], [("username", "★ Логин/Договор", 2, "entry_login_20"), ("password", "★ Пароль", 2, "password_row")], [("account_number", "★ Номер счета (20)", 2, "entry_account"), ("bank_name", "◆ Банк", 1, "entry")], [("card_number", "◆ Привязанная карта", 1, "entry_card"), ("phone", "◆ Телефон", 1, "entry_phone")], [("bank_bik", "○ БИК (9)", 0, "entry_bik"), ("currency", "○ Валюта", 0, "entry")], [("full_name", "○ ФИО владельца", 0, "entry"), ("date_of_birth", "○ Дата рождения", 0, "entry_date_full")], [("identification_number", "○ ИНН/ID", 0, "entry"), ("address", "○ Адрес", 0, "entry")], [("notes", "○ Примечания", 0, "text_notes_60")]],
-            "CARD": [[("name", "★ Название карты", 2, "entry_name_strict_20")], [("card_number", "★ Номер карты", 2, "entry_card")], [("card_cvv", "★ CVV/CVC", 2, "entry_cvv"), ("card_expire", "★ Срок (MM/YY)", 2, "entry_date")], [("card_holder", "◆ Владелец", 1, "entry"), ("bank_name", "◆ Банк", 1, "entry")], [("card_pin", "○ PIN код", 0, "password_simple"), ("card_type", "○ Тип", 0, "entry")], [("cardholder_phone", "○ Телефон", 0, "entry_phone"), ("limit_amount", "○ Лимит", 0, "entry")], [("passport_number", "○ Паспорт", 0, "entry"), ("currency", "○ Валюта", 0, "entry")], [("notes", "○ Примечания", 0, "text_notes_60")]],
-            "CUSTOM": [[("name", "★ Название", 2, "entry_name_50")], [("username", "★ Поле 1 (Логин)", 2, "entry"), ("password", "★ Поле 2 (Пароль)", 2, "password_row")], [("custom_field_1", "○ Поле 1", 0, "entry"), ("custom_field_2", "○ Поле 2", 0, "entry")]]
-        }
-
-        rows = layout_map.get(ptype, [])
+        rows = LAYOUT_MAP.get(ptype, [])
         for i, r in enumerate(rows):
             self.create_row(i, r)
 
@@ -266,9 +249,7 @@ class AddEditPasswordWindow:
                   command=self.add_custom_field, bg="#bdc3c7", fg="#2c3e50", cursor="hand2").pack()
 
     def add_custom_field(self):
-        """Логика добавления нового поля (до 10 штук)."""
-        if self.custom_fields_count >= 10:
-            return
+        """Логика добавления нового поля (количество не ограничено)."""
         self.custom_fields_count += 1
 
         # Сохраняем текущие значения, чтобы не потерять при перерисовке
@@ -509,10 +490,14 @@ class AddEditPasswordWindow:
         if d.get('is_favorite'):
             self.is_favorite_var.set(True)
         if d['type'] == 'CUSTOM':
+            # Номер последнего заполненного поля custom_field_N
             max_idx = 0
-            for i in range(1, 11):
-                if d.get(f'custom_field_{i}'):
-                    max_idx = i
+            for key, val in d.items():
+                if key.startswith('custom_field_') and val:
+                    try:
+                        max_idx = max(max_idx, int(key[len('custom_field_'):]))
+                    except ValueError:
+                        pass
             self.custom_fields_count = max(2, max_idx)
             self.refresh_fields()
             if self.custom_fields_count > 2:
@@ -522,17 +507,15 @@ class AddEditPasswordWindow:
                     self.add_custom_field()
         else:
             self.refresh_fields()
-        encrypted_fields = ["password", "card_number", "card_cvv",
-                            "card_pin", "security_answer", "account_number", "passport_number"]
+        # Все секреты записи одной расшифровкой (конверт или отдельные поля)
+        try:
+            secrets = self.parent.repo.get_secrets(self.password_id)
+        except Exception:
+            secrets = {}
         for key, widget in self.fields.items():
-            val = d.get(key)
+            val = secrets.get(key) if key in SECRET_FIELDS else d.get(key)
             if not val:
                 continue
-            if key in encrypted_fields:
-                try:
-                    val = self.parent.decrypt_password(val)
-                except:
-                    pass
             if isinstance(widget, tk.Text):
                 widget.delete("1.0", tk.END)
                 widget.insert("1.0", str(val))
@@ -608,42 +591,18 @@ class AddEditPasswordWindow:
         if self.parent.config['notify_weak'] and pwd and len(pwd) < 8:
             if not messagebox.askyesno("Слабый пароль", "Внимание: Пароль короче 8 символов. Все равно сохранить?"):
                 return
-        encrypted_fields = ["password", "card_number", "card_cvv",
-                            "card_pin", "security_answer", "account_number", "passport_number"]
-        for f in encrypted_fields:
-            if data.get(f):
-                data[f] = self.parent.encrypt_password(data[f])
-
-        # Полный список всех возможных колонок в БД
-        all_possible_columns = ["name", "username", "password", "type", "url", "email", "phone", "category", "tags", "notes", "is_favorite", "security_question", "security_answer", "recovery_email", "recovery_phone", "full_name", "date_of_birth", "address", "passport_number", "account_number", "bank_name", "card_number", "card_cvv", "card_expire",
-                                "card_holder", "card_pin", "card_type", "bank_bik", "account_type", "currency", "limit_amount", "cardholder_phone", "cardholder_full_name", "identification_number", "custom_field_1", "custom_field_2", "custom_field_3", "custom_field_4", "custom_field_5", "custom_field_6", "custom_field_7", "custom_field_8", "custom_field_9", "custom_field_10"]
-
-        insert_cols = []
-        insert_vals = []
-        update_set = []
         now = datetime.now()
         data['type'] = ptype
         data['is_favorite'] = 1 if self.is_favorite_var.get() else 0
 
+        # Какие колонки можно писать в БД и как шифровать секреты, решает репозиторий
         if self.mode == "add":
             data['created_at'] = now
-            for col in all_possible_columns + ['created_at']:
-                if col in data:
-                    insert_cols.append(col)
-                    insert_vals.append(data[col])
-            sql = f"INSERT INTO passwords ({','.join(insert_cols)}) VALUES ({','.join(['?']*len(insert_cols))})"
-            self.parent.cursor.execute(sql, tuple(insert_vals))
+            self.parent.repo.insert_record(self.parent.repo.seal(data))
         else:
             data['updated_at'] = now
-            for col in all_possible_columns + ['updated_at']:
-                if col in data:
-                    update_set.append(f"{col}=?")
-                    insert_vals.append(data[col])
-            insert_vals.append(self.password_id)
-            sql = f"UPDATE passwords SET {','.join(update_set)} WHERE id=?"
-            self.parent.cursor.execute(sql, tuple(insert_vals))
-
-        self.parent.conn.commit()
-        self.parent.load_passwords()
+            self.parent.repo.update_record(
+                self.password_id, self.parent.repo.seal(data, self.password_id))
+        # Строку в таблице обновит подписка на изменения репозитория (UITable)
         self.window.destroy()
         messagebox.showinfo("Успех", "Сохранено!")
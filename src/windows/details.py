@@ -1,6 +1,7 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from src.utils import get_font, darken
+from src.database import ENVELOPE_COLUMN, SECRET_FIELDS
 from src.windows.add_edit import AddEditPasswordWindow
 
 
@@ -25,13 +26,8 @@ class DetailModal(tk.Toplevel):
         self.transient(parent.root)
         self.grab_set()
 
-        # Загружаем данные из БД
-        self.parent.cursor.execute(
-            "SELECT * FROM passwords WHERE id=?", (password_id,))
-        row = self.parent.cursor.fetchone()
-        cols = [d[0] for d in self.parent.cursor.description]
-        # Преобразуем кортеж в словарь {колонка: значение}
-        self.data = dict(zip(cols, row))
+        # Загружаем данные из БД (словарь {колонка: значение})
+        self.data = self.parent.repo.get_record(password_id)
 
         self.current_row = 0
         self.main_frame = tk.Frame(self)
@@ -108,10 +104,17 @@ class DetailModal(tk.Toplevel):
         # --- Вывод полей ---
         # Поля, которые не нужно показывать в списке "остальное"
         exclude = ['id', 'user_id', 'type', 'name', 'password',
-                   'is_favorite', 'created_at', 'updated_at', 'last_used_at']
+                   'is_favorite', 'created_at', 'updated_at', 'last_used_at', ENVELOPE_COLUMN]
         # Поля, которые нужно скрывать звездочками
-        encrypted = ["card_number", "card_cvv", "card_pin",
-                     "security_answer", "account_number", "passport_number"]
+        encrypted = [f for f in SECRET_FIELDS if f != "password"]
+        # Секреты из конверта в self.data не попадают - узнаем, какие из них заполнены
+        # (одна расшифровка, дальше показ и копирование идут из кэша)
+        fields = dict(self.data)
+        try:
+            fields.update({f: "" for f in self.parent.repo.get_secrets(self.password_id)
+                           if f in encrypted and not fields.get(f)})
+        except Exception:
+            pass
 
         # Принудительный порядок важных полей вверху
         if self.data.get('username'):
@@ -120,15 +123,15 @@ class DetailModal(tk.Toplevel):
             self.add_grid_row("Email", self.data.get('email'))
 
         self.add_grid_row("Пароль", self.data.get(
-            'password'), is_secure=True, is_big=True)
+            'password'), is_secure=True, is_big=True, field="password")
 
         # Вывод всех остальных заполненных полей
-        for key, val in self.data.items():
-            if key in exclude or val is None or val == "":
+        for key, val in fields.items():
+            if key in exclude or val is None or (val == "" and key not in encrypted):
                 continue
             label = key.replace("_", " ").title()
             is_sec = key in encrypted
-            self.add_grid_row(label, str(val), is_secure=is_sec)
+            self.add_grid_row(label, str(val), is_secure=is_sec, field=key)
 
         # Даты создания/изменения внизу серым цветом
         created = self.data.get('created_at')
@@ -152,18 +155,23 @@ class DetailModal(tk.Toplevel):
         close_img = self.icon_mgr.get("close", "small")
 
         c_edit, c_del, c_close = "#f39c12", "#e74c3c", "#95a5a6"
+        # Просмотр копии - только чтение
+        state = "disabled" if self.parent.browse else "normal"
 
-        tk.Button(footer, text=" Редактировать", image=edit_img if edit_img else None, compound="left",
+        tk.Button(footer, text=" Редактировать", image=edit_img if edit_img else None, compound="left", state=state,
                   command=self.edit_entry, bg=c_edit, activebackground=darken(c_edit), fg="white", font=f_btn, relief="raised", cursor="hand2").grid(row=0, column=0, sticky="ew", padx=5, ipady=5)
 
-        tk.Button(footer, text=" Удалить", image=del_img if del_img else None, compound="left",
+        tk.Button(footer, text=" Удалить", image=del_img if del_img else None, compound="left", state=state,
                   command=self.delete_entry, bg=c_del, activebackground=darken(c_del), fg="white", font=f_btn, relief="raised", cursor="hand2").grid(row=0, column=1, sticky="ew", padx=5, ipady=5)
 
         tk.Button(footer, text=" Закрыть", image=close_img if close_img else None, compound="left",
                   command=self.destroy, bg=c_close, activebackground=darken(c_close), fg="white", font=f_btn, relief="raised", cursor="hand2").grid(row=0, column=2, sticky="ew", padx=5, ipady=5)
 
-    def add_grid_row(self, label, value, is_secure=False, is_big=False, color="black"):
-        """Добавляет одну строку (Метка: Значение) в таблицу просмотра."""
+    def add_grid_row(self, label, value, is_secure=False, is_big=False, color="black", field=None):
+        """
+        Добавляет одну строку (Метка: Значение) в таблицу просмотра.
+        field - имя поля записи: секретные значения расшифровываются через кэш приложения.
+        """
         sc = self.parent.config['font_size']
         f_lbl = get_font(10, "bold", sc)
         f_val = get_font(12, "normal", sc)
@@ -207,7 +215,7 @@ class DetailModal(tk.Toplevel):
                 current = e.get()
                 if current.startswith("•••"):
                     try:
-                        decrypted = self.parent.decrypt_password(v)
+                        decrypted = self._reveal(field, v)
                         self.set_entry_text(e, decrypted)
                         # Красный цвет для открытого пароля
                         e.config(fg="#e74c3c")
@@ -231,7 +239,7 @@ class DetailModal(tk.Toplevel):
             text_to_copy = v
             if sec:
                 try:
-                    text_to_copy = self.parent.decrypt_password(v)
+                    text_to_copy = self._reveal(field, v)
                 except:
                     pass
             self.copy_to_clip(text_to_copy)
@@ -245,6 +253,12 @@ class DetailModal(tk.Toplevel):
 
         self.current_row += 2
 
+    def _reveal(self, field, value):
+        """Расшифровка значения поля: из кэша по id записи, иначе напрямую."""
+        if field:
+            return self.parent.reveal_secret(self.password_id, field)
+        return self.parent.decrypt_password(value)
+
     def set_entry_text(self, entry, text):
         """Безопасно меняет текст в Entry (включает state=normal, пишет, выключает)."""
         entry.config(state="normal")
@@ -277,8 +291,5 @@ class DetailModal(tk.Toplevel):
     def delete_entry(self):
         """Удаление текущей записи."""
         if messagebox.askyesno("Удаление", "Точно удалить?"):
-            self.parent.cursor.execute(
-                "DELETE FROM passwords WHERE id=?", (self.password_id,))
-            self.parent.conn.commit()
-            self.parent.load_passwords()
+            self.parent.repo.delete([self.password_id])
             self.destroy()
@@ -1,8 +1,7 @@
 import tkinter as tk
 from tkinter import messagebox
-import sqlite3
-import hashlib
 from src.utils import get_font
+from src.core.keyring import WrongPassword
 
 
 class LoginWindow(tk.Toplevel):
@@ -12,10 +11,11 @@ class LoginWindow(tk.Toplevel):
     2. При автоблокировке (Lock Screen).
     """
 
-    def __init__(self, parent, on_success, config, icon_manager, is_lock_screen=False):
+    def __init__(self, parent, on_success, config, icon_manager, is_lock_screen=False, keyring=None):
         super().__init__(parent)
         self.withdraw()
         self.on_success = on_success  # Функция, которую нужно вызвать при успешном входе
+        self.keyring = keyring        # Ключ хранилища под мастер-паролем (core.keyring.Keyring)
         self.config = config
         self.icon_mgr = icon_manager
         self.is_lock_screen = is_lock_screen
@@ -42,9 +42,6 @@ class LoginWindow(tk.Toplevel):
             # Если закрыть окно входа при старте - программа закрывается
             self.protocol("WM_DELETE_WINDOW", parent.quit)
 
-        self.conn = sqlite3.connect('password_manager.db')
-        self.cursor = self.conn.cursor()
-
         # Проверка, задан ли уже пароль в БД
         self.check_master_password_exists()
 
@@ -52,14 +49,9 @@ class LoginWindow(tk.Toplevel):
         self.deiconify()
 
     def check_master_password_exists(self):
-        """Проверяет наличие хэша пароля в таблице настроек."""
-        self.cursor.execute(
-            "CREATE TABLE IF NOT EXISTS app_settings (key TEXT PRIMARY KEY, value TEXT)")
-        self.cursor.execute(
-            "SELECT value FROM app_settings WHERE key='master_hash'")
-        self.stored_hash = self.cursor.fetchone()
-        # Если нет хэша - это новый пользователь
-        self.is_new_user = self.stored_hash is None
+        """Проверяет, задан ли мастер-пароль."""
+        # Если пароля нет - это новый пользователь
+        self.is_new_user = not self.keyring.has_password()
 
     def create_ui(self):
         f_head = get_font(16, "bold", self.scale)
@@ -127,43 +119,35 @@ class LoginWindow(tk.Toplevel):
             if img:
                 self.btn_eye.config(image=img)
 
-    def hash_password(self, pwd):
-        """Хэширование пароля SHA-256."""
-        return hashlib.sha256(pwd.encode()).hexdigest()
-
     def check_password(self):
         """Проверка введенного пароля."""
         pwd = self.entry.get()
         if not pwd:
             return
-        h = self.hash_password(pwd)
-
-        if self.is_new_user:
-            # Если пользователь новый - сохраняем хэш
-            self.cursor.execute(
-                "INSERT INTO app_settings (key, value) VALUES ('master_hash', ?)", (h,))
-            self.conn.commit()
-            self.conn.close()
-            self.destroy()
-            self.on_success()  # Запускаем основное приложение
-        else:
-            # Если пользователь существует - сверяем хэш
-            if h == self.stored_hash[0]:
-                self.conn.close()
-                self.destroy()
-                self.on_success()
+        # Вывод ключа из пароля (scrypt) занимает заметное время - показываем часики
+        self.configure(cursor="watch")
+        self.update_idletasks()
+        try:
+            if self.is_new_user:
+                # Если пользователь новый - оборачиваем ключ хранилища паролем
+                self.keyring.set_password(pwd)
             else:
-                messagebox.showerror("Ошибка", "Неверный пароль!")
-                self.entry.delete(0, tk.END)
+                # Если пользователь существует - пароль должен раскрыть ключ
+                self.keyring.unlock(pwd)
+        except WrongPassword:
+            self.configure(cursor="")
+            messagebox.showerror("Ошибка", "Неверный пароль!")
+            self.entry.delete(0, tk.END)
+            return
+        self.destroy()
+        self.on_success()  # Запускаем основное приложение
 
     def forgot_pass(self):
         """Сброс базы данных при потере пароля."""
         if messagebox.askyesno("Сброс", "Сброс пароля приведет к потере доступа к старой базе. Создать новую?"):
-            # Удаляем хэш мастера, что переведет программу в режим "Новый пользователь"
+            # Удаляем обертку ключа, что переведет программу в режим "Новый пользователь"
             # (Сами зашифрованные данные останутся, но прочитать их будет нельзя без старого ключа)
-            self.cursor.execute(
-                "DELETE FROM app_settings WHERE key='master_hash'")
-            self.conn.commit()
+            self.keyring.reset()
             self.check_master_password_exists()
             # Перерисовываем интерфейс
             for widget in self.winfo_children():
@@ -0,0 +1,260 @@
+import os
+import sqlite3
+import tkinter as tk
+from tkinter import ttk, messagebox
+from src.utils import darken
+from src.core.chunk_store import ChunkStore
+from src.core.repository import VaultRepository
+from src.core.restore import PRE_RESTORE_SUFFIX, materialize_snapshot, remove_database_file
+
+
+def _center(window, w, h):
+    """Ставит окно размером w x h по центру экрана."""
+    x = (window.winfo_screenwidth() // 2) - (w // 2)
+    y = (window.winfo_screenheight() // 2) - (h // 2)
+    window.geometry(f"{w}x{h}+{x}+{y}")
+
+
+class RestoreWindow(tk.Toplevel):
+    """
+    Окно восстановления из резервной копии.
+    Список копий строится только по каталогу хранилища (catalog.json),
+    поэтому окно открывается сразу, не читая сами бэкапы.
+    Можно вернуть всю базу целиком, только выбранные записи
+    или просто посмотреть копию в главном окне (только чтение).
+    """
+
+    def __init__(self, parent):
+        super().__init__(parent.root)
+        self.withdraw()
+        self.parent = parent
+        self.icon_mgr = parent.icon_mgr
+        self.store_dir = parent.backup_dir()
+
+        self.title("Восстановление из копии")
+        self.icon_mgr.set_app_icon(self)
+        self.transient(parent.root)
+        self.grab_set()
+
+        self.create_ui()
+        self.load_catalog()
+
+        _center(self, 700, 450)
+        self.deiconify()
+
+    def create_ui(self):
+        tk.Label(self, text=f"Копии в папке: {os.path.abspath(self.store_dir)}",
+                 fg="gray").pack(anchor="w", padx=10, pady=(10, 0))
+
+        frame = tk.Frame(self)
+        frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        cols = ("date", "records", "size", "status")
+        self.tree = ttk.Treeview(frame, columns=cols, show="headings", selectmode="browse")
+        self.tree.heading("date", text="Дата")
+        self.tree.heading("records", text="Записей")
+        self.tree.heading("size", text="Размер")
+        self.tree.heading("status", text="Проверка")
+        self.tree.column("date", width=160, anchor="w")
+        self.tree.column("records", width=80, anchor="center")
+        self.tree.column("size", width=90, anchor="center")
+        self.tree.column("status", width=250, anchor="w")
+        self.tree.tag_configure("failed", background="#fadbd8")
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar = ttk.Scrollbar(frame, orient="vertical", command=self.tree.yview)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+
+        btn_frame = tk.Frame(self, pady=10, padx=10, bg="#ecf0f1")
+        btn_frame.pack(side=tk.BOTTOM, fill=tk.X)
+        c_blue, c_gray = "#3498db", "#95a5a6"
+        tk.Button(btn_frame, text="Восстановить всю базу", bg=c_blue, activebackground=darken(c_blue),
+                  fg="white", font=("Arial", 10, "bold"), cursor="hand2", padx=10,
+                  command=self.restore_all).pack(side=tk.LEFT, padx=5)
+        tk.Button(btn_frame, text="Выбрать записи...", cursor="hand2", padx=10,
+                  command=self.restore_selected).pack(side=tk.LEFT, padx=5)
+        tk.Button(btn_frame, text="Просмотреть", cursor="hand2", padx=10,
+                  command=self.browse).pack(side=tk.LEFT, padx=5)
+        tk.Button(btn_frame, text="Закрыть", bg=c_gray, activebackground=darken(c_gray),
+                  fg="white", cursor="hand2", padx=15,
+                  command=self.destroy).pack(side=tk.RIGHT, padx=5)
+
+    def load_catalog(self):
+        """Заполняет список копий из каталога (новые сверху)."""
+        store = ChunkStore(self.store_dir)
+        catalog = store.read_catalog()
+        for name in reversed(store.list_snapshots()):
+            entry = catalog.get(name, {})
+            size = entry.get("size")
+            size_text = f"{size / (1024 * 1024):.1f} МБ" if size else "-"
+            if "verified_at" not in entry:
+                status = "не проверялась"
+            elif entry.get("status") == "ok":
+                status = f"OK ({entry['verified_at']})"
+            else:
+                status = f"Ошибка: {entry.get('message', '')}"
+            tags = ("failed",) if entry.get("status") == "failed" else ()
+            self.tree.insert("", tk.END, iid=name, tags=tags, values=(
+                entry.get("created_at", name), entry.get("records", "-"), size_text, status))
+
+    def _selected_snapshot(self):
+        sel = self.tree.selection()
+        if not sel:
+            messagebox.showinfo("Инфо", "Выберите копию в списке", parent=self)
+            return None
+        return sel[0]
+
+    def _materialize(self, name):
+        """Собирает и проверяет копию во временный файл рядом с базой (или None при ошибке)."""
+        work_dir = os.path.dirname(os.path.abspath(self.parent.db.path))
+        self.config(cursor="watch")
+        self.update_idletasks()
+        try:
+            return materialize_snapshot(self.store_dir, name, work_dir)
+        except Exception as e:
+            messagebox.showerror("Ошибка", f"Не удалось прочитать копию:\n{e}", parent=self)
+            return None
+        finally:
+            self.config(cursor="")
+
+    def restore_all(self):
+        """Заменяет текущую базу выбранной копией."""
+        name = self._selected_snapshot()
+        if not name:
+            return
+        date = self.tree.set(name, "date")
+        keep = os.path.basename(self.parent.db.path) + PRE_RESTORE_SUFFIX
+        if not messagebox.askyesno(
+                "Восстановление",
+                f"Заменить текущую базу копией от {date}?\n\n"
+                f"Текущая база будет сохранена как {keep}.\n\n"
+                f"Мастер-пароль и ключ шифрования вернутся к тем, что были на момент "
+                f"копии: после восстановления нужно будет войти с тем паролем.", parent=self):
+            return
+        tmp_path = self._materialize(name)
+        if not tmp_path:
+            return
+        try:
+            self.parent.restore_database(tmp_path)
+        except Exception as e:
+            messagebox.showerror("Ошибка", f"Не удалось восстановить базу:\n{e}", parent=self)
+            return
+        finally:
+            remove_database_file(tmp_path)
+        messagebox.showinfo("Восстановление",
+                            "База восстановлена из копии.\n"
+                            "Войдите с мастер-паролем, который действовал на момент копии.",
+                            parent=self)
+        self.destroy()
+        self.parent.relogin()
+
+    def restore_selected(self):
+        """Открывает список записей копии для выборочного восстановления."""
+        name = self._selected_snapshot()
+        if not name:
+            return
+        tmp_path = self._materialize(name)
+        if not tmp_path:
+            return
+        date = self.tree.set(name, "date")
+        self.destroy()
+        RecordPickerWindow(self.parent, tmp_path, date)
+
+    def browse(self):
+        """Открывает копию в главном окне в режиме только для чтения."""
+        name = self._selected_snapshot()
+        if not name:
+            return
+        tmp_path = self._materialize(name)
+        if not tmp_path:
+            return
+        date = self.tree.set(name, "date")
+        self.destroy()
+        # Временный файл удалится при закрытии просмотра
+        self.parent.browse_backup(tmp_path, f"копия от {date}", temp_path=tmp_path)
+
+
+class RecordPickerWindow(tk.Toplevel):
+    """
+    Выбор записей из копии для восстановления.
+    Выбранные записи возвращаются в текущую базу: совпадающие по id
+    заменяются версией из копии, удаленные - добавляются снова.
+    Временный файл копии удаляется при закрытии окна.
+    """
+
+    def __init__(self, parent, snapshot_path, date):
+        super().__init__(parent.root)
+        self.withdraw()
+        self.parent = parent
+        self.icon_mgr = parent.icon_mgr
+        self.snapshot_path = snapshot_path
+        self.conn = sqlite3.connect(snapshot_path)
+        self.repo = VaultRepository(self.conn)
+
+        self.title(f"Записи из копии от {date}")
+        self.icon_mgr.set_app_icon(self)
+        self.transient(parent.root)
+        self.grab_set()
+        self.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.create_ui()
+        _center(self, 750, 500)
+        self.deiconify()
+
+    def create_ui(self):
+        tk.Label(self, text="Выделите записи (Ctrl/Shift + клик), которые нужно вернуть в базу:",
+                 fg="gray").pack(anchor="w", padx=10, pady=(10, 0))
+
+        frame = tk.Frame(self)
+        frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        cols = ("type", "name", "login", "updated")
+        self.tree = ttk.Treeview(frame, columns=cols, show="headings", selectmode="extended")
+        self.tree.heading("type", text="Тип")
+        self.tree.heading("name", text="Название")
+        self.tree.heading("login", text="Логин")
+        self.tree.heading("updated", text="Изменена")
+        self.tree.column("type", width=90, anchor="center", stretch=False)
+        self.tree.column("updated", width=140, anchor="center", stretch=False)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar = ttk.Scrollbar(frame, orient="vertical", command=self.tree.yview)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+
+        for ptype, name, user, email, cat, created, pid, is_fav, updated in self.repo.list_rows():
+            self.tree.insert("", tk.END, iid=str(pid), values=(
+                self.parent.type_map_display.get(ptype, ptype), name,
+                user or email or "-", updated or "-"))
+
+        btn_frame = tk.Frame(self, pady=10, padx=10, bg="#ecf0f1")
+        btn_frame.pack(side=tk.BOTTOM, fill=tk.X)
+        c_blue, c_gray = "#3498db", "#95a5a6"
+        tk.Button(btn_frame, text="Восстановить выбранные", bg=c_blue, activebackground=darken(c_blue),
+                  fg="white", font=("Arial", 10, "bold"), cursor="hand2", padx=10,
+                  command=self.restore).pack(side=tk.LEFT, padx=5)
+        tk.Button(btn_frame, text="Отмена", bg=c_gray, activebackground=darken(c_gray),
+                  fg="white", cursor="hand2", padx=15,
+                  command=self.close).pack(side=tk.RIGHT, padx=5)
+
+    def restore(self):
+        ids = [int(i) for i in self.tree.selection()]
+        if not ids:
+            messagebox.showinfo("Инфо", "Ничего не выбрано", parent=self)
+            return
+        if not messagebox.askyesno(
+                "Восстановление",
+                f"Вернуть выбранные записи ({len(ids)} шт)?\n"
+                "Текущие версии этих записей будут заменены.", parent=self):
+            return
+        try:
+            records = [self.repo.get_record(pid) for pid in ids]
+            count = self.parent.vault_repo.restore_records(records)
+        except Exception as e:
+            messagebox.showerror("Ошибка", f"Не удалось восстановить записи:\n{e}", parent=self)
+            return
+        messagebox.showinfo("Восстановление", f"Восстановлено записей: {count}", parent=self)
+        self.close()
+
+    def close(self):
+        """Закрывает окно и удаляет временный файл копии."""
+        self.conn.close()
+        remove_database_file(self.snapshot_path)
+        self.destroy()
@@ -1,12 +1,11 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, simpledialog
-import sqlite3
-import hashlib
-import os
-import shutil
 from datetime import datetime
 from src.config import save_config, load_config
+from src.database import DURABILITY_MODES, DEFAULT_DURABILITY
 from src.utils import darken
+from src.core.backup import backup_name
+from src.core.keyring import WrongPassword
 
 
 class SettingsWindow(tk.Toplevel):
@@ -26,7 +25,7 @@ class SettingsWindow(tk.Toplevel):
         self.icon_mgr.set_app_icon(self)
 
         # Немного увеличим ширину, чтобы вместить объединенные настройки
-        self.geometry("650x550")
+        self.geometry("650x660")
         self.resizable(False, False)
 
         self.transient(parent.root)
@@ -130,6 +129,21 @@ class SettingsWindow(tk.Toplevel):
         tk.Label(group_access, text="(Пароли скрыты точками ••••, показываются при наведении курсора)",
                  fg="gray", font=("Arial", 8)).pack(anchor="w", padx=20)
 
+        # Кэш расшифрованных значений (очищается при блокировке)
+        f_ttl = tk.Frame(group_access)
+        f_ttl.pack(anchor="w", pady=(10, 0))
+        tk.Label(f_ttl, text="Помнить расшифрованные пароли").pack(side=tk.LEFT)
+        self.spin_ttl = tk.Spinbox(f_ttl, from_=0, to=600, width=5)
+        self.spin_ttl.delete(0, "end")
+        self.spin_ttl.insert(0, self.config.get('secret_cache_ttl_sec', 30))
+        self.spin_ttl.pack(side=tk.LEFT, padx=5)
+        tk.Label(f_ttl, text="сек (0 - расшифровывать каждый раз)").pack(side=tk.LEFT)
+
+        # Конверт: все секретные поля записи - один шифротекст (одна расшифровка на запись)
+        self.var_envelope = tk.BooleanVar(value=self.config.get('secret_envelope', True))
+        tk.Checkbutton(group_access, text="Шифровать секретные поля записи одним блоком",
+                       variable=self.var_envelope).pack(anchor="w", pady=(10, 0))
+
         # --- Секция: Мастер-пароль ---
         group_master = tk.LabelFrame(
             frame_sec, text="Мастер-пароль", padx=10, pady=10)
@@ -140,10 +154,15 @@ class SettingsWindow(tk.Toplevel):
 
         key_icon = self.icon_mgr.get("key", "small")
         c_orange = "#e67e22"
-        tk.Button(group_master, text=" Сменить мастер-пароль", image=key_icon if key_icon else None, compound="left",
+        master_btns = tk.Frame(group_master)
+        master_btns.pack(anchor="w")
+        tk.Button(master_btns, text=" Сменить мастер-пароль", image=key_icon if key_icon else None, compound="left",
                   command=self.change_master_password, bg=c_orange, activebackground=darken(
                       c_orange),
-                  fg="white", font=("Arial", 10, "bold"), cursor="hand2", padx=10).pack(anchor="w")
+                  fg="white", font=("Arial", 10, "bold"), cursor="hand2", padx=10).pack(side=tk.LEFT)
+        # Новый ключ шифрования + перешифровка всех записей в фоне
+        tk.Button(master_btns, text="Сменить ключ шифрования", command=self.rotate_key,
+                  cursor="hand2", padx=10).pack(side=tk.LEFT, padx=(10, 0))
 
         # ==========================================
         # Вкладка 3: РЕЗЕРВНОЕ КОПИРОВАНИЕ
@@ -178,6 +197,32 @@ class SettingsWindow(tk.Toplevel):
         tk.Button(path_frame, text="...", image=search_icon if search_icon else None,
                   command=self.choose_backup_path, width=30, cursor="hand2").pack(side=tk.LEFT, padx=5)
 
+        # Политика хранения: старые копии удаляются в фоне после очередного бэкапа
+        keep_frame = tk.Frame(group_auto)
+        keep_frame.pack(fill=tk.X, pady=(10, 0))
+        tk.Label(keep_frame, text="Хранить копии за последние:").pack(side=tk.LEFT)
+        self.keep_spins = {}
+        for key, label in [("backup_keep_daily", "дн."), ("backup_keep_weekly", "нед."),
+                           ("backup_keep_monthly", "мес.")]:
+            spin = tk.Spinbox(keep_frame, from_=0, to=365, width=4)
+            spin.delete(0, "end")
+            spin.insert(0, self.config.get(key, 0))
+            spin.pack(side=tk.LEFT, padx=(10, 2))
+            tk.Label(keep_frame, text=label).pack(side=tk.LEFT)
+            self.keep_spins[key] = spin
+        tk.Label(group_auto, text="(Из каждого дня/недели/месяца остается самая свежая копия; все 0 - хранить всё)",
+                 fg="gray", font=("Arial", 8)).pack(anchor="w")
+
+        # Фоновая проверка новых копий: quick_check + пробная расшифровка части полей
+        verify_frame = tk.Frame(group_auto)
+        verify_frame.pack(fill=tk.X, pady=(10, 0))
+        tk.Label(verify_frame, text="При проверке копии расшифровывать").pack(side=tk.LEFT)
+        self.spin_verify = tk.Spinbox(verify_frame, from_=0, to=100, width=4)
+        self.spin_verify.delete(0, "end")
+        self.spin_verify.insert(0, self.config.get('backup_verify_percent', 10))
+        self.spin_verify.pack(side=tk.LEFT, padx=5)
+        tk.Label(verify_frame, text="% секретных полей").pack(side=tk.LEFT)
+
         # --- Секция: Ручное управление ---
         group_manual = tk.LabelFrame(
             frame_bak, text="Ручное управление", padx=10, pady=10)
@@ -192,7 +237,25 @@ class SettingsWindow(tk.Toplevel):
         tk.Button(group_manual, text=" Создать копию сейчас", image=save_icon if save_icon else None, compound="left",
                   command=self.make_backup, bg=c_blue, activebackground=darken(
                       c_blue),
-                  fg="white", font=("Arial", 10, "bold"), cursor="hand2", padx=10).pack(anchor="w")
+                  fg="white", font=("Arial", 10, "bold"), cursor="hand2", padx=10).pack(side=tk.LEFT)
+        tk.Button(group_manual, text="Восстановить из копии...", cursor="hand2", padx=10,
+                  command=self.open_restore).pack(side=tk.LEFT, padx=10)
+
+        # --- Секция: Надежность записи ---
+        group_db = tk.LabelFrame(
+            frame_bak, text="Надежность записи в базу", padx=10, pady=10)
+        group_db.pack(fill=tk.X, padx=10, pady=10)
+
+        tk.Label(group_db, text="Режим записи:").pack(side=tk.LEFT)
+        self.combo_durability = ttk.Combobox(
+            group_db, values=list(DURABILITY_MODES.keys()), state="readonly", width=25)
+        durability = self.config.get('db_durability', DEFAULT_DURABILITY)
+        if durability not in DURABILITY_MODES:
+            durability = DEFAULT_DURABILITY
+        self.combo_durability.set(durability)
+        self.combo_durability.pack(side=tk.LEFT, padx=10)
+        tk.Label(group_db, text="(Полная - сброс на диск при каждом сохранении)",
+                 fg="gray", font=("Arial", 8)).pack(side=tk.LEFT)
 
         # ==========================================
         # НИЖНЯЯ ПАНЕЛЬ КНОПОК (Общая для всех вкладок)
@@ -241,21 +304,31 @@ class SettingsWindow(tk.Toplevel):
             target_dir = self.config.get('backup_path', '')
             if not target_dir:
                 target_dir = "_backup"
-            if not os.path.exists(target_dir):
-                os.makedirs(target_dir)
-
-            fname = os.path.join(
-                target_dir, f"backup_manual_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db")
-            shutil.copy("password_manager.db", fname)
-            messagebox.showinfo("Бэкап", f"Копия создана успешно:\n{fname}")
-
-            # Обновляем метку времени последнего бэкапа
-            new_c = self.config.copy()
-            new_c['last_backup'] = datetime.now().strftime('%Y-%m-%d')
-            save_config(new_c)
+            # Инкрементальный снимок в фоновом потоке (окно не зависает)
+            if not self.parent.start_backup(target_dir, backup_name("backup_manual"),
+                                            on_done=self._on_backup_done):
+                messagebox.showinfo("Бэкап", "Резервное копирование уже выполняется", parent=self)
         except Exception as e:
             messagebox.showerror("Ошибка", str(e))
 
+    def open_restore(self):
+        """Закрывает настройки (без сохранения) и открывает окно восстановления."""
+        self.destroy()
+        self.parent.open_restore()
+
+    def _on_backup_done(self, ok, info):
+        """Итог ручного бэкапа (вызывается главным окном, когда фоновый поток закончил)."""
+        if ok:
+            # Обновляем метку времени последнего бэкапа (и в копии настроек этого окна,
+            # чтобы "Сохранить" ее не затер)
+            stamp = datetime.now().strftime('%Y-%m-%d')
+            self.parent.config['last_backup'] = stamp
+            self.config['last_backup'] = stamp
+            save_config(self.parent.config)
+            messagebox.showinfo("Бэкап", f"Копия создана успешно:\n{info}")
+        else:
+            messagebox.showerror("Ошибка", info)
+
     def change_master_password(self):
         """Логика смены мастер-пароля."""
         # 1. Проверка текущего
@@ -264,27 +337,23 @@ class SettingsWindow(tk.Toplevel):
         if not current:
             return
 
-        conn = sqlite3.connect('password_manager.db')
-        cur = conn.cursor()
-        cur.execute("SELECT value FROM app_settings WHERE key='master_hash'")
-        res = cur.fetchone()
-
-        if not res:
-            conn.close()
+        keyring = self.parent.keyring
+        if not keyring.has_password():
             return
 
-        stored_hash = res[0]
-        # Хэшируем введенный и сравниваем с БД
-        if hashlib.sha256(current.encode()).hexdigest() != stored_hash:
+        # Пароль должен раскрыть ключ хранилища (scrypt, заметная пауза)
+        self.configure(cursor="watch")
+        self.update_idletasks()
+        ok = keyring.verify(current)
+        self.configure(cursor="")
+        if not ok:
             messagebox.showerror("Ошибка", "Неверный текущий пароль")
-            conn.close()
             return
 
         # 2. Ввод нового
         new_pass = simpledialog.askstring(
             "Смена пароля", "Введите НОВЫЙ мастер-пароль:", show='•', parent=self)
         if not new_pass:
-            conn.close()
             return
 
         # 3. Подтверждение
@@ -292,23 +361,52 @@ class SettingsWindow(tk.Toplevel):
             "Смена пароля", "Повторите НОВЫЙ мастер-пароль:", show='•', parent=self)
         if new_pass != confirm_pass:
             messagebox.showerror("Ошибка", "Новые пароли не совпадают!")
-            conn.close()
             return
 
-        # 4. Сохранение нового хэша
-        new_hash = hashlib.sha256(new_pass.encode()).hexdigest()
-        cur.execute(
-            "UPDATE app_settings SET value=? WHERE key='master_hash'", (new_hash,))
-        conn.commit()
-        conn.close()
+        # 4. Перешифровка ключа хранилища новым паролем (записи не меняются)
+        self.configure(cursor="watch")
+        self.update_idletasks()
+        keyring.set_password(new_pass)
+        self.configure(cursor="")
         messagebox.showinfo("Успех", "Мастер-пароль успешно изменен!")
 
+    def rotate_key(self):
+        """Смена ключа шифрования: записи перешифровываются в фоне, ход виден в статус-баре."""
+        if self.parent.rotation and self.parent.rotation.is_alive():
+            messagebox.showinfo("Инфо", "Смена ключа уже идет", parent=self)
+            return
+        if not messagebox.askyesno(
+                "Смена ключа",
+                "Создать новый ключ шифрования и перешифровать им все записи?\n"
+                "Работа идет в фоне; если программу закрыть, она продолжится при следующем входе.",
+                parent=self):
+            return
+        password = None
+        if self.parent.keyring.has_password():
+            password = simpledialog.askstring(
+                "Смена ключа", "Введите мастер-пароль:", show='•', parent=self)
+            if not password:
+                return
+        self.configure(cursor="watch")
+        self.update_idletasks()
+        try:
+            self.parent.rotate_key(password)
+        except WrongPassword:
+            messagebox.showerror("Ошибка", "Неверный мастер-пароль", parent=self)
+            return
+        finally:
+            self.configure(cursor="")
+        messagebox.showinfo("Смена ключа", "Новый ключ действует. Записи перешифровываются в фоне.",
+                            parent=self)
+
     def save_settings(self):
         """Сбор всех данных с формы и сохранение в config.json."""
         new_conf = self.config.copy()
 
         # Основные
         new_conf['require_login'] = self.var_login.get()
+        # Без пароля при входе ключ хранилища нужен в файле encryption.key
+        self.parent.keyring.set_keep_key_file(not new_conf['require_login'])
         if self.var_lock.get():
             try:
                 val = int(self.spin_lock.get())
@@ -325,6 +423,15 @@ class SettingsWindow(tk.Toplevel):
         # Безопасность
         new_conf['confirm_copy'] = self.var_confirm.get()
         new_conf['show_passwords_table'] = self.var_show_tbl.get()
+        try:
+            new_conf['secret_cache_ttl_sec'] = max(0, int(self.spin_ttl.get()))
+        except ValueError:
+            pass
+        new_conf['secret_envelope'] = self.var_envelope.get()
+        for repo in (self.parent.vault_repo, self.parent.repo):
+            repo.secrets.ttl = new_conf.get('secret_cache_ttl_sec', 30)
+            repo.secrets.clear()
+            repo.envelope = new_conf['secret_envelope']
 
         # Бэкап
         new_conf['backup_freq'] = self.combo_backup.get()
@@ -333,8 +440,22 @@ class SettingsWindow(tk.Toplevel):
             new_conf['backup_path'] = current_display
         else:
             new_conf['backup_path'] = ""
+        for key, spin in self.keep_spins.items():
+            try:
+                new_conf[key] = max(0, int(spin.get()))
+            except ValueError:
+                pass  # Оставляем прежнее значение при ошибке ввода
+        try:
+            new_conf['backup_verify_percent'] = min(100, max(0, int(self.spin_verify.get())))
+        except ValueError:
+            pass
+        new_conf['db_durability'] = self.combo_durability.get()
+        self.parent.db.set_durability(new_conf['db_durability'])
 
         # Сохраняем и обновляем приложение
         save_config(new_conf)
         self.destroy()
         self.parent.reload_ui()
+        # Включили конверт - существующие записи соберутся в него в фоне
+        if new_conf['secret_envelope'] and not self.config.get('secret_envelope', True):
+            self.parent.check_secret_format()
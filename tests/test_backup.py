@@ -0,0 +1,90 @@
+"""
+Политика хранения бэкапов (core.backup.expired_snapshots) и чистка старых
+снимков в BackupWorker.prune: ошибка чистки уходит событием prune_error,
+а не роняет поток.
+"""
+import os
+from datetime import datetime, timedelta
+import pytest
+from src.core.backup import BackupWorker, expired_snapshots
+
+NOW = datetime(2024, 5, 15, 12, 0, 0)
+
+
+def _name(ts):
+    return f"vault_{ts.strftime('%Y%m%d_%H%M%S')}"
+
+
+def _daily(days):
+    """По два снимка в день (утром и вечером) за days дней до NOW."""
+    names = []
+    for day in range(days):
+        for hour in (9, 21):
+            names.append(_name(NOW.replace(hour=hour) - timedelta(days=day)))
+    return sorted(names)
+
+
+def test_all_zero_keeps_everything():
+    assert expired_snapshots(_daily(10), 0, 0, 0) == []
+
+
+def test_daily_bucket_keeps_latest_of_each_day():
+    names = _daily(10)
+    kept = set(names) - set(expired_snapshots(names, 3, 0, 0))
+    # Вечерний снимок каждого из трех последних дней
+    assert kept == {_name(NOW.replace(hour=21) - timedelta(days=d)) for d in range(3)}
+
+
+def test_weekly_and_monthly_buckets():
+    # Снимок раз в неделю (по средам) за полгода
+    names = sorted(_name(NOW - timedelta(weeks=w)) for w in range(26))
+    kept = set(names) - set(expired_snapshots(names, 0, 2, 0))
+    assert kept == {_name(NOW), _name(NOW - timedelta(weeks=1))}
+
+    kept = set(names) - set(expired_snapshots(names, 0, 0, 3))
+    # Самый свежий снимок в каждом из трех последних месяцев
+    assert kept == {_name(NOW), _name(datetime(2024, 4, 24, 12)), _name(datetime(2024, 3, 27, 12))}
+
+
+def test_buckets_are_combined_and_newest_always_kept():
+    names = _daily(40)
+    expired = set(expired_snapshots(names, 1, 1, 2))
+    # Дневная и недельная корзины совпадают на самом новом снимке
+    assert _name(NOW.replace(hour=21)) not in expired
+    # Месячная: последний снимок апреля
+    assert _name(datetime(2024, 4, 30, 21)) not in expired
+    assert len(names) - len(expired) == 2
+
+
+def test_nonstandard_names_are_left_alone():
+    names = _daily(5) + ["manual copy", "vault_broken"]
+    expired = expired_snapshots(names, 1, 0, 0)
+    assert "manual copy" not in expired and "vault_broken" not in expired
+    assert len(expired) == 9
+
+
+@pytest.fixture()
+def worker(tmp_path):
+    worker = BackupWorker(str(tmp_path / "vault.db"), str(tmp_path / "backups"),
+                          "unused", retention=(1, 0, 0))
+    data = tmp_path / "data.db"
+    data.write_bytes(b"page" * 1000)
+    for day in range(3):
+        worker.store.add_snapshot(str(data), _name(NOW - timedelta(days=day)))
+    return worker
+
+
+def test_prune_deletes_expired(worker):
+    worker.prune()
+    assert worker.store.list_snapshots() == [_name(NOW)]
+    assert worker.events.empty()
+
+
+def test_prune_reports_corrupt_manifest(worker):
+    # Испорченный манифест: collect_garbage не может его прочитать
+    with open(worker.store.manifest_path("manual"), "w") as f:
+        f.write("{not json")
+    worker.prune()
+    kind, text = worker.events.get_nowait()
+    assert kind == "prune_error" and text
+    assert os.path.exists(worker.store.manifest_path("manual"))
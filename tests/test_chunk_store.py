@@ -0,0 +1,83 @@
+"""
+Хранилище инкрементальных бэкапов (core.chunk_store.ChunkStore): снимок
+восстанавливается побайтно, поврежденный кусок не дает собрать файл,
+а сборка мусора удаляет только куски, на которые не ссылается ни один снимок.
+"""
+import os
+import random
+import zlib
+import pytest
+from src.core.chunk_store import CHUNK_SIZE, ChunkStore
+
+
+@pytest.fixture()
+def store(tmp_path):
+    return ChunkStore(str(tmp_path / "store"))
+
+
+def _write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _data(seed, size=CHUNK_SIZE * 3 + 1000):
+    return random.Random(seed).randbytes(size)
+
+
+def _chunk_files(store):
+    return {os.path.join(sub, name)
+            for sub in os.listdir(store.chunks_dir)
+            for name in os.listdir(os.path.join(store.chunks_dir, sub))}
+
+
+def test_round_trip_and_dedup(store, tmp_path):
+    data = _data(1)
+    first = store.add_snapshot(_write(tmp_path / "v1.db", data), "s1")
+    assert first["new_chunks"] == 4
+    # Изменилась одна страница - в хранилище добавляется один кусок
+    changed = bytearray(data)
+    changed[CHUNK_SIZE + 10] ^= 0xFF
+    second = store.add_snapshot(_write(tmp_path / "v2.db", bytes(changed)), "s2")
+    assert second["new_chunks"] == 1
+    assert store.list_snapshots() == ["s1", "s2"]
+
+    store.restore("s1", str(tmp_path / "out1.db"))
+    store.restore("s2", str(tmp_path / "out2.db"))
+    assert _read(tmp_path / "out1.db") == data
+    assert _read(tmp_path / "out2.db") == bytes(changed)
+
+
+def test_restore_rejects_corrupt_chunk(store, tmp_path):
+    manifest = store.add_snapshot(_write(tmp_path / "v1.db", _data(1)), "s1")
+    # Кусок читается и распаковывается, но данные в нем уже другие
+    _write(store.chunk_path(manifest["chunks"][1]), zlib.compress(b"x" * CHUNK_SIZE))
+    target = str(tmp_path / "out.db")
+    with pytest.raises(ValueError):
+        store.restore("s1", target)
+    assert not os.path.exists(target)
+    assert not os.path.exists(target + ".part")
+
+
+def test_collect_garbage_keeps_live_chunks(store, tmp_path):
+    store.add_snapshot(_write(tmp_path / "v1.db", _data(1)), "s1")
+    data = _data(2)
+    store.add_snapshot(_write(tmp_path / "v2.db", data), "s2")
+    kept = {os.path.relpath(store.chunk_path(d), store.chunks_dir)
+            for d in store.read_manifest("s2")["chunks"]}
+    # Брошенный временный файл манифеста тоже мусор
+    _write(store.manifest_path("s3") + ".part", b"{")
+
+    store.delete_snapshot("s1")
+    assert store.collect_garbage() == 5
+    assert _chunk_files(store) == kept
+    assert store.list_snapshots() == ["s2"]
+    store.restore("s2", str(tmp_path / "out.db"))
+    assert _read(tmp_path / "out.db") == data
+    # Повторная сборка ничего живого не трогает
+    assert store.collect_garbage() == 0
@@ -0,0 +1,77 @@
+"""
+Список из хранилища колонок (ColumnStore) должен совпадать со списком из
+SQLite (VaultRepository.list_rows) строка в строку - для каждой сортировки,
+с фильтром по типу и без, включая порядок строк с равными ключами.
+"""
+import random
+import pytest
+from src.database import ConnectionManager
+from src.core.repository import LIST_COLUMNS, SORT_ORDERS, VaultRepository
+
+pytest.importorskip("numpy")
+from src.core.column_store import ColumnStore  # noqa: E402
+
+ID_COL = LIST_COLUMNS.index("id")
+# OFFLINE в базе нет - фильтр по типу без записей
+TYPES = ("Все", "WEB", "CARD", "BANK", "OFFLINE")
+# None - порядок по умолчанию (DEFAULT_ORDER)
+SORTS = list(SORT_ORDERS) + [None]
+# Мало разных значений - много строк с равными ключами сортировки
+NAMES = ("Google", "gmail", "Ёлка", "ёж", "яндекс", "Zeta", "zeta", "café", "")
+
+
+@pytest.fixture()
+def repo(tmp_path):
+    db = ConnectionManager(str(tmp_path / "store.db"))
+    repo = VaultRepository(db.conn, secret_ttl=0)
+    rnd = random.Random(7)
+    repo.import_rows([{
+        "name": rnd.choice(NAMES),
+        "type": rnd.choice(TYPES[1:-1]),
+        "username": rnd.choice(NAMES + (None,)),
+        "is_favorite": rnd.random() < 0.2,
+        "created_at": f"2024-01-0{rnd.randint(1, 3)} 10:00:00",
+        "updated_at": f"2024-02-0{rnd.randint(1, 3)} 10:00:00" if rnd.random() < 0.9 else None,
+        "last_used_at": f"2024-03-0{rnd.randint(1, 3)} 10:00:00" if rnd.random() < 0.5 else None,
+    } for _ in range(400)])
+    repo.columns = ColumnStore()
+    repo.columns.load(db.conn)
+    yield repo
+    db.close()
+
+
+def _ids(rows):
+    return [row[ID_COL] for row in rows]
+
+
+def assert_same_lists(repo):
+    store = repo.columns
+    for sort in SORTS:
+        for ptype in TYPES:
+            repo.columns = None
+            expected = _ids(repo.list_rows(ptype, "", sort))
+            repo.columns = store
+            assert _ids(repo.list_rows(ptype, "", sort)) == expected, (sort, ptype)
+
+
+def test_store_matches_sql(repo):
+    assert_same_lists(repo)
+
+
+def test_store_matches_sql_after_writes(repo):
+    rnd = random.Random(3)
+    ids = [row[0] for row in repo.conn.execute("SELECT id FROM passwords")]
+    for pid in rnd.sample(ids, 20):
+        repo.toggle_favorite(pid)
+    for pid in rnd.sample(ids, 20):
+        repo.update_record(pid, {"name": rnd.choice(NAMES), "username": "new",
+                                 "updated_at": "2024-02-02 10:00:00"})
+    repo.delete(rnd.sample(ids, 30))
+    for i in range(10):
+        repo.insert_record({"name": rnd.choice(NAMES), "type": "WEB",
+                            "created_at": "2024-01-02 10:00:00"})
+    # Несохраненные отметки использования, потом их сброс в базу
+    repo.touch(rnd.sample(ids, 5))
+    assert_same_lists(repo)
+    repo.flush_touches()
+    assert_same_lists(repo)
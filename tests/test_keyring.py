@@ -0,0 +1,93 @@
+"""
+Ключ хранилища под мастер-паролем (core.keyring.Keyring): обертка и
+разворачивание ключа, неверный пароль, перевод старого SHA-256 хэша на scrypt
+и проверка пароля (verify), которая ничего не записывает в базу.
+"""
+import hashlib
+import json
+import os
+import pytest
+from src.database import ConnectionManager
+from src.core.keyring import (KEY_FILE, KEY_SETTING, LEGACY_HASH_SETTING, Keyring,
+                              WrongPassword, read_key_file)
+from src.core.repository import VaultRepository
+
+
+@pytest.fixture()
+def repo(tmp_path, monkeypatch):
+    # KEY_FILE - относительный путь: файл ключа создается в tmp_path
+    monkeypatch.chdir(tmp_path)
+    db = ConnectionManager(str(tmp_path / "vault.db"))
+    yield VaultRepository(db.conn)
+    db.close()
+
+
+def _settings(repo):
+    return dict(repo.conn.execute("SELECT key, value FROM app_settings").fetchall())
+
+
+def test_wrap_and_unwrap(repo):
+    keyring = Keyring(repo, target_ms=1)
+    keyring.load_without_password()
+    key = keyring.key
+    keyring.set_password("pw")
+    # Ключ только в обертке: файл удален, в настройке нет открытого ключа
+    assert not os.path.exists(KEY_FILE)
+    assert key.decode() not in repo.get_setting(KEY_SETTING)
+    assert json.loads(repo.get_setting(KEY_SETTING))["kdf"] == "scrypt"
+    assert Keyring(repo, target_ms=1).unlock("pw") == key
+
+
+def test_wrong_password(repo):
+    keyring = Keyring(repo, target_ms=1)
+    keyring.set_password("pw")
+    other = Keyring(repo, target_ms=1)
+    with pytest.raises(WrongPassword):
+        other.unlock("wrong")
+    assert other.key is None
+
+
+def test_change_password_keeps_key(repo):
+    keyring = Keyring(repo, target_ms=1)
+    keyring.set_password("old")
+    key = keyring.key
+    keyring.change_password("old", "new")
+    with pytest.raises(WrongPassword):
+        Keyring(repo, target_ms=1).unlock("old")
+    assert Keyring(repo, target_ms=1).unlock("new") == key
+
+
+def test_legacy_hash_is_migrated(repo):
+    # Старая база: ключ в файле, пароль - несоленый SHA-256
+    key = Keyring(repo).load_without_password()
+    repo.set_setting(LEGACY_HASH_SETTING, hashlib.sha256(b"pw").hexdigest())
+    keyring = Keyring(repo, target_ms=1)
+    with pytest.raises(WrongPassword):
+        keyring.unlock("wrong")
+    assert keyring.unlock("pw") == key
+    assert repo.get_setting(LEGACY_HASH_SETTING) is None
+    assert repo.get_setting(KEY_SETTING) is not None
+    assert read_key_file() is None
+    assert Keyring(repo, target_ms=1).unlock("pw") == key
+
+
+def test_verify_writes_nothing(repo):
+    keyring = Keyring(repo, target_ms=1)
+    keyring.set_password("pw")
+    before = _settings(repo)
+    # Параметры заведомо не под target_ms: unlock бы перезавернул ключ
+    checker = Keyring(repo, target_ms=10000)
+    assert checker.verify("pw")
+    assert not checker.verify("wrong")
+    assert _settings(repo) == before
+
+
+def test_verify_legacy_hash_writes_nothing(repo):
+    Keyring(repo).load_without_password()
+    repo.set_setting(LEGACY_HASH_SETTING, hashlib.sha256(b"pw").hexdigest())
+    before = _settings(repo)
+    keyring = Keyring(repo, target_ms=1)
+    assert keyring.verify("pw")
+    assert not keyring.verify("wrong")
+    assert _settings(repo) == before
+    assert read_key_file() is not None
@@ -0,0 +1,39 @@
+"""
+Планы запросов главной таблицы: каждая сортировка (и порядок по умолчанию)
+со списком "Все" и с фильтром по типу должна читать passwords по индексу -
+без полного прохода по таблице и без временной сортировки.
+"""
+import pytest
+from src.database import ConnectionManager
+from src.core.repository import SORT_ORDERS, VaultRepository
+
+TYPES = ("WEB", "CARD", "BANK", "EMAIL")
+# None - порядок по умолчанию (DEFAULT_ORDER), как у list_rows() без сортировки
+SORTS = list(SORT_ORDERS) + [None]
+
+
+@pytest.fixture(scope="module")
+def repo(tmp_path_factory):
+    db = ConnectionManager(str(tmp_path_factory.mktemp("plans") / "plans.db"))
+    repo = VaultRepository(db.conn)
+    repo.import_rows([{"name": f"record {i}", "type": TYPES[i % len(TYPES)],
+                       "username": f"user{i % 7}", "is_favorite": i % 5 == 0}
+                      for i in range(300)])
+    # Статистика как после миграции на заполненной базе
+    db.conn.execute("ANALYZE passwords")
+    yield repo
+    db.close()
+
+
+def _plan(repo, with_type, sort):
+    sql = repo._build_list_sql(with_type, False, sort)
+    params = ["WEB"] if with_type else []
+    return [row[-1] for row in repo.conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+@pytest.mark.parametrize("with_type", [False, True], ids=["all", "type"])
+@pytest.mark.parametrize("sort", SORTS, ids=lambda s: s or "default")
+def test_list_query_uses_index(repo, with_type, sort):
+    plan = _plan(repo, with_type, sort)
+    assert not any(step.startswith("SCAN p") and "INDEX" not in step for step in plan), plan
+    assert not any("USE TEMP B-TREE" in step for step in plan), plan
@@ -0,0 +1,63 @@
+"""
+Подмена файла базы при восстановлении (core.restore.swap_database):
+.pre_restore получает все зафиксированные транзакции, даже если с базой
+открыто еще одно соединение, а при неудаче база остается открытой.
+"""
+import sqlite3
+import pytest
+from src.database import ConnectionManager
+from src.core.repository import VaultRepository
+from src.core.restore import PRE_RESTORE_SUFFIX, swap_database
+
+
+def _make_db(path, count):
+    db = ConnectionManager(str(path))
+    VaultRepository(db.conn).import_rows(
+        [{"name": f"record {i}", "type": "WEB"} for i in range(count)])
+    return db
+
+
+def _count(path):
+    conn = sqlite3.connect(str(path))
+    try:
+        return conn.execute("SELECT count(*) FROM passwords").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_pre_restore_is_complete_with_second_connection(tmp_path):
+    db = _make_db(tmp_path / "vault.db", 50)
+    snapshot = _make_db(tmp_path / "snapshot.db", 3)
+    snapshot.close()
+    # Второе соединение (как у потока поиска): закрытие основного уже не последнее
+    other = sqlite3.connect(db.path)
+    other.execute("SELECT count(*) FROM passwords").fetchone()
+    try:
+        conn = swap_database(db, str(tmp_path / "snapshot.db"))
+    finally:
+        other.close()
+    try:
+        assert conn.execute("SELECT count(*) FROM passwords").fetchone()[0] == 3
+        assert _count(db.path + PRE_RESTORE_SUFFIX) == 50
+    finally:
+        db.close()
+
+
+def test_swap_refused_while_reader_holds_wal(tmp_path):
+    db = _make_db(tmp_path / "vault.db", 5)
+    snapshot = _make_db(tmp_path / "snapshot.db", 1)
+    snapshot.close()
+    # Открытая транзакция чтения не дает перенести журнал целиком
+    other = sqlite3.connect(db.path)
+    other.execute("BEGIN")
+    other.execute("SELECT count(*) FROM passwords").fetchone()
+    VaultRepository(db.conn).import_rows([{"name": "late", "type": "WEB"}])
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            swap_database(db, str(tmp_path / "snapshot.db"))
+    finally:
+        other.rollback()
+        other.close()
+    # Подмены не было, база открыта и цела
+    assert db.conn.execute("SELECT count(*) FROM passwords").fetchone()[0] == 6
+    db.close()
@@ -0,0 +1,164 @@
+"""
+Смена ключа хранилища (core.rotation): фоновая перешифровка и ключи
+восстанавливаемой копии.
+"""
+import shutil
+import sqlite3
+import pytest
+from cryptography.fernet import Fernet
+from src.database import ENVELOPE_COLUMN, ConnectionManager
+from src.core.crypto import VaultCipher
+from src.core.keyring import Keyring
+from src.core.repository import VaultRepository
+from src.core.rotation import (RETIRED_SETTING, ROTATION_SETTING, RotationWorker, begin_rotation,
+                               begin_upgrade, can_decrypt, make_cipher, needs_upgrade,
+                               prepare_restore_keys)
+
+
+@pytest.fixture()
+def vault(tmp_path, monkeypatch):
+    """База без мастер-пароля (ключ в файле KEY_FILE в tmp_path) с одной записью."""
+    monkeypatch.chdir(tmp_path)
+    db = ConnectionManager(str(tmp_path / "vault.db"))
+    repo = VaultRepository(db.conn, secret_ttl=0)
+    keyring = Keyring(repo, target_ms=1, keep_key_file=True)
+    keyring.load_without_password()
+    repo.cipher = make_cipher(repo, keyring.key)
+    pid = repo.insert_record(repo.seal({"name": "a", "type": "WEB", "password": "secret"}))
+    yield db, repo, keyring, pid
+    db.close()
+
+
+def _snapshot(db, path):
+    db.checkpoint()
+    shutil.copy(db.path, path)
+    return sqlite3.connect(str(path))
+
+
+def _rotate(db, repo, keyring):
+    key = begin_rotation(repo, keyring)
+    repo.cipher = make_cipher(repo, key)
+    worker = RotationWorker(db.path, key)
+    worker.start()
+    worker.join()
+    return key
+
+
+def _events(worker):
+    events = []
+    while not worker.events.empty():
+        events.append(worker.events.get())
+    return events
+
+
+class CancelAfterFirstBatch(RotationWorker):
+    """Просит остановиться, пока перешифровывает первую порцию (как кнопка отмены)."""
+
+    def _process_records(self, pool, cipher, records):
+        self.cancel()
+        return super()._process_records(pool, cipher, records)
+
+
+def test_restore_keys_for_snapshot_taken_before_rotation(vault, tmp_path):
+    db, repo, keyring, pid = vault
+    conn = _snapshot(db, tmp_path / "snapshot.db")
+    key = _rotate(db, repo, keyring)
+    try:
+        # Ключа копии больше нет ни в файле, ни в копии - он есть среди прежних ключей
+        snapshot = VaultRepository(conn, secret_ttl=0)
+        assert not can_decrypt(snapshot, make_cipher(snapshot, key))
+        assert prepare_restore_keys(conn, key, repo.cipher.keys) == key
+        snapshot.cipher = make_cipher(snapshot, key)
+        assert snapshot.get_secrets(pid) == {"password": "secret"}
+    finally:
+        conn.close()
+
+
+def test_restore_refused_when_no_key_opens_snapshot(vault, tmp_path):
+    db, repo, keyring, pid = vault
+    conn = _snapshot(db, tmp_path / "snapshot.db")
+    try:
+        other = Fernet.generate_key()
+        with pytest.raises(ValueError):
+            prepare_restore_keys(conn, other, [other])
+    finally:
+        conn.close()
+
+
+def test_snapshot_with_password_keeps_its_keys(vault, tmp_path):
+    db, repo, keyring, pid = vault
+    keyring.set_password("pw")
+    conn = _snapshot(db, tmp_path / "snapshot.db")
+    try:
+        assert prepare_restore_keys(conn, keyring.key, repo.cipher.keys) is None
+        assert VaultRepository(conn).get_setting(RETIRED_SETTING) is None
+    finally:
+        conn.close()
+
+
+def test_undecryptable_record_is_skipped(vault):
+    db, repo, keyring, pid = vault
+    good = repo.insert_record(repo.seal({"name": "b", "type": "WEB", "password": "other"}))
+    # Токен чужого ключа: не расшифровать ни текущим, ни прежними ключами
+    broken = Fernet(Fernet.generate_key()).encrypt(b"lost").decode()
+    db.conn.execute(f"UPDATE passwords SET password=?, {ENVELOPE_COLUMN}=NULL WHERE id=?",
+                    (broken, pid))
+    db.conn.commit()
+    key = begin_rotation(repo, keyring)
+    worker = RotationWorker(db.path, key, batch=1)
+    worker.start()
+    worker.join()
+    assert _events(worker)[-1] == ("done", 2, [pid])
+    repo.cipher = make_cipher(repo, key)
+    assert repo.get_secrets(good) == {"password": "other"}
+    # Пропущенная запись осталась как была, проход завершен
+    assert db.conn.execute("SELECT password FROM passwords WHERE id=?", (pid,)).fetchone()[0] == broken
+    assert repo.get_setting(ROTATION_SETTING) is None
+
+
+def test_rotation_resumes_after_cancel(vault):
+    db, repo, keyring, pid = vault
+    ids = [pid] + [repo.insert_record(repo.seal({"name": f"r{i}", "type": "WEB",
+                                                  "password": f"p{i}"}))
+                   for i in range(4)]
+    key = begin_rotation(repo, keyring)
+    worker = CancelAfterFirstBatch(db.path, key, batch=2)
+    worker.start()
+    worker.join()
+    assert _events(worker)[-1] == ("cancelled", None)
+    # Первая порция записана вместе с чекпоинтом, остальное ждет продолжения
+    assert '"last_id": %d' % ids[1] in repo.get_setting(ROTATION_SETTING)
+    worker = RotationWorker(db.path, key, batch=2)
+    worker.start()
+    worker.join()
+    assert _events(worker)[-1] == ("done", 5, [])
+    repo.cipher = make_cipher(repo, key)
+    new = VaultCipher([key])
+    for i, rid in enumerate(ids):
+        envelope = db.conn.execute(f"SELECT {ENVELOPE_COLUMN} FROM passwords WHERE id=?",
+                                   (rid,)).fetchone()[0]
+        assert new.is_current(envelope)
+        assert repo.get_secrets(rid)["password"] == ("secret" if i == 0 else f"p{i - 1}")
+
+
+def test_separate_tokens_are_packed_into_envelope(vault):
+    db, repo, keyring, pid = vault
+    repo.envelope = False
+    card = repo.insert_record(repo.seal({"name": "card", "type": "CARD", "password": "pw",
+                                         "card_number": "4111", "card_pin": "1234"}))
+    assert db.conn.execute(f"SELECT {ENVELOPE_COLUMN} FROM passwords WHERE id=?",
+                           (card,)).fetchone()[0] is None
+    assert needs_upgrade(repo, envelope=True)
+    begin_upgrade(repo, keyring.key)
+    worker = RotationWorker(db.path, keyring.key)
+    worker.start()
+    worker.join()
+    assert _events(worker)[-1] == ("done", 2, [])
+    password, envelope = db.conn.execute(
+        f"SELECT password, {ENVELOPE_COLUMN} FROM passwords WHERE id=?", (card,)).fetchone()
+    assert password is None and envelope
+    assert db.conn.execute("SELECT count(*) FROM record_fields WHERE record_id=? "
+                           "AND field IN ('card_number', 'card_pin')", (card,)).fetchone()[0] == 0
+    assert not needs_upgrade(repo, envelope=True)
+    repo.secrets.clear()
+    assert repo.get_secrets(card) == {"password": "pw", "card_number": "4111", "card_pin": "1234"}
@@ -0,0 +1,53 @@
+"""
+Фоновая проверка бэкапов (core.verifier.BackupVerifier): поврежденный снимок
+отмечается как сбой, а снимок, удаленный чисткой посреди проверки, пропускается.
+"""
+import zlib
+import pytest
+from cryptography.fernet import Fernet
+from src.core.chunk_store import CHUNK_SIZE
+from src.core.verifier import BackupVerifier
+
+
+@pytest.fixture()
+def verifier(tmp_path):
+    verifier = BackupVerifier(str(tmp_path / "backups"), str(tmp_path),
+                              Fernet(Fernet.generate_key()))
+    data = tmp_path / "data.db"
+    data.write_bytes(bytes(range(256)) * (CHUNK_SIZE // 64))
+    verifier.store.add_snapshot(str(data), "vault_20240515_120000")
+    return verifier
+
+
+def _events(verifier):
+    events = []
+    while not verifier.events.empty():
+        events.append(verifier.events.get())
+    return events
+
+
+def test_corrupt_snapshot_fails(verifier):
+    name = "vault_20240515_120000"
+    digest = verifier.store.read_manifest(name)["chunks"][0]
+    with open(verifier.store.chunk_path(digest), "wb") as f:
+        f.write(zlib.compress(b"x"))
+    verifier.run()
+    [(kind, failed, message)] = _events(verifier)
+    assert (kind, failed) == ("failed", name) and message
+    assert verifier.store.read_catalog()[name]["status"] == "failed"
+
+
+def test_snapshot_pruned_during_check_is_skipped(verifier, monkeypatch):
+    store = verifier.store
+    restore = store.restore
+
+    def prune_then_restore(name, target_path):
+        # Чистка после бэкапа успела удалить снимок и его куски
+        store.delete_snapshot(name)
+        store.collect_garbage()
+        return restore(name, target_path)
+
+    monkeypatch.setattr(store, "restore", prune_then_restore)
+    verifier.run()
+    assert _events(verifier) == []
+    assert store.read_catalog() == {}